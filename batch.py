@@ -0,0 +1,332 @@
+"""Headless command line entry point that splits a whole directory of scores without the GUI.
+
+Example:
+    python -m batch "scores/*.pdf" --output library --parts Parts_Default.txt --metadata scores.csv --workers 8
+
+The score operations, and pypdf with them, are imported by the functions that use them rather than at module load, so
+invocations that only parse their arguments or find nothing to do start in a fraction of the time. Keep it that way,
+benchmarks.startup enforces the budget.
+"""
+import argparse
+import csv
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import as_completed
+from pathlib import Path
+from file_operations import FSYNC_NONE, FSYNC_POLICIES, LINK_POLICIES, LINK_REFLINK, read_part_names
+from tracing import JsonLinesHandler, add_handler
+
+DEFAULT_PARTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Parts_Default.txt')
+HEADER_CACHE_SUFFIX = 'Header Cache.json'
+
+
+def positive_int(value):
+    """Parses a command line argument as an integer of at least 1, e.g. a number of workers.
+
+    Raises:
+        argparse.ArgumentTypeError: Throws when the value is not a positive integer.
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def non_negative_int(value):
+    """Parses a command line argument as an integer of at least 0, e.g. an outline depth where 0 means every depth.
+
+    Raises:
+        argparse.ArgumentTypeError: Throws when the value is not a non-negative integer.
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must be at least 0, got {number}")
+    return number
+
+
+def find_scores(sources):
+    """Finds the score pdfs matching the given directories and glob patterns.
+
+    Args:
+        sources (list[str]): A list of directory paths or glob patterns representing the scores to process.
+
+    Returns:
+        list[str]: A sorted list of file paths representing the pdf scores found, without duplicates.
+    """
+    scores = set()
+    for source in sources:
+        if os.path.isdir(source):
+            scores.update(str(path) for path in Path(source).glob('*.pdf'))
+        else:
+            scores.update(path for path in glob.glob(source) if Path(path).suffix == '.pdf')
+    return sorted(scores)
+
+
+def score_metadata(title, composer, style):
+    """Utility function to build the PDF standard metadata of a score from the GUI form fields.
+
+    Args:
+        title (str): The title of the score.
+        composer (str): The composer/arranger of the score.
+        style (str): The style of the score, multiple values seperated with a comma.
+
+    Returns:
+        dict[str, str]: A dictionary of key/value pairs representing the metadata. Keys follow the PDF standard.
+    """
+    return {"/Title": title.strip(), "/Author": composer.strip(), "/Subject": style.strip()}
+
+
+def read_metadata_csv(file):
+    """Reads the metadata of each score from a csv file with the columns score, title, composer and style.
+
+    Args:
+        file (str): A file path representing the csv file. The score column holds the file name of the score pdf.
+
+    Returns:
+        dict[str, dict[str, str]]: A dictionary of score file name keys with their metadata as values.
+    """
+    with open(file, newline='') as csv_file:
+        return {
+            os.path.basename(row['score']): score_metadata(row.get('title') or '', row.get('composer') or '', row.get('style') or '')
+            for row in csv.DictReader(csv_file)
+        }
+
+
+def resolve_metadata(score_pdf, csv_metadata):
+    """Resolves the metadata of a score from its sidecar json file, the csv metadata or its file name, in that order.
+
+    The sidecar is a .json file next to the score with the same name, holding the keys title, composer and style.
+
+    Args:
+        score_pdf (str): A file path representing the pdf of the score.
+        csv_metadata (dict[str, dict[str, str]]): A dictionary of score file name keys with their metadata as values.
+
+    Returns:
+        dict[str, str]: A dictionary of key/value pairs representing the metadata. Keys follow the PDF standard.
+    """
+    sidecar = Path(score_pdf).with_suffix('.json')
+    if sidecar.exists():
+        with open(sidecar) as sidecar_file:
+            fields = json.load(sidecar_file)
+        return score_metadata(fields.get('title', Path(score_pdf).stem), fields.get('composer', ''), fields.get('style', ''))
+
+    if os.path.basename(score_pdf) in csv_metadata:
+        return csv_metadata[os.path.basename(score_pdf)]
+
+    return score_metadata(Path(score_pdf).stem, '', '')
+
+
+def init_worker(log_level, trace_file):
+    """Configures the logging and span tracing of a worker process.
+
+    Args:
+        log_level (int): The level the progress of each score is logged at.
+        trace_file (str, optional): A file path representing a JSON lines file the spans of each score are appended to.
+    """
+    logging.basicConfig(level=log_level, format='%(message)s')
+    if trace_file:
+        add_handler(JsonLinesHandler(trace_file))
+
+
+class ScoreSkipped(Exception):
+    """Raised by process_score when the preflight finds that a score cannot be split, before anything is written."""
+
+
+def preflight(score_pdf, part_names):
+    """Plans the split of a score before it is processed, so a score whose bookmarks do not match the part names is skipped without writing anything.
+
+    Runs inside the worker process at the start of each score, so scores are planned in parallel and the first is split
+    without waiting for every score to be planned.
+
+    Args:
+        score_pdf (str): A file path representing the pdf of the score.
+        part_names (list[str]): A list of part names that correlate with the bookmarks of the score.
+
+    Raises:
+        ScoreSkipped: Throws when the score cannot be read or its bookmarks do not match the part names, with every mismatch found.
+
+    Returns:
+        dict[str, (int, int)]: A dictionary of part name keys with tuple values that represent their start and end pages (zero indexed & inclusive).
+    """
+    from pdf_operations import plan_split
+
+    try:
+        plan = plan_split(score_pdf, part_names)
+    except Exception as error:
+        raise ScoreSkipped(f"{type(error).__name__}: {error}") from error
+    if plan['mismatches']:
+        raise ScoreSkipped('; '.join(plan['mismatches']))
+    return plan['parts']
+
+
+def process_score(score_pdf, part_names, metadata, output_directory, part_folders, incremental_metadata=False, force=False, low_memory=False, memory_limit=None, fsync=FSYNC_NONE, zip_bundle=False, detect_parts=False, catalog=None, compressor=None, outline_depth=None, detect_workers=None):
+    """Creates the complete set and parts of a single score, after its preflight when it is split by its bookmarks. Runs inside a worker process.
+
+    Args:
+        score_pdf (str): A file path representing the pdf of the score to be split into parts.
+        part_names (list[str]): A list of part names that correlate with the bookmarks of the score.
+        metadata (dict[str,str]): A dictionary of key/value pairs representing the metadata to add to the pdf. Keys must follow the PDF standard.
+        output_directory (str): A file path representing the output directory location to store the newly created files.
+        part_folders (bool): Whether each part is output into its own part named folder inside the output directory.
+        incremental_metadata (bool): Whether the complete set is created by appending the metadata to a copy of the score.
+        force (bool): Whether to recreate outputs that are unchanged since the last run.
+        low_memory (bool): Whether the score is read through a memory map and cached pages are released after each part.
+        memory_limit (int, optional): The resident memory in bytes the worker may use.
+        fsync (str): When outputs are flushed to disk, one of file_operations.FSYNC_POLICIES.
+        zip_bundle (bool): Whether the complete set and parts are written into a single ZIP instead of separate files.
+        detect_parts (bool): Whether the part page ranges are detected from the part names in the page headers instead of the bookmarks.
+        catalog (str, optional): A file path representing the SQLite database of a catalog to record each output in.
+        compressor (compression.PartCompressor, optional): The compressor each part is compressed with before it is written.
+        outline_depth (int, optional): Splits by the bookmarks at this depth, or at every depth when 0, named after their bookmark path instead of the part names, see pdf_operations.ScoreJob.run_outline.
+        detect_workers (int, optional): The number of processes the page headers are read with when detecting parts, read in the worker itself when not supplied.
+
+    Raises:
+        ScoreSkipped: Throws when the bookmarks of the score do not match the part names, nothing is written.
+
+    Returns:
+        (list[str], int): A list of the part names that could not be created and the peak resident memory of the worker in bytes.
+    """
+    import multiprocessing
+    from part_detection import detect_part_pages
+    from pdf_operations import ScoreJob
+
+    if multiprocessing.current_process().daemon:  # Process pool workers are daemons before Python 3.9 and cannot start their own
+        detect_workers = None
+    part_page_nums = preflight(score_pdf, part_names) if outline_depth is None and not detect_parts else None
+    with ScoreJob(score_pdf, metadata, output_directory, part_folders=part_folders, incremental_metadata=incremental_metadata, manifest=True,
+                  low_memory=low_memory, memory_limit=memory_limit, fsync=fsync, zip_bundle=zip_bundle, catalog=catalog, compressor=compressor) as job:
+        if outline_depth is not None:
+            failed_parts = list(job.run_outline(outline_depth or None, force=force))
+        elif detect_parts:
+            failed_parts = list(job.run_pages(detect_part_pages(score_pdf, part_names, detect_workers, cache_file=f"{output_directory}/.{metadata['/Title']} - {HEADER_CACHE_SUFFIX}"), force=force))
+        else:
+            failed_parts = list(job.run_pages(part_page_nums, force=force))
+        return failed_parts, job.peak_rss
+
+
+def parse_args(argv):
+    """Parses the batch command line arguments."""
+    parser = argparse.ArgumentParser(prog='python -m batch', description='Split a directory of bookmarked scores into their complete sets and parts.')
+    parser.add_argument('scores', nargs='+', help='directories or glob patterns of the score pdfs to split')
+    parser.add_argument('-o', '--output', required=True, help='output directory for the complete sets and parts')
+    parser.add_argument('-p', '--parts', default=DEFAULT_PARTS_FILE, help='parts .txt file with one part name per line (default: Parts_Default.txt)')
+    parser.add_argument('-m', '--metadata', help='csv file with the columns score, title, composer and style. Sidecar .json files take precedence')
+    parser.add_argument('-w', '--workers', type=positive_int, default=os.cpu_count(), help='number of scores processed concurrently (default: cpu count)')
+    parser.add_argument('--part-folders', action='store_true', help='output each part into its own part named folder')
+    parser.add_argument('-v', '--verbose', action='store_true', help='log the progress of every part')
+    parser.add_argument('--trace', help='JSON lines file to append the timing spans of every phase of each score to')
+    parser.add_argument('--force', action='store_true', help='recreate every output, even those the manifest shows are unchanged since the last run')
+    parser.add_argument('--low-memory', action='store_true', help='read scores through a memory map and release each part before starting the next')
+    parser.add_argument('--memory-limit', type=int, help='memory ceiling per worker in MB, a score that exceeds it fails')
+    parser.add_argument('--incremental-metadata', action='store_true', help='create complete sets by appending the metadata to a copy of the score instead of rewriting it')
+    parser.add_argument('--detect-parts', action='store_true', help='find the pages of each part from the part names in the page headers instead of the bookmarks')
+    parser.add_argument('--outline', dest='outline_depth', type=non_negative_int, nargs='?', const=0, metavar='DEPTH',
+                        help='split by the nested bookmarks at DEPTH (1 for top level), or at every depth when DEPTH is not given, naming outputs after their bookmark path instead of the parts file')
+    parser.add_argument('--catalog', help='SQLite catalog to record every output in, searchable with python -m catalog query')
+    parser.add_argument('--compress', action='store_true', help='downsample and recompress the page images of each part and compress its content, logging its size before and after')
+    parser.add_argument('--dedupe', action='store_true', help='merge identical fonts, images and forms inside each part and compress its content, losslessly, logging its size before and after')
+    parser.add_argument('--image-dpi', type=int, default=150, help='resolution --compress downsamples page images to, 0 leaves images as they are (default: 150)')
+    parser.add_argument('--jpeg-quality', type=int, default=75, help='JPEG quality --compress recompresses page images with (default: 75)')
+    parser.add_argument('--zip', action='store_true', help='write the complete set and parts of each score into a single ZIP, laid out as --part-folders would')
+    parser.add_argument('--mirror', action='append', default=[], metavar='DIR',
+                        help='also place every output into this library tree, laid out as in the output directory, as a link where the file system supports it. Repeat for several trees')
+    parser.add_argument('--link', choices=LINK_POLICIES, default=LINK_REFLINK,
+                        help="how --mirror places outputs: 'reflink' shares blocks until a copy changes, 'hardlink' shares the file itself, both fall back to copying (default: reflink)")
+    parser.add_argument('--fsync', choices=FSYNC_POLICIES, default=FSYNC_NONE,
+                        help="flush outputs to disk before moving them into place: 'file' flushes each output, 'full' also its folder (default: none)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Runs the batch command line.
+
+    Args:
+        argv (list[str], optional): The command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: The exit status, 0 when every score was processed and 1 when any score failed.
+    """
+    args = parse_args(argv)
+    scores = find_scores(args.scores)
+    if not scores:
+        print('No scores found.')
+        return 1
+
+    part_names = read_part_names(args.parts)
+    csv_metadata = read_metadata_csv(args.metadata) if args.metadata else {}
+    os.makedirs(args.output, exist_ok=True)
+
+    try:
+        from compression import PartCompressor
+        if args.compress:
+            compressor = PartCompressor(args.image_dpi or None, args.jpeg_quality, workers=1)
+        else:
+            compressor = PartCompressor(target_dpi=None, workers=1) if args.dedupe else None
+    except ImportError as error:
+        print(error)
+        return 1
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    memory_limit = args.memory_limit * 2**20 if args.memory_limit else None
+    failed_scores = {}
+    skipped = 0
+    # Workers left idle by a batch of fewer scores than workers read the page headers of the scores in parallel instead
+    detect_workers = args.workers // len(scores) if args.detect_parts and args.workers > len(scores) else None
+    max_peak_rss = 0
+    start_time = time.perf_counter()
+    log_level = logging.INFO if args.verbose else logging.WARNING
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(log_level, args.trace)) as executor:
+        futures = {
+            executor.submit(process_score, score, part_names, resolve_metadata(score, csv_metadata), args.output, args.part_folders,
+                            incremental_metadata=args.incremental_metadata, force=args.force, low_memory=args.low_memory, memory_limit=memory_limit,
+                            fsync=args.fsync, zip_bundle=args.zip, detect_parts=args.detect_parts,
+                            catalog=args.catalog, compressor=compressor, outline_depth=args.outline_depth, detect_workers=detect_workers): score
+            for score in scores
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            score = futures[future]
+            status = 'OK'
+            try:
+                failed_parts, worker_peak_rss = future.result()
+                max_peak_rss = max(max_peak_rss, worker_peak_rss or 0)
+                if failed_parts:
+                    failed_scores[score] = f"failed parts: {', '.join(failed_parts)}"
+                    status = 'FAILED'
+            except ScoreSkipped as reason:
+                failed_scores[score] = str(reason)
+                skipped += 1
+                status = 'SKIPPED'
+            except Exception as error:
+                failed_scores[score] = f"{type(error).__name__}: {error}"
+                status = 'FAILED'
+            print(f"[{done}/{len(futures)}] {status} {score}", flush=True)
+
+    elapsed = time.perf_counter() - start_time
+    if args.mirror:
+        from dedupe import format_report, mirror_tree
+        print(f"Mirrored into {len(args.mirror)} trees. {format_report(mirror_tree(args.output, args.mirror, args.link))}")
+    # Scores skipped by the preflight were never processed, so they do not count towards the throughput
+    processed = len(futures) - skipped
+    print(f"Processed {processed} scores in {elapsed:.1f}s ({processed / elapsed * 60:.1f} scores/min), "
+          f"{len(failed_scores) - skipped} failed, {skipped} skipped.")
+    if max_peak_rss:
+        print(f"Peak worker memory: {max_peak_rss / 2**20:.1f} MB")
+    for score, reason in failed_scores.items():
+        print(f"  {score}: {reason}")
+
+    return 1 if failed_scores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
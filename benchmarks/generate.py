@@ -0,0 +1,163 @@
+"""Generates synthetic bookmarked scores to benchmark the splitter with.
+
+Example:
+    python -m benchmarks.generate band_book.pdf --parts 18 --pages-per-part 20 --scanned --nested
+"""
+import argparse
+import random
+import zlib
+from pathlib import Path
+from pypdf import PdfWriter
+from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+from file_operations import read_part_names
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+DEFAULT_PARTS_FILE = Path(__file__).parent.parent / 'Parts_Default.txt'
+
+
+def part_names_for(part_count, parts_file=DEFAULT_PARTS_FILE):
+    """Names the parts of a synthetic score after the default big band lineup, numbering any extra parts.
+
+    Args:
+        part_count (int): The number of parts in the score.
+        parts_file (str): A file path representing a .txt file of part names, defaults to the Parts_Default.txt of the project.
+
+    Returns:
+        list[str]: A list of part_count unique part names.
+    """
+    default_parts = read_part_names(parts_file)
+    return default_parts[:part_count] + [f"Part {i + 1}" for i in range(len(default_parts), part_count)]
+
+
+def _random_bytes(rng, size):
+    """Draws random bytes from a generator, the same bytes Random.randbytes draws on Python 3.9 and later."""
+    return rng.getrandbits(size * 8).to_bytes(size, 'little') if size else b""
+
+
+def _add_object(pdf_writer, obj):
+    """Adds an object to a writer as an indirect object. pypdf has no public method for this, so it is the only use of _add_object."""
+    return pdf_writer._add_object(obj)
+
+
+def _vector_page_content(part, page_number, rng):
+    """Builds the content stream of an engraved page: a header, ten staves and randomly placed notes."""
+    commands = [f"BT /F1 16 Tf 72 800 Td ({part}) Tj ET", f"BT /F1 9 Tf 500 800 Td (Page {page_number}) Tj ET", "0.6 w"]
+    for staff in range(10):
+        top = 760 - staff * 72
+        commands += [f"50 {top - line * 6} m 545 {top - line * 6} l S" for line in range(5)]
+        commands += [f"{rng.uniform(60, 535):.1f} {top - rng.randint(0, 8) * 3 - 3:.1f} 5 3.5 re f" for _ in range(24)]
+    return "\n".join(commands).encode()
+
+
+def _scanned_page_image(width, height, rng):
+    """Builds the pixels of a scanned page: mostly white 8 bit greyscale with black speckles."""
+    speckles = bytes(255 if value < 236 else 0 for value in range(256))
+    return _random_bytes(rng, width * height).translate(speckles)
+
+
+def _add_font(pdf_writer, font_program):
+    """Adds the Helvetica font of the page headers, embedding the given font program when there is one."""
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    if font_program:
+        font_file = DecodedStreamObject()
+        font_file.set_data(font_program)
+        font[NameObject("/FontDescriptor")] = _add_object(pdf_writer, DictionaryObject({
+            NameObject("/Type"): NameObject("/FontDescriptor"),
+            NameObject("/FontName"): NameObject("/Helvetica"),
+            NameObject("/Flags"): NumberObject(32),
+            NameObject("/FontBBox"): ArrayObject([NumberObject(-166), NumberObject(-225), NumberObject(1000), NumberObject(931)]),
+            NameObject("/ItalicAngle"): NumberObject(0),
+            NameObject("/Ascent"): NumberObject(718),
+            NameObject("/Descent"): NumberObject(-207),
+            NameObject("/CapHeight"): NumberObject(718),
+            NameObject("/StemV"): NumberObject(88),
+            NameObject("/FontFile"): _add_object(pdf_writer, font_file),
+        }))
+    return _add_object(pdf_writer, font)
+
+
+def generate_score(output_pdf, part_count=18, pages_per_part=4, scanned=False, nested=False, scan_dpi=100, seed=0, font_bytes=0, font_per_page=False):
+    """Generates a synthetic score with a bookmark on the first page of each part.
+
+    Args:
+        output_pdf (str): A file path representing the location to output the score.
+        part_count (int): The number of parts in the score.
+        pages_per_part (int): The number of pages in each part.
+        scanned (bool): Whether each page is an embedded greyscale scan image instead of vector engraving.
+        nested (bool): Whether each part bookmark has a nested bookmark for every page of the part.
+        scan_dpi (int): The resolution of the scan images.
+        seed (int): The seed of the random page content, so the same arguments always generate the same score.
+        font_bytes (int): The size of a synthetic font program embedded in the header font, none when 0. Its bytes are random, it is not a usable font.
+        font_per_page (bool): Whether every page gets its own identical copy of the header font, as scores merged from pages exported one at a time do.
+
+    Returns:
+        list[str]: The part names of the score, in bookmark order.
+    """
+    rng = random.Random(seed)
+    part_names = part_names_for(part_count)
+    pdf_writer = PdfWriter()
+    font_program = _random_bytes(random.Random(seed), font_bytes)
+    font = _add_font(pdf_writer, font_program)
+    image_width, image_height = PAGE_WIDTH * scan_dpi // 72, PAGE_HEIGHT * scan_dpi // 72
+
+    for part_index, part in enumerate(part_names):
+        for page_index in range(pages_per_part):
+            page = pdf_writer.add_blank_page(PAGE_WIDTH, PAGE_HEIGHT)
+            page_font = _add_font(pdf_writer, font_program) if font_per_page else font
+            resources = DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/F1"): page_font})})
+            if scanned:
+                image = DecodedStreamObject()
+                image.set_data(_scanned_page_image(image_width, image_height, rng))
+                image.update({
+                    NameObject("/Type"): NameObject("/XObject"),
+                    NameObject("/Subtype"): NameObject("/Image"),
+                    NameObject("/Width"): NumberObject(image_width),
+                    NameObject("/Height"): NumberObject(image_height),
+                    NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+                    NameObject("/BitsPerComponent"): NumberObject(8),
+                })
+                resources[NameObject("/XObject")] = DictionaryObject({NameObject("/Im0"): _add_object(pdf_writer, image.flate_encode())})
+                content = f"q {PAGE_WIDTH} 0 0 {PAGE_HEIGHT} 0 0 cm /Im0 Do Q".encode()
+            else:
+                content = _vector_page_content(part, page_index + 1, rng)
+
+            contents = DecodedStreamObject()
+            contents.set_data(content)
+            page[NameObject("/Resources")] = resources
+            page[NameObject("/Contents")] = _add_object(pdf_writer, contents.flate_encode())
+
+        first_page = part_index * pages_per_part
+        bookmark = pdf_writer.add_outline_item(part, first_page)
+        if nested:
+            for page_index in range(pages_per_part):
+                pdf_writer.add_outline_item(f"Page {page_index + 1}", first_page + page_index, parent=bookmark)
+
+    with open(output_pdf, "wb") as score:
+        pdf_writer.write(score)
+
+    return part_names
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.generate', description='Generate a synthetic bookmarked score.')
+    parser.add_argument('output', help='file path of the score pdf to generate')
+    parser.add_argument('--parts', type=int, default=18, help='number of parts (default: 18)')
+    parser.add_argument('--pages-per-part', type=int, default=4, help='number of pages in each part (default: 4)')
+    parser.add_argument('--scanned', action='store_true', help='embed a greyscale scan image on each page instead of vector engraving')
+    parser.add_argument('--nested', action='store_true', help='add a nested bookmark for every page of each part')
+    parser.add_argument('--scan-dpi', type=int, default=100, help='resolution of the scan images (default: 100)')
+    parser.add_argument('--font-bytes', type=int, default=0, help='size of a synthetic font program embedded in the header font (default: 0, none)')
+    parser.add_argument('--font-per-page', action='store_true', help='give every page its own identical copy of the header font')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random page content (default: 0)')
+    args = parser.parse_args(argv)
+
+    generate_score(args.output, args.parts, args.pages_per_part, args.scanned, args.nested, args.scan_dpi, args.seed, args.font_bytes, args.font_per_page)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Compares mirroring the parts of a score into several library trees by copying against hard links and reflinks.
+
+Reports the wall time of each policy, the write time it estimates linking saved and the disk space the mirrors add to the output, counting hard linked files once.
+Reflinked files share their blocks but are still reported as allocated to each file, as the file system reports them.
+Reflinks fall back to copies on file systems without copy on write (e.g. ext4 or tmpfs), run it on the library disk.
+
+Example:
+    python -m benchmarks.link_benchmark --parts 18 --pages-per-part 20 --mirrors 4
+"""
+import argparse
+import os
+import statistics
+import tempfile
+from contextlib import redirect_stdout
+from benchmarks.generate import generate_score
+from dedupe import mirror_tree
+from file_operations import LINK_POLICIES
+from pdf_operations import ScoreJob
+
+METADATA = {'/Title': 'Benchmark', '/Author': 'Score Splitter', '/Subject': 'Benchmark'}
+
+
+def disk_bytes(directories):
+    """Totals the disk space allocated to the files under the given directories, counting hard linked files once."""
+    inodes = {}
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for file in files:
+                stat = os.stat(os.path.join(root, file))
+                inodes[(stat.st_dev, stat.st_ino)] = getattr(stat, 'st_blocks', 0) * 512 or stat.st_size
+    return sum(inodes.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.link_benchmark', description=__doc__)
+    parser.add_argument('--parts', type=int, default=18, help='number of parts of the generated score (default: 18)')
+    parser.add_argument('--pages-per-part', type=int, default=20, help='number of pages in each part (default: 20)')
+    parser.add_argument('--mirrors', type=int, default=3, help='number of library trees the parts are mirrored into (default: 3)')
+    parser.add_argument('-d', '--directory', default='.', help='directory on the file system to benchmark (default: .)')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='number of runs of each policy (default: 5)')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(dir=args.directory) as temp:
+        score_pdf = f"{temp}/score.pdf"
+        part_names = generate_score(score_pdf, args.parts, args.pages_per_part)
+        output = f"{temp}/output"
+        os.mkdir(output)
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull), ScoreJob(score_pdf, METADATA, output, part_folders=True) as job:
+            job.run(part_names)
+
+        output_bytes = disk_bytes([output])
+        print(f"{'policy':<10}{'median (ms)':>14}{'write saved (ms)':>18}{'linked':>8}{'copied':>8}{'added disk (bytes)':>22}")
+        for policy in LINK_POLICIES:
+            timings = []
+            for run in range(args.repeat):
+                mirrors = [f"{temp}/{policy}-{run}-{mirror}" for mirror in range(args.mirrors)]
+                report = mirror_tree(output, mirrors, policy)
+                timings.append(report['seconds'])
+            print(f"{policy:<10}{statistics.median(timings) * 1000:>14.1f}{report['write_seconds_saved'] * 1000:>18.1f}{report['linked']:>8}{report['copied']:>8}"
+                  f"{disk_bytes([output] + mirrors) - output_bytes:>22}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Compares the time taken to create a complete set by rewriting every page against appending an incremental metadata update.
+
+Example:
+    python -m benchmarks.metadata_benchmark tests/test_score.pdf --repeat 20
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pdf_operations import add_metadata
+
+METADATA = {'/Title': 'Benchmark', '/Author': 'Score Splitter', '/Subject': 'Benchmark'}
+
+
+def time_add_metadata(score_pdf, output_path, incremental, repeat):
+    """Times repeated calls of add_metadata.
+
+    Args:
+        score_pdf (str): A file path representing the pdf to add metadata to.
+        output_path (str): A directory path representing the location to output the complete set.
+        incremental (bool): Whether the metadata is appended as an incremental update.
+        repeat (int): The number of times to create the complete set.
+
+    Returns:
+        list[float]: The wall time in seconds of each call.
+    """
+    timings = []
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            add_metadata(score_pdf, output_path, METADATA, incremental=incremental)
+            timings.append(time.perf_counter() - start_time)
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.metadata_benchmark', description=__doc__)
+    parser.add_argument('score', nargs='?', default='tests/test_score.pdf', help='pdf to add metadata to (default: tests/test_score.pdf)')
+    parser.add_argument('-r', '--repeat', type=int, default=10, help='number of runs of each mode (default: 10)')
+    args = parser.parse_args(argv)
+
+    print(f"{'mode':<12}{'median (ms)':>14}{'min (ms)':>12}{'output (bytes)':>18}")
+    with tempfile.TemporaryDirectory() as output_path:
+        for mode, incremental in (('rewrite', False), ('incremental', True)):
+            timings = time_add_metadata(args.score, output_path, incremental, args.repeat)
+            output_bytes = os.path.getsize(f"{output_path}/{METADATA['/Title']} - Complete Set.pdf")
+            print(f"{mode:<12}{statistics.median(timings) * 1000:>14.2f}{min(timings) * 1000:>12.2f}{output_bytes:>18}")
+
+
+if __name__ == '__main__':
+    main()
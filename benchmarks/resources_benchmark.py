@@ -0,0 +1,86 @@
+"""Reports the fonts, images and forms shared across the parts of a score and compares the part sizes of a plain split against a deduplicated one.
+
+Without a score, multi-part scores with an embedded font are generated: one where every page uses the same font object
+and one where every page has its own identical copy of it.
+
+Example:
+    python -m benchmarks.resources_benchmark --parts 20 --pages-per-part 4 --font-bytes 65536
+    python -m benchmarks.resources_benchmark band_book.pdf --part-names Parts_Default.txt
+"""
+import argparse
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pypdf import PdfReader
+from benchmarks.generate import generate_score
+from compression import PartCompressor, format_shared_resources, shared_resources
+from file_operations import read_part_names
+from pdf_operations import ScoreJob, build_outline_index, match_bookmarks
+
+METADATA = {'/Title': 'Benchmark', '/Author': 'Score Splitter', '/Subject': 'Benchmark'}
+
+
+def split_part_sizes(score_pdf, part_page_nums, output_directory, compressor=None):
+    """Splits a score into parts and measures the size of each.
+
+    Args:
+        score_pdf (str): A file path representing the pdf of the score.
+        part_page_nums (dict[str, (int, int)]): A dictionary of part name keys with tuple values that represent their start and end pages (zero indexed & inclusive).
+        output_directory (str): A directory path representing the location to output the parts.
+        compressor (compression.PartCompressor, optional): The compressor each part is compressed with before it is written.
+
+    Returns:
+        (dict[str, int], float): The size in bytes of each part and the wall time in seconds taken to split the score.
+    """
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull), ScoreJob(score_pdf, METADATA, output_directory, compressor=compressor) as job:
+        start_time = time.perf_counter()
+        job.write_parts(part_page_nums)
+        elapsed = time.perf_counter() - start_time
+        return {part: os.path.getsize(job.part_path(part)) for part in part_page_nums}, elapsed
+
+
+def report(score_pdf, part_names, top=5):
+    """Prints the resources shared across the parts of a score and the size of each part split plainly and deduplicated."""
+    with PdfReader(score_pdf) as pdf_reader:
+        part_page_nums = match_bookmarks(build_outline_index(pdf_reader), part_names)
+        shared = shared_resources(pdf_reader, part_page_nums)
+
+    print(format_shared_resources(shared, top))
+
+    with tempfile.TemporaryDirectory() as temp:
+        plain_sizes, plain_time = split_part_sizes(score_pdf, part_page_nums, tempfile.mkdtemp(dir=temp))
+        dedupe_sizes, dedupe_time = split_part_sizes(score_pdf, part_page_nums, tempfile.mkdtemp(dir=temp), PartCompressor(target_dpi=None, measure=False))
+
+    print(f"{'part':<20}{'plain (bytes)':>16}{'deduplicated (bytes)':>22}")
+    for part in part_page_nums:
+        print(f"{part:<20}{plain_sizes[part]:>16}{dedupe_sizes[part]:>22}")
+    print(f"{'total':<20}{sum(plain_sizes.values()):>16}{sum(dedupe_sizes.values()):>22}")
+    print(f"{'time (ms)':<20}{plain_time * 1000:>16.1f}{dedupe_time * 1000:>22.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.resources_benchmark', description=__doc__)
+    parser.add_argument('score', nargs='?', help='bookmarked pdf to report on, generated when not given')
+    parser.add_argument('--part-names', help='parts .txt file with one part name per line matching the bookmarks of the score')
+    parser.add_argument('--parts', type=int, default=20, help='number of parts of the generated scores (default: 20)')
+    parser.add_argument('--pages-per-part', type=int, default=4, help='number of pages in each part of the generated scores (default: 4)')
+    parser.add_argument('--font-bytes', type=int, default=64 * 1024, help='size of the font embedded in the generated scores (default: 65536)')
+    args = parser.parse_args(argv)
+
+    if args.score:
+        with PdfReader(args.score) as pdf_reader:
+            part_names = read_part_names(args.part_names) if args.part_names else [title for title, _, _ in build_outline_index(pdf_reader)]
+        report(args.score, part_names)
+        return
+
+    with tempfile.TemporaryDirectory() as temp:
+        for scenario, font_per_page in (('shared-font', False), ('font-per-page', True)):
+            print(f"== {scenario}")
+            score_pdf = f"{temp}/{scenario}.pdf"
+            part_names = generate_score(score_pdf, args.parts, args.pages_per_part, font_bytes=args.font_bytes, font_per_page=font_per_page)
+            report(score_pdf, part_names)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""Benchmarks the score operations against synthetic scores and records the results as JSON.
+
+Each case runs in a fresh process so its peak memory is measured on its own. Passing a baseline
+results file compares the wall times against it and exits non-zero on a regression.
+
+Example:
+    python -m benchmarks.run --parts 18 --pages-per-part 20 --output results.json --baseline baseline.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+import pypdf
+from benchmarks.generate import generate_score
+from file_operations import move_files_to_directories
+from memory_usage import peak_rss
+from pdf_operations import add_metadata, build_outline_index, split_score_by_bookmarks, split_score_by_pages
+from pypdf import PdfReader
+
+METADATA = {'/Title': 'Benchmark', '/Author': 'Score Splitter', '/Subject': 'Benchmark'}
+CASES = ['add_metadata', 'add_metadata_incremental', 'split_score_by_bookmarks', 'split_score_by_pages', 'move_files_to_directories']
+
+
+def _directory_bytes(directory):
+    """Totals the size of every file under a directory."""
+    return sum(os.path.getsize(os.path.join(root, file)) for root, _, files in os.walk(directory) for file in files)
+
+
+def run_case(case, score_pdf, part_names, repeat):
+    """Runs a benchmark case. Meant to run in its own process so the peak memory belongs to the case alone.
+
+    Args:
+        case (str): The name of the case, one of CASES.
+        score_pdf (str): A file path representing the pdf of the score.
+        part_names (list[str]): The part names of the score in bookmark order.
+        repeat (int): The number of times to run the case.
+
+    Returns:
+        dict: The wall time of each run in seconds, the peak memory in bytes and the bytes output by the last run.
+    """
+    with PdfReader(score_pdf) as pdf_reader:
+        part_page_nums = {part: (start, end) for part, (_, start, end) in zip(part_names, build_outline_index(pdf_reader))}
+
+    timings = []
+    with tempfile.TemporaryDirectory() as temp, open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        for run in range(repeat):
+            output_directory = tempfile.mkdtemp(dir=temp)
+            if case == 'move_files_to_directories':
+                split_score_by_pages(score_pdf, part_page_nums, METADATA, output_directory)
+                part_files = [f"{output_directory}/{METADATA['/Title']} - {part}.pdf" for part in part_names]
+                part_folders = [f"{output_directory}/{part}" for part in part_names]
+
+            start_time = time.perf_counter()
+            if case == 'add_metadata':
+                add_metadata(score_pdf, output_directory, METADATA)
+            elif case == 'add_metadata_incremental':
+                add_metadata(score_pdf, output_directory, METADATA, incremental=True)
+            elif case == 'split_score_by_bookmarks':
+                split_score_by_bookmarks(score_pdf, part_names, METADATA, output_directory)
+            elif case == 'split_score_by_pages':
+                split_score_by_pages(score_pdf, part_page_nums, METADATA, output_directory)
+            elif case == 'move_files_to_directories':
+                move_files_to_directories(part_files, part_folders)
+            timings.append(time.perf_counter() - start_time)
+
+        output_bytes = _directory_bytes(output_directory)
+
+    return {'wall_times_s': timings, 'peak_rss_bytes': peak_rss(), 'output_bytes': output_bytes}
+
+
+def run_benchmarks(part_count, pages_per_part, kinds, outlines, cases, repeat):
+    """Generates a synthetic score for each kind of page and outline and runs every case against it.
+
+    Args:
+        part_count (int): The number of parts in each score.
+        pages_per_part (int): The number of pages in each part.
+        kinds (list[str]): The kinds of page to generate scores with, 'vector' and/or 'scanned'.
+        outlines (list[str]): The kinds of outline to generate scores with, 'flat' and/or 'nested'.
+        cases (list[str]): The names of the cases to run.
+        repeat (int): The number of times to run each case.
+
+    Returns:
+        list[dict]: A result for each scenario and case.
+    """
+    results = []
+    spawn = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as temp:
+        for kind in kinds:
+            for outline in outlines:
+                scenario = f"{kind}-{outline}"
+                score_pdf = f"{temp}/{scenario}.pdf"
+                part_names = generate_score(score_pdf, part_count, pages_per_part, scanned=kind == 'scanned', nested=outline == 'nested')
+                pages = part_count * pages_per_part
+
+                for case in cases:
+                    with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as executor:
+                        measured = executor.submit(run_case, case, score_pdf, part_names, repeat).result()
+
+                    wall_time = statistics.median(measured['wall_times_s'])
+                    result = {
+                        'scenario': scenario,
+                        'case': case,
+                        'parts': part_count,
+                        'pages': pages,
+                        'input_bytes': os.path.getsize(score_pdf),
+                        'wall_time_s': wall_time,
+                        'pages_per_second': pages / wall_time if wall_time else None,
+                        'peak_rss_bytes': measured['peak_rss_bytes'],
+                        'output_bytes': measured['output_bytes'],
+                    }
+                    results.append(result)
+                    print(f"{scenario:<16}{case:<28}{wall_time * 1000:>10.1f} ms{result['pages_per_second'] or 0:>10.0f} pages/s"
+                          f"{(result['peak_rss_bytes'] or 0) / 2**20:>8.1f} MB{result['output_bytes']:>12} bytes", flush=True)
+
+    return results
+
+
+def compare_with_baseline(results, baseline_results, tolerance):
+    """Compares the wall time of each result with the matching baseline result.
+
+    Args:
+        results (list[dict]): The results of this run.
+        baseline_results (list[dict]): The results of the baseline run.
+        tolerance (float): The fraction by which a case may be slower than the baseline before it counts as a regression.
+
+    Returns:
+        list[str]: A description of each regression, empty when there are none.
+    """
+    baseline = {(result['scenario'], result['case']): result for result in baseline_results}
+    regressions = []
+    for result in results:
+        previous = baseline.get((result['scenario'], result['case']))
+        if previous is None or not previous['wall_time_s']:
+            continue
+        ratio = result['wall_time_s'] / previous['wall_time_s']
+        print(f"{result['scenario']:<16}{result['case']:<28}{ratio:>8.2f}x baseline")
+        if ratio > 1 + tolerance:
+            regressions.append(f"{result['scenario']} {result['case']} is {ratio:.2f}x slower than the baseline")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description='Benchmark the score operations against synthetic scores.')
+    parser.add_argument('--parts', type=int, default=18, help='number of parts in each score (default: 18)')
+    parser.add_argument('--pages-per-part', type=int, default=4, help='number of pages in each part (default: 4)')
+    parser.add_argument('--kinds', nargs='+', choices=['vector', 'scanned'], default=['vector', 'scanned'], help='kinds of page to benchmark (default: both)')
+    parser.add_argument('--outlines', nargs='+', choices=['flat', 'nested'], default=['flat', 'nested'], help='kinds of outline to benchmark (default: both)')
+    parser.add_argument('--cases', nargs='+', choices=CASES, default=CASES, help='cases to run (default: all)')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='number of runs of each case, the median is recorded (default: 3)')
+    parser.add_argument('-o', '--output', help='file path to write the results JSON to')
+    parser.add_argument('-b', '--baseline', help='results JSON of a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='fraction slower than the baseline that counts as a regression (default: 0.2)')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.parts, args.pages_per_part, args.kinds, args.outlines, args.cases, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({
+                'environment': {'python': platform.python_version(), 'pypdf': pypdf.__version__, 'platform': platform.platform()},
+                'results': results,
+            }, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare_with_baseline(results, json.load(baseline)['results'], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""Measures the startup of the entry points with python -X importtime and enforces a budget on it.
+
+Short batch invocations are dominated by interpreter and import time, so the entry points import the score operations,
+and pypdf, Pillow and PySimpleGUI with them, only once they are needed. Each measurement runs in a fresh
+interpreter. Exits non-zero when an entry point imports over budget or loads a module that should be deferred.
+
+Example:
+    python -m benchmarks.startup --budget-ms 100 --repeat 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINTS = ['batch', 'catalog', 'dedupe', 'main', 'watch']
+DEFERRED_MODULES = ['pypdf', 'PIL', 'PySimpleGUI']
+
+
+def parse_importtime(stderr):
+    """Parses the report python -X importtime writes to stderr.
+
+    Args:
+        stderr (str): The stderr of an interpreter run with -X importtime.
+
+    Returns:
+        list[(str, int, int)]: The name, self time and cumulative time in microseconds of each module imported, in the order they finished importing.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_time, cumulative_time, name = line[len('import time:'):].split('|')
+        if not self_time.strip().isdigit():  # The header line
+            continue
+        imports.append((name.strip(), int(self_time), int(cumulative_time)))
+    return imports
+
+
+def import_time(module, repeat=5):
+    """Times the import of a module, each in a fresh interpreter started from the project directory.
+
+    Args:
+        module (str): The name of the module to import.
+        repeat (int): The number of times to import the module.
+
+    Returns:
+        (list[float], list[(str, int, int)]): The cumulative import time in seconds of each run and the imports of the last run, see parse_importtime.
+    """
+    timings = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=PROJECT_DIRECTORY,
+                                capture_output=True, text=True, check=True)
+        imports = parse_importtime(result.stderr)
+        timings.append(next(cumulative for name, _, cumulative in reversed(imports) if name == module) / 1e6)
+    return timings, imports
+
+
+def deferred_imports(imports, deferred_modules=DEFERRED_MODULES):
+    """Finds the modules that should be deferred among the given imports, see parse_importtime."""
+    return sorted({name.split('.')[0] for name, _, _ in imports} & set(deferred_modules))
+
+
+def command_time(arguments, repeat=5):
+    """Times a command line run with the interpreter from start to exit, each in a fresh interpreter.
+
+    Args:
+        arguments (list[str]): The arguments of the interpreter, e.g. ['-m', 'batch', '--help'].
+        repeat (int): The number of times to run the command.
+
+    Returns:
+        list[float]: The wall time in seconds of each run.
+    """
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        subprocess.run([sys.executable, *arguments], cwd=PROJECT_DIRECTORY, capture_output=True, check=True)
+        timings.append(time.perf_counter() - start_time)
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.startup', description=__doc__)
+    parser.add_argument('modules', nargs='*', default=ENTRY_POINTS, help=f"entry points to import (default: {' '.join(ENTRY_POINTS)})")
+    parser.add_argument('-b', '--budget-ms', type=float, default=100, help='median cumulative import time each entry point may take in ms (default: 100)')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='number of runs of each measurement (default: 5)')
+    parser.add_argument('--top', type=int, default=5, help='number of the slowest imports listed for each entry point (default: 5)')
+    args = parser.parse_args(argv)
+
+    failures = []
+    print(f"{'module':<12}{'median (ms)':>14}{'min (ms)':>12}  deferred modules loaded")
+    for module in args.modules:
+        timings, imports = import_time(module, args.repeat)
+        loaded = deferred_imports(imports)
+        median_ms = statistics.median(timings) * 1000
+        print(f"{module:<12}{median_ms:>14.1f}{min(timings) * 1000:>12.1f}  {', '.join(loaded) or '-'}")
+        for name, self_time, cumulative_time in sorted(imports, key=lambda entry: entry[2], reverse=True)[1:args.top + 1]:
+            print(f"    {name:<40}{cumulative_time / 1000:>8.1f} ms cumulative{self_time / 1000:>8.1f} ms self")
+        if median_ms > args.budget_ms:
+            failures.append(f"{module} imports in {median_ms:.1f} ms, over the {args.budget_ms:g} ms budget")
+        if loaded:
+            failures.append(f"{module} loads {', '.join(loaded)} at import")
+
+    timings = command_time(['-m', 'batch', '--help'], args.repeat)
+    print(f"python -m batch --help: {statistics.median(timings) * 1000:.1f} ms median wall time, interpreter start included")
+
+    for failure in failures:
+        print(f"OVER BUDGET: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
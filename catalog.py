@@ -0,0 +1,315 @@
+"""Searchable SQLite catalog of the complete sets and parts produced by the splitter.
+
+Jobs given a catalog record each output as it is created. Existing folders of parts are added with the bulk indexer, which
+reads only the trailer and document information of each pdf and skips files that are unchanged since they were indexed.
+
+Example:
+    python -m catalog index library --db library.sqlite --workers 8
+    python -m catalog query --db library.sqlite --part "Trombone 3" --style Calypso
+"""
+import argparse
+import hashlib
+import logging
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ('path', 'title', 'author', 'subject', 'tag', 'page_count', 'hash', 'mtime')
+
+
+def file_hash(file):
+    """Hashes the bytes of a file, reading it in chunks.
+
+    Args:
+        file (str): A file path representing the file to hash.
+
+    Returns:
+        str: The hex SHA-256 digest of the file.
+    """
+    digest = hashlib.sha256()
+    with open(file, "rb") as source:
+        for chunk in iter(lambda: source.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _info_text(info, key):
+    """Reads a value of the document information as a str, resolving it when it is stored as an indirect object."""
+    return str(info[key]) if key in info else None
+
+
+def read_pdf_record(file):
+    """Reads the catalog record of a pdf from its trailer and document information, without loading its pages.
+
+    The page count is read from the root of the page tree rather than by walking it.
+
+    Args:
+        file (str): A file path representing the pdf.
+
+    Returns:
+        dict: The record of the pdf, holding a value for each of COLUMNS.
+    """
+    from pypdf import PdfReader
+
+    stat = os.stat(file)
+    with open(file, "rb") as pdf_file:
+        pdf_reader = PdfReader(pdf_file)
+        info = pdf_reader.metadata or {}
+        page_count = pdf_reader.trailer["/Root"]["/Pages"].get("/Count", 0)
+        return {
+            'path': os.path.abspath(file),
+            'title': _info_text(info, '/Title'),
+            'author': _info_text(info, '/Author'),
+            'subject': _info_text(info, '/Subject'),
+            'tag': _info_text(info, '/Tags'),
+            'page_count': int(page_count),
+            'hash': file_hash(file),
+            'mtime': stat.st_mtime,
+        }
+
+
+def output_record(file, metadata, page_count, digest):
+    """Builds the catalog record of a pdf the splitter has just written from what it wrote, without reading the pdf back.
+
+    Args:
+        file (str): A file path representing the pdf.
+        metadata (dict[str, str]): The PDF standard metadata written into the pdf, including its '/Tags' for parts.
+        page_count (int): The number of pages written.
+        digest (str): The hex SHA-256 digest of the bytes written.
+
+    Returns:
+        dict: The record of the pdf, holding a value for each of COLUMNS, see read_pdf_record.
+    """
+    return {
+        'path': os.path.abspath(file),
+        'title': metadata.get('/Title'),
+        'author': metadata.get('/Author'),
+        'subject': metadata.get('/Subject'),
+        'tag': metadata.get('/Tags'),
+        'page_count': page_count,
+        'hash': digest,
+        'mtime': os.stat(file).st_mtime,
+    }
+
+
+def _read_pdf_record_or_error(file):
+    """Process pool worker that reads the record of a pdf.
+
+    Returns:
+        (dict, str): The record of the pdf and None, or None and the error when it cannot be read.
+    """
+    try:
+        return read_pdf_record(file), None
+    except Exception as error:
+        return None, f"{type(error).__name__}: {error}"
+
+
+class Catalog:
+    """The SQLite catalog, created on first use.
+
+    Several processes may record into the same catalog at once, the database is opened in write ahead log mode and
+    writers wait for each other.
+
+    Args:
+        database (str): A file path representing the SQLite database of the catalog.
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self.connection = sqlite3.connect(database, timeout=30)
+        self.connection.row_factory = sqlite3.Row
+        with self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS outputs (path TEXT PRIMARY KEY, title TEXT, author TEXT, subject TEXT, tag TEXT, page_count INTEGER, hash TEXT, mtime REAL)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS outputs_tag ON outputs (tag COLLATE NOCASE)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS outputs_hash ON outputs (hash)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the database."""
+        self.connection.close()
+
+    def upsert(self, records):
+        """Inserts the given records, replacing any existing record of the same path.
+
+        Args:
+            records (list[dict]): A list of records holding a value for each of COLUMNS, see read_pdf_record.
+        """
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT INTO outputs ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+                f"ON CONFLICT (path) DO UPDATE SET {', '.join(f'{column} = excluded.{column}' for column in COLUMNS[1:])}",
+                [tuple(record[column] for column in COLUMNS) for record in records],
+            )
+
+    def add_files(self, files):
+        """Reads the record of each of the given pdfs and inserts or replaces it.
+
+        Args:
+            files (list[str]): A list of file paths representing the pdfs to record.
+        """
+        self.upsert([read_pdf_record(file) for file in files])
+
+    def remove(self, files):
+        """Removes the records of the given files.
+
+        Args:
+            files (list[str]): A list of file paths representing the files to remove.
+        """
+        with self.connection:
+            self.connection.executemany("DELETE FROM outputs WHERE path = ?", [(os.path.abspath(file),) for file in files])
+
+    def mtimes(self, folder):
+        """Returns the modification time recorded for each file inside a folder.
+
+        Args:
+            folder (str): A file path representing the folder.
+
+        Returns:
+            dict[str, float]: A dictionary of absolute file path keys with their recorded modification time as values.
+        """
+        prefix = os.path.join(os.path.abspath(folder), '')
+        rows = self.connection.execute("SELECT path, mtime FROM outputs WHERE substr(path, 1, ?) = ?", (len(prefix), prefix))
+        return {row['path']: row['mtime'] for row in rows}
+
+    def hashes(self, folder):
+        """Returns the hash and modification time recorded for each file inside a folder.
+
+        Args:
+            folder (str): A file path representing the folder.
+
+        Returns:
+            dict[str, (str, float)]: A dictionary of absolute file path keys with their recorded hash and modification time as values.
+        """
+        prefix = os.path.join(os.path.abspath(folder), '')
+        rows = self.connection.execute("SELECT path, hash, mtime FROM outputs WHERE substr(path, 1, ?) = ?", (len(prefix), prefix))
+        return {row['path']: (row['hash'], row['mtime']) for row in rows}
+
+    def query(self, title=None, author=None, style=None, part=None):
+        """Finds the records matching every given filter. Title, author and style match any part of the value, part matches the whole part name. Filters ignore case.
+
+        Args:
+            title (str, optional): Text in the title.
+            author (str, optional): Text in the composer/arranger.
+            style (str, optional): Text in the style (subject).
+            part (str, optional): The part name (tag).
+
+        Returns:
+            list[dict]: The matching records, ordered by title then part name.
+        """
+        conditions, parameters = [], []
+        for column, value in (('title', title), ('author', author), ('subject', style)):
+            if value is not None:
+                conditions.append(f"{column} LIKE ? ESCAPE '\\'")
+                parameters.append('%' + value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        if part is not None:
+            conditions.append("tag = ? COLLATE NOCASE")
+            parameters.append(part)
+
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.connection.execute(f"SELECT {', '.join(COLUMNS)} FROM outputs{where} ORDER BY title, tag, path", parameters)
+        return [dict(row) for row in rows]
+
+
+def index_folders(database, folders, workers=None):
+    """Records every pdf inside the given folders in the catalog, reading only those that are new or changed since they were indexed.
+
+    Records of pdfs that no longer exist inside the folders are removed. Pdfs that cannot be read or recorded are skipped
+    with a warning, so one bad pdf does not stop the rest from being indexed.
+
+    Args:
+        database (str): A file path representing the SQLite database of the catalog.
+        folders (list[str]): A list of folder paths to index, including their sub folders.
+        workers (int, optional): The number of processes used to read pdfs in parallel. Pdfs are read in this process when not supplied.
+
+    Returns:
+        (int, int, int, int): The number of pdfs indexed, skipped as unchanged, removed and failed.
+    """
+    indexed = skipped = removed = failed = 0
+    with Catalog(database) as catalog:
+        for folder in folders:
+            recorded_mtimes = catalog.mtimes(folder)
+            files = {os.path.abspath(path): path.stat().st_mtime for path in Path(folder).rglob('*.pdf') if path.is_file()}
+            changed_files = [file for file, mtime in files.items() if recorded_mtimes.get(file) != mtime]
+            missing_files = [file for file in recorded_mtimes if file not in files]
+
+            if workers and len(changed_files) > 1:
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    results = list(executor.map(_read_pdf_record_or_error, changed_files, chunksize=max(len(changed_files) // (workers * 4), 1)))
+            else:
+                results = [_read_pdf_record_or_error(file) for file in changed_files]
+
+            records = []
+            for file, (record, error) in zip(changed_files, results):
+                if error is not None:
+                    logger.warning(f"Skipped {file}, it could not be read: {error}")
+                    failed += 1
+                else:
+                    records.append(record)
+            try:
+                catalog.upsert(records)
+            except (sqlite3.Error, ValueError):  # Falls back to one record at a time to skip only the records that fail
+                for record in list(records):
+                    try:
+                        catalog.upsert([record])
+                    except (sqlite3.Error, ValueError) as error:
+                        logger.warning(f"Skipped {record['path']}, it could not be recorded: {error}")
+                        records.remove(record)
+                        failed += 1
+            catalog.remove(missing_files)
+            indexed += len(records)
+            skipped += len(files) - len(changed_files)
+            removed += len(missing_files)
+
+    return indexed, skipped, removed, failed
+
+
+def main(argv=None):
+    """Runs the catalog command line.
+
+    Args:
+        argv (list[str], optional): The command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: The exit status.
+    """
+    parser = argparse.ArgumentParser(prog='python -m catalog', description='Index and search the complete sets and parts produced by the splitter.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    index_parser = commands.add_parser('index', help='add the pdfs inside folders to the catalog')
+    index_parser.add_argument('folders', nargs='+', help='folders to index, including their sub folders')
+    index_parser.add_argument('--db', default='catalog.sqlite', help='SQLite database of the catalog (default: catalog.sqlite)')
+    index_parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='number of processes reading pdfs (default: cpu count)')
+    query_parser = commands.add_parser('query', help='list the pdfs matching every given filter')
+    query_parser.add_argument('--db', default='catalog.sqlite', help='SQLite database of the catalog (default: catalog.sqlite)')
+    query_parser.add_argument('--title', help='text in the title')
+    query_parser.add_argument('--composer', help='text in the composer/arranger')
+    query_parser.add_argument('--style', help='text in the style')
+    query_parser.add_argument('--part', help='part name')
+    args = parser.parse_args(argv)
+
+    if args.command == 'index':
+        indexed, skipped, removed, failed = index_folders(args.db, args.folders, args.workers)
+        print(f"Indexed {indexed} pdfs, skipped {skipped} unchanged, removed {removed} missing, {failed} failed.")
+        return 0
+
+    with Catalog(args.db) as catalog:
+        records = catalog.query(title=args.title, author=args.composer, style=args.style, part=args.part)
+    for record in records:
+        print(f"{record['title'] or ''} | {record['tag'] or 'Complete Set'} | {record['author'] or ''} | {record['subject'] or ''} | {record['page_count']} pages | {record['path']}")
+    print(f"{len(records)} found.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,326 @@
+"""Shrinks the parts written from scanned scores for syncing to tablets.
+
+Embedded page images are downsampled to a target resolution and recompressed, as JPEG or, for monochrome scans, as bilevel
+CCITT Group 4. Page content streams are compressed and identical objects are merged. Recompressing images needs Pillow
+(pip install Pillow); compressing content streams and merging objects do not.
+
+Fonts, images and forms referenced by the pages of several parts are written into each of those parts. shared_resources
+reports them and how many bytes they add across the parts.
+
+Example:
+    compressor = PartCompressor(target_dpi=150, quality=75)
+    with ScoreJob('band_book.pdf', metadata, 'library', compressor=compressor) as job:
+        job.run(part_names)
+"""
+import hashlib
+import importlib.util
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pypdf import PdfReader
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+def pillow_installed():
+    """Checks whether Pillow is installed without importing it, it is only imported once an image is recompressed."""
+    return importlib.util.find_spec('PIL') is not None
+
+
+class _ByteCounter:
+    """Write only stream that only counts the bytes written to it, to measure the size a pdf would have without writing it."""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.size
+
+    def flush(self):
+        pass
+
+
+def pdf_size(pdf_writer):
+    """Measures the size the pdf of a writer would have by serializing it without storing the bytes.
+
+    Args:
+        pdf_writer (PdfWriter): The pdf writer to measure.
+
+    Returns:
+        int: The size of the pdf in bytes.
+    """
+    counter = _ByteCounter()
+    pdf_writer.write(counter)
+    return counter.size
+
+
+def _stream_bytes(obj):
+    """Totals the encoded data of a stream, or of the streams of an array such as the contents of a page, in bytes."""
+    obj = obj.get_object() if obj is not None else None
+    if isinstance(obj, ArrayObject):
+        return sum(_stream_bytes(value) for value in obj)
+    return len(obj._data or b"") if isinstance(obj, StreamObject) else 0
+
+
+def merge_identical_objects(pdf_writer):
+    """Merges the identical objects of a writer, so each font, image and form is written once, and drops unreferenced objects.
+
+    A pass of compress_identical_objects only merges objects whose references are identical before it starts, so copies of
+    a font (font, descriptor and font program) take a pass per level. Passes repeat until nothing is merged.
+
+    Args:
+        pdf_writer (PdfWriter): The pdf writer to merge the objects of.
+
+    Returns:
+        int: The bytes the objects merged or dropped would have taken in the pdf.
+    """
+    objects = list(pdf_writer._objects)
+    object_count = None
+    while True:
+        pdf_writer.compress_identical_objects()
+        merged_count = sum(obj is not None for obj in pdf_writer._objects)
+        if merged_count == object_count:
+            break
+        object_count = merged_count
+
+    # Only the objects dropped are serialized, to count the bytes they would have taken
+    counter = _ByteCounter()
+    for index, obj in enumerate(objects):
+        if obj is not None and pdf_writer._objects[index] is None:
+            counter.write(f"{index + 1} 0 obj\n".encode())
+            obj.write_to_stream(counter)
+            counter.write(b"\nendobj\n")  # Its cross reference entry is still written, as a free entry
+    return counter.size
+
+
+class PartCompressor:
+    """Recompresses the images and content of a part before it is written.
+
+    Images are assumed to span the width of their page, as scanned pages do, to work out their resolution. Images above the
+    target resolution are downsampled to it. Images with a soft mask or an explicit mask are left as they are.
+
+    Args:
+        target_dpi (int, optional): The resolution images are downsampled to. Images are left as they are when not supplied.
+        quality (int): The JPEG quality colour and greyscale images are recompressed with, 1 to 95.
+        bilevel (bool): Whether monochrome (1 bit) images stay bilevel, encoded as CCITT Group 4, rather than being converted to greyscale JPEG.
+        workers (int, optional): The number of threads recompressing images in parallel, defaults to the cpu count.
+        measure (bool): Whether the bytes each part saves are counted, so its size before compression can be reported from the size it is written at.
+
+    Raises:
+        ImportError: Throws when a target resolution is supplied and Pillow is not installed.
+    """
+
+    def __init__(self, target_dpi=150, quality=75, bilevel=True, workers=None, measure=True):
+        if target_dpi is not None and not pillow_installed():
+            raise ImportError('Pillow is required to recompress images, install it with: pip install Pillow')
+
+        self.target_dpi = target_dpi
+        self.quality = quality
+        self.bilevel = bilevel
+        self.workers = workers or os.cpu_count()
+        self.measure = measure
+
+    def settings(self):
+        """Returns the settings that change the bytes of a compressed part, recorded in the manifest so changing them recreates the parts.
+
+        Returns:
+            dict: The target resolution, JPEG quality and bilevel handling of images, or only the mode when images are left as they are.
+        """
+        if self.target_dpi is None:
+            return {'mode': 'dedupe'}
+        return {'mode': 'images', 'target_dpi': self.target_dpi, 'quality': self.quality, 'bilevel': self.bilevel}
+
+    def _page_images(self, pdf_writer):
+        """Finds each image of the writer once, returning its reference, the page it is on and the scale it is downsampled by."""
+        images = {}
+        for page in pdf_writer.pages:
+            xobjects = page.get("/Resources", {}).get("/XObject", {})
+            for name in xobjects:
+                reference = xobjects.raw_get(name)
+                image = xobjects[name]
+                if getattr(reference, 'idnum', None) is None or reference.idnum in images or image.get("/Subtype") != "/Image":
+                    continue
+                if "/SMask" in image or "/Mask" in image:
+                    continue
+                dpi = image["/Width"] * 72 / float(page.mediabox.width)
+                images[reference.idnum] = (reference, page, name, min(self.target_dpi / dpi, 1.0))
+        return list(images.values())
+
+    @staticmethod
+    def _decode_image(image):
+        """Decodes the common encodings of scanned pages straight into a Pillow image, None for any other encoding."""
+        from PIL import Image
+
+        filters = image.get("/Filter")
+        filters = [filters] if isinstance(filters, str) else list(filters or [])
+        color_space = image.get("/ColorSpace")
+        bits = image.get("/BitsPerComponent")
+        if "/Decode" in image or color_space not in ("/DeviceGray", "/DeviceRGB"):
+            return None
+
+        if filters == ["/DCTDecode"] and bits == 8:
+            return Image.open(io.BytesIO(image._data))
+        if set(filters) <= {"/FlateDecode"}:
+            mode = {("/DeviceGray", 1): '1', ("/DeviceGray", 8): 'L', ("/DeviceRGB", 8): 'RGB'}.get((color_space, bits))
+            if mode is not None:
+                return Image.frombytes(mode, (image["/Width"], image["/Height"]), image.get_data())
+        return None
+
+    def _recompress_image(self, reference, page, name, scale):
+        """Downsamples and recompresses a single image without changing the writer.
+
+        Returns:
+            StreamObject: The recompressed image, or None when recompressing does not make it smaller.
+        """
+        from PIL import Image
+
+        original = reference.get_object()
+        image = self._decode_image(original)
+        if image is None:
+            image = page.images[name].image
+
+        width, height = max(round(image.width * scale), 1), max(round(image.height * scale), 1)
+        if image.mode == '1' and self.bilevel:
+            if scale < 1.0:
+                image = image.convert('L').resize((width, height), Image.LANCZOS).point(lambda value: 255 if value >= 128 else 0, '1')
+        else:
+            if image.mode not in ('L', 'RGB'):
+                image = image.convert('L' if image.mode in ('1', 'LA') else 'RGB')
+            if scale < 1.0:
+                image = image.resize((width, height), Image.LANCZOS)
+
+        # Pillow encodes bilevel images as CCITT Group 4 and other images as JPEG when saving a pdf
+        encoded = io.BytesIO()
+        image.save(encoded, "PDF", **({} if image.mode == '1' else {'quality': self.quality}))
+        xobjects = PdfReader(encoded).pages[0]["/Resources"]["/XObject"]
+        recompressed = xobjects[next(iter(xobjects))]
+        return recompressed if len(recompressed._data) < len(original._data) else None
+
+    def compress(self, pdf_writer, part):
+        """Recompresses the images of a part in parallel, compresses its content streams and merges its identical objects.
+
+        Images are decoded, resized and encoded in worker threads. The writer is only changed by the calling thread, once
+        every image is done.
+
+        Args:
+            pdf_writer (PdfWriter): The pdf writer holding the part.
+            part (str): The name of the part, recorded on the span.
+
+        Returns:
+            int: The bytes the compression saved, counted from the streams it changed and the objects it dropped, so the size of the part before compression is its written size plus these. None when it is not measured.
+        """
+        saved = 0
+        with span('compress', part=part):
+            if self.target_dpi is not None:
+                images = self._page_images(pdf_writer)
+                with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                    recompressed_images = list(executor.map(lambda image: self._recompress_image(*image), images))
+                for (reference, _, _, _), recompressed in zip(images, recompressed_images):
+                    if recompressed is not None:
+                        saved += _stream_bytes(reference) - _stream_bytes(recompressed)
+                        # Replaces the object behind the reference, as pypdf's ImageFile.replace does
+                        recompressed.indirect_reference = reference
+                        pdf_writer._objects[reference.idnum - 1] = recompressed
+
+            for page in pdf_writer.pages:
+                contents_before = _stream_bytes(page.get("/Contents"))
+                page.compress_content_streams()
+                saved += contents_before - _stream_bytes(page.get("/Contents"))
+            saved += merge_identical_objects(pdf_writer)
+
+        return saved if self.measure else None
+
+
+def _hash_streams(obj, digest, seen):
+    """Adds the data of the streams an object holds or references to a digest, counting each referenced object once. Returns their size in bytes."""
+    if isinstance(obj, IndirectObject):
+        if obj.idnum in seen:
+            return 0
+        seen.add(obj.idnum)
+        obj = obj.get_object()
+
+    size = 0
+    if isinstance(obj, StreamObject):
+        data = obj._data or b""
+        digest.update(data)
+        size += len(data)
+    if isinstance(obj, DictionaryObject):
+        size += sum(_hash_streams(obj[key], digest, seen) for key in sorted(obj) if key != "/Parent")
+    elif isinstance(obj, ArrayObject):
+        size += sum(_hash_streams(value, digest, seen) for value in obj)
+    return size
+
+
+def shared_resources(pdf_reader, part_page_nums):
+    """Finds the fonts, images and forms used by the pages of more than one part, each of which is written into every part using it.
+
+    Resources are matched by the data of their streams, so identical copies (e.g. a font embedded again on every page) count
+    as one resource. Resources without streams, such as standard fonts, are matched by object.
+
+    Args:
+        pdf_reader (PdfReader): The reader of the score.
+        part_page_nums (dict[str, (int, int)]): A dictionary of part name keys with tuple values that represent their start and end pages (zero indexed & inclusive).
+
+    Returns:
+        list[dict]: For each shared resource its name, type ('font', 'image' or 'form'), the size in bytes of its streams, the parts using it and the number of copies of it in the score, largest total first.
+    """
+    keys = {}
+    resources = {}
+    for part, (start_page, end_page) in part_page_nums.items():
+        for page_number in range(max(start_page, 0), min(end_page, len(pdf_reader.pages) - 1) + 1):
+            page_resources = pdf_reader.pages[page_number].get("/Resources", {})
+            for category in ("/Font", "/XObject"):
+                entries = page_resources.get(category, {})
+                for name in entries:
+                    reference = entries.raw_get(name)
+                    if not isinstance(reference, IndirectObject):
+                        continue
+                    if reference.idnum not in keys:
+                        digest = hashlib.sha256()
+                        size = _hash_streams(reference, digest, set())
+                        keys[reference.idnum] = (category, digest.digest() if size else reference.idnum, size)
+                    key = keys[reference.idnum]
+                    if key not in resources:
+                        subtype = reference.get_object().get("/Subtype")
+                        kind = 'font' if category == "/Font" else {"/Image": 'image', "/Form": 'form'}.get(subtype, 'xobject')
+                        resources[key] = {'name': name, 'type': kind, 'bytes': key[2], 'parts': {}, 'objects': set()}
+                    resources[key]['parts'][part] = None
+                    resources[key]['objects'].add(reference.idnum)
+
+    shared = [{'name': resource['name'], 'type': resource['type'], 'bytes': resource['bytes'], 'parts': list(resource['parts']), 'copies': len(resource['objects'])}
+              for resource in resources.values() if len(resource['parts']) > 1]
+    shared.sort(key=lambda resource: resource['bytes'] * len(resource['parts']), reverse=True)
+    return shared
+
+
+def duplicated_bytes(shared):
+    """Totals the bytes the given shared resources add by being written into every part using them beyond the first, see shared_resources."""
+    return sum(resource['bytes'] * (len(resource['parts']) - 1) for resource in shared)
+
+
+def format_shared_resources(shared, top=5):
+    """Formats the resources shared across parts as a summary line followed by a line for each of the largest, see shared_resources.
+
+    Args:
+        shared (list[dict]): The shared resources, as returned by shared_resources.
+        top (int): The number of resources listed after the summary.
+
+    Returns:
+        str: The report, one line per entry.
+    """
+    lines = [f"{len(shared)} resources shared across parts, adding {format_size(duplicated_bytes(shared))} beyond one copy each"]
+    for resource in shared[:top]:
+        lines.append(f"    {resource['type']:<6}{resource['name']:<12}{format_size(resource['bytes']):>10} in {len(resource['parts'])} parts, {resource['copies']} copies in the score")
+    return '\n'.join(lines)
+
+
+def format_size(size):
+    """Formats a size in bytes as kB or MB for logging."""
+    return f"{size / 2**20:.1f} MB" if size >= 2**20 else f"{size / 2**10:.0f} kB"
@@ -0,0 +1,210 @@
+"""Saves the space of identical outputs across library trees by materialising them as hard links or reflinks.
+
+The same part often lands in several trees (per concert, per ensemble, archive copies). mirror_tree places the outputs of
+a run into other trees as links rather than copies, and dedupe_files replaces byte identical files already in the trees
+with links to one of them. Files are matched by size, then by hash. Hashes recorded in a catalog are reused for files
+unchanged since they were indexed.
+
+Reflinks (btrfs, XFS) are the default: the files stay independent and only share blocks until one is changed. Hard links
+share the file itself, so annotating one copy changes every copy. Where the file system supports neither, mirror_tree
+copies the bytes and dedupe_files leaves the files as they are.
+
+Both report the bytes linking saved and the write time it saved, estimated from a timed copy of the largest file linked
+less the time the links took.
+
+Example:
+    python -m dedupe library/concerts library/ensembles archive --link reflink --db library.sqlite
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from catalog import Catalog, file_hash
+from file_operations import LINK_COPY, LINK_POLICIES, LINK_REFLINK, link_file, make_directories, probe_link, time_copy
+
+
+def _visible_files(directory):
+    """Finds the files under a directory, skipping hidden files and folders such as manifests, caches and temporary files."""
+    return sorted(str(path) for path in Path(directory).rglob('*')
+                  if path.is_file() and not any(part.startswith('.') for part in path.relative_to(directory).parts))
+
+
+def _empty_report():
+    """Starts a report of the files linked, copied and skipped, the bytes not written, the write time saved and the time taken."""
+    return {'linked': 0, 'copied': 0, 'skipped': 0, 'bytes_saved': 0, 'write_seconds_saved': 0.0, 'seconds': 0.0}
+
+
+def _write_seconds_saved(linked_files, link_seconds):
+    """Estimates the write time linking saved: the time copying the linked files would have taken, less the time the links took.
+
+    The copy time is measured by copying the largest linked file into its folder once, and scaled by the bytes linked.
+
+    Args:
+        linked_files (list[(str, str)]): The file linked and the folder it was linked into, for each link.
+        link_seconds (float): The wall time in seconds the links took.
+
+    Returns:
+        float: The write time saved in seconds, 0 when linking was no faster.
+    """
+    if not linked_files:
+        return 0.0
+    sizes = [os.path.getsize(file) for file, _ in linked_files]
+    largest = max(range(len(sizes)), key=sizes.__getitem__)
+    copy_seconds = time_copy(*linked_files[largest])
+    return max(copy_seconds * sum(sizes) / max(sizes[largest], 1) - link_seconds, 0.0)
+
+
+def find_identical_files(files, catalog=None):
+    """Groups files with identical bytes, comparing sizes first so only files of the same size are hashed.
+
+    Args:
+        files (list[str]): A list of file paths representing the files to compare.
+        catalog (str, optional): A file path representing the SQLite database of a catalog whose recorded hashes are reused for files unchanged since they were indexed.
+
+    Returns:
+        list[list[str]]: A list of groups of two or more file paths with identical bytes, each group in the order the files were given.
+    """
+    sizes = {}
+    for file in files:
+        sizes.setdefault(os.path.getsize(file), []).append(file)
+    candidates = [file for same_size in sizes.values() if len(same_size) > 1 for file in same_size]
+
+    recorded_hashes = {}
+    if catalog is not None and candidates:
+        with Catalog(catalog) as opened_catalog:
+            for folder in {os.path.dirname(os.path.abspath(file)) for file in candidates}:
+                recorded_hashes.update(opened_catalog.hashes(folder))
+
+    groups = {}
+    for file in candidates:
+        recorded_hash, recorded_mtime = recorded_hashes.get(os.path.abspath(file), (None, None))
+        digest = recorded_hash if recorded_hash and recorded_mtime == os.path.getmtime(file) else file_hash(file)
+        groups.setdefault((os.path.getsize(file), digest), []).append(file)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def dedupe_files(files, policy=LINK_REFLINK, catalog=None, dry_run=False):
+    """Replaces each file that is identical to an earlier file with a link to the earlier file. Files the file system cannot link are left as they are.
+
+    Args:
+        files (list[str]): A list of file paths representing the files to deduplicate, the first of each group of identical files is kept.
+        policy (str): One of file_operations.LINK_POLICIES, the kind of link tried first. 'copy' links nothing.
+        catalog (str, optional): A file path representing the SQLite database of a catalog whose recorded hashes are reused, see find_identical_files.
+        dry_run (bool): Whether to only report what linking would save, probing each folder with a hidden temporary link to find whether it can be linked into.
+
+    Returns:
+        dict: The number of files linked, left as copies ('copied') and already linked ('skipped'), the bytes and write time saved and the seconds taken.
+    """
+    start_time = time.perf_counter()
+    report = _empty_report()
+    probed_methods = {}
+    linked_files = []
+    link_seconds = 0.0
+    for kept_file, *identical_files in find_identical_files(files, catalog):
+        for file in identical_files:
+            if os.path.samefile(kept_file, file):
+                report['skipped'] += 1
+                continue
+            size = os.path.getsize(file)
+            directory = os.path.dirname(os.path.abspath(file))
+            link_start_time = time.perf_counter()
+            if dry_run:
+                key = (os.stat(kept_file).st_dev, directory)
+                if key not in probed_methods:
+                    probed_methods[key] = probe_link(kept_file, directory, policy)
+                method = probed_methods[key]
+            else:
+                method = link_file(kept_file, file, policy, copy=False)
+            if method is None:
+                report['copied'] += 1
+            else:
+                link_seconds += time.perf_counter() - link_start_time
+                linked_files.append((kept_file, directory))
+                report['linked'] += 1
+                report['bytes_saved'] += size
+
+    report['seconds'] = time.perf_counter() - start_time
+    report['write_seconds_saved'] = _write_seconds_saved(linked_files, link_seconds)
+    return report
+
+
+def mirror_tree(source_directory, mirror_directories, policy=LINK_REFLINK):
+    """Places every visible file of a tree into each mirror tree at the same relative path, as links where the file system supports them and copies otherwise.
+
+    Files already identical in a mirror are skipped, so reruns only link outputs that changed.
+
+    Args:
+        source_directory (str): A file path representing the tree to mirror, e.g. the output directory of a run.
+        mirror_directories (list[str]): A list of file paths representing the trees to place the files in.
+        policy (str): One of file_operations.LINK_POLICIES, the kind of link tried first.
+
+    Returns:
+        dict: The number of files linked, copied and skipped as unchanged, the bytes and write time saved by linking and the seconds taken.
+    """
+    start_time = time.perf_counter()
+    report = _empty_report()
+    linked_files = []
+    link_seconds = 0.0
+    files = _visible_files(source_directory)
+    hashes = {}
+    for mirror_directory in mirror_directories:
+        destinations = {file: os.path.join(mirror_directory, os.path.relpath(file, source_directory)) for file in files}
+        make_directories([os.path.dirname(destination) for destination in destinations.values()])
+        for file, destination in destinations.items():
+            if os.path.exists(destination):
+                if os.path.samefile(file, destination):
+                    report['skipped'] += 1
+                    continue
+                if os.path.getsize(file) == os.path.getsize(destination):
+                    if file not in hashes:
+                        hashes[file] = file_hash(file)
+                    if hashes[file] == file_hash(destination):
+                        report['skipped'] += 1
+                        continue
+            link_start_time = time.perf_counter()
+            if link_file(file, destination, policy) == LINK_COPY:
+                report['copied'] += 1
+            else:
+                link_seconds += time.perf_counter() - link_start_time
+                linked_files.append((file, os.path.dirname(destination)))
+                report['linked'] += 1
+                report['bytes_saved'] += os.path.getsize(file)
+
+    report['seconds'] = time.perf_counter() - start_time
+    report['write_seconds_saved'] = _write_seconds_saved(linked_files, link_seconds)
+    return report
+
+
+def format_report(report):
+    """Formats a report of dedupe_files or mirror_tree as a single line."""
+    from compression import format_size
+    return (f"Linked {report['linked']} files, saving {format_size(report['bytes_saved'])} and about "
+            f"{report['write_seconds_saved']:.2f}s of writing, copied {report['copied']}, "
+            f"skipped {report['skipped']} already identical, in {report['seconds']:.2f}s.")
+
+
+def main(argv=None):
+    """Runs the dedupe command line.
+
+    Args:
+        argv (list[str], optional): The command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: The exit status.
+    """
+    parser = argparse.ArgumentParser(prog='python -m dedupe', description='Replace identical files across library trees with hard links or reflinks.')
+    parser.add_argument('folders', nargs='+', help='trees to deduplicate, files in earlier trees are kept and later identical files linked to them')
+    parser.add_argument('--link', choices=LINK_POLICIES, default=LINK_REFLINK,
+                        help="kind of link tried first: 'reflink' shares blocks until a copy changes, 'hardlink' shares the file itself and falls back to a reflink (default: reflink)")
+    parser.add_argument('--db', help='SQLite catalog whose recorded hashes are reused for unchanged files, see python -m catalog index')
+    parser.add_argument('--dry-run', action='store_true', help='only report what linking would save')
+    args = parser.parse_args(argv)
+
+    files = [file for folder in args.folders for file in _visible_files(folder)]
+    print(format_report(dedupe_files(files, args.link, args.db, args.dry_run)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,230 @@
+import errno
+import logging
 import os
 import shutil
+import time
+from contextlib import contextmanager
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+FSYNC_NONE = 'none'
+FSYNC_FILE = 'file'
+FSYNC_FULL = 'full'
+FSYNC_POLICIES = (FSYNC_NONE, FSYNC_FILE, FSYNC_FULL)
+
+LINK_COPY = 'copy'
+LINK_REFLINK = 'reflink'
+LINK_HARDLINK = 'hardlink'
+LINK_POLICIES = (LINK_COPY, LINK_REFLINK, LINK_HARDLINK)
+
+# Linux ioctl that clones the extents of one file into another on file systems with copy on write (btrfs, XFS, bcachefs)
+_FICLONE = 0x40049409
+
+# Temporary files are opened with the flags of tempfile.mkstemp but the mode of a plain open(), so the umask applies and
+# outputs get the permissions a plain open() would give them
+_TEMP_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_NOFOLLOW', 0) | getattr(os, 'O_BINARY', 0)
+
+
+def make_directories(directories):
+    """Utility function to create every directory (and its parents) that does not yet exist in one batch, each directory once.
+
+    Args:
+        directories (list[str]): A list of directory paths to create.
+    """
+    for directory in sorted(set(directories)):
+        os.makedirs(directory, exist_ok=True)
+
+
+def _temp_path(directory, file_name):
+    """Returns an unused looking path for a hidden temporary file next to the given file."""
+    return os.path.join(directory, f".{file_name}.{os.urandom(8).hex()}.tmp")
+
+
+def _create_temp_file(directory, file_name):
+    """Creates a hidden temporary file next to the given file with the permissions the umask gives new files.
+
+    Returns:
+        (int, str): The file descriptor of the file, open for writing, and its path.
+    """
+    while True:
+        temp_path = _temp_path(directory, file_name)
+        try:
+            return os.open(temp_path, _TEMP_FLAGS, 0o666), temp_path
+        except FileExistsError:
+            continue
+
+
+def _fsync_directory(directory):
+    """Flushes a directory entry to disk where the platform supports opening directories."""
+    try:
+        directory_fd = os.open(directory, os.O_RDONLY)
+    except OSError:  # Not supported on Windows
+        return
+    try:
+        os.fsync(directory_fd)
+    finally:
+        os.close(directory_fd)
+
+
+@contextmanager
+def atomic_write(output_file_path, mode="wb", fsync=FSYNC_NONE, copy_from=None, span_fields=None):
+    """Utility context manager that writes a file through a hidden temporary file in its final folder, replacing the file only once it is complete.
+
+    Readers of the folder (e.g. sync clients) never see a partially written file, and the temporary file is removed if writing fails.
+
+    Args:
+        output_file_path (str): A file path representing the location of the file to write.
+        mode (str): The mode to open the temporary file with, "wb" or "w".
+        fsync (str): One of FSYNC_POLICIES. 'file' flushes the file to disk before it replaces the destination, 'full' also flushes the folder afterwards.
+        copy_from (str, optional): A file path whose contents the temporary file starts with, in which case it is opened for appending.
+        span_fields (dict, optional): Fields recorded on the 'write' span that times closing, flushing and replacing the file.
+
+    Yields:
+        file: The open temporary file to write to.
+    """
+    if fsync not in FSYNC_POLICIES:
+        raise ValueError(f"Unknown fsync policy '{fsync}', expected one of {', '.join(FSYNC_POLICIES)}")
+
+    directory, file_name = os.path.split(os.path.abspath(output_file_path))
+    temp_fd, temp_path = _create_temp_file(directory, file_name)
+    try:
+        if copy_from is not None:
+            os.close(temp_fd)
+            shutil.copyfile(copy_from, temp_path)
+            temp_file = open(temp_path, mode.replace("w", "a"))
+        else:
+            temp_file = os.fdopen(temp_fd, mode)
+
+        try:
+            yield temp_file
+        except BaseException:
+            temp_file.close()
+            raise
+
+        with span('write', **(span_fields or {})):
+            if fsync != FSYNC_NONE:
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            temp_file.close()
+            os.replace(temp_path, output_file_path)
+            if fsync == FSYNC_FULL:
+                _fsync_directory(directory)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _move_file(file, destination):
+    """Moves a file with a rename, or across file systems by copying it into place atomically and removing the original."""
+    try:
+        os.replace(file, destination)
+    except OSError as error:
+        if error.errno != errno.EXDEV:
+            raise
+        with open(file, "rb") as source, atomic_write(destination) as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+        os.remove(file)
+
+
+def _reflink(source, destination):
+    """Clones a file into place atomically, sharing its blocks until either file is changed."""
+    try:
+        import fcntl
+    except ImportError:  # Windows
+        raise OSError(errno.ENOTSUP, 'Reflinks are not supported on this platform')
+    with open(source, "rb") as source_file, atomic_write(destination) as target:
+        fcntl.ioctl(target.fileno(), _FICLONE, source_file.fileno())
+
+
+def _hardlink(source, destination):
+    """Hard links a file into place atomically, replacing any existing file. Does nothing when the destination is already a link to the file."""
+    if os.path.exists(destination) and os.path.samefile(source, destination):
+        return
+    directory, file_name = os.path.split(os.path.abspath(destination))
+    temp_path = _temp_path(directory, file_name)
+    os.link(source, temp_path)
+    try:
+        os.replace(temp_path, destination)
+    finally:
+        # A rename between two links to the same file does nothing and leaves the temporary link in place
+        if os.path.lexists(temp_path):
+            os.remove(temp_path)
+
+
+def link_file(source, destination, policy=LINK_REFLINK, copy=True):
+    """Utility function to materialise a copy of a file as a hard link or reflink where the file system supports it, replacing any existing file.
+
+    Hard links share the file itself, so a change to either path shows in both. Reflinks share only the blocks, which are
+    copied once either file is changed. A hard link falls back to a reflink, and a reflink to a copy.
+
+    Args:
+        source (str): A file path representing the file to copy.
+        destination (str): A file path representing the location of the copy.
+        policy (str): One of LINK_POLICIES, the first method tried.
+        copy (bool): Whether to fall back to copying the bytes when the file cannot be linked.
+
+    Returns:
+        str: The method used, one of LINK_POLICIES, or None when the file could not be linked and copying is disabled.
+    """
+    if policy not in LINK_POLICIES:
+        raise ValueError(f"Unknown link policy '{policy}', expected one of {', '.join(LINK_POLICIES)}")
+
+    methods = {LINK_HARDLINK: (LINK_HARDLINK, LINK_REFLINK), LINK_REFLINK: (LINK_REFLINK,), LINK_COPY: ()}[policy]
+    with span('link', file=destination):
+        for method in methods:
+            try:
+                (_hardlink if method == LINK_HARDLINK else _reflink)(source, destination)
+                return method
+            except OSError as error:
+                logger.debug(f"Could not {method} {source} to {destination}: {error}")
+
+        if not copy:
+            return None
+        with open(source, "rb") as source_file, atomic_write(destination) as target:
+            shutil.copyfileobj(source_file, target, 1024 * 1024)
+        return LINK_COPY
+
+
+def probe_link(source, directory, policy=LINK_REFLINK):
+    """Utility function to find how link_file would place a copy of a file in a folder, by linking it to a hidden temporary file that is removed straight away.
+
+    Args:
+        source (str): A file path representing the file to link.
+        directory (str): A directory path representing the folder the copy would be placed in.
+        policy (str): One of LINK_POLICIES, the first method tried.
+
+    Returns:
+        str: The link method link_file would use, LINK_HARDLINK or LINK_REFLINK, or None when the file would be copied.
+    """
+    temp_path = _temp_path(directory, os.path.basename(source))
+    try:
+        return link_file(source, temp_path, policy, copy=False)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def time_copy(source, directory):
+    """Utility function to time copying a file into a folder the way link_file copies it, into a hidden temporary file that is removed afterwards.
+
+    Args:
+        source (str): A file path representing the file to copy.
+        directory (str): A directory path representing the folder to copy it into.
+
+    Returns:
+        float: The wall time in seconds the copy took.
+    """
+    temp_path = _temp_path(directory, os.path.basename(source))
+    start_time = time.perf_counter()
+    try:
+        link_file(source, temp_path, LINK_COPY)
+        return time.perf_counter() - start_time
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
 
 def move_files_to_directories(files, target_directories):
     """Utility function to move files (parts) into new directory locations (part folders).
@@ -14,14 +239,14 @@ def move_files_to_directories(files, target_directories):
             if not os.path.exists(file):
                 raise FileNotFoundError
 
-        for file, target_directory in zip(files, target_directories):
-            # If folders dont yet exist make them
-            if not os.path.exists(target_directory):
-                os.makedirs(target_directory)
+        # If folders dont yet exist make them, all at once
+        make_directories(target_directories[:len(files)])
 
+        for file, target_directory in zip(files, target_directories):
             # Move files to folders - will replace any existing files of the same name
-            shutil.move(file, os.path.join(target_directory, os.path.basename(file)))
-            print(f"Moved {file} to {target_directory}.")
+            with span('move', file=file):
+                _move_file(file, os.path.join(target_directory, os.path.basename(file)))
+            logger.info(f"Moved {file} to {target_directory}.")
     
     except FileNotFoundError:
         print(f"File not found: {file}")
@@ -48,4 +273,16 @@ def convert_string_to_array(text):
     Returns:
         list[str]: An array of strings representing the converted text. 
     """
-    return text.split('\n')
\ No newline at end of file
+    return text.split('\n')
+
+def read_part_names(file):
+    """Utility function to read the part names listed in a parts .txt file, one part name per line.
+
+    Args:
+        file (str): A file path representing a .txt file of part names (see Parts_Default.txt).
+
+    Returns:
+        list[str]: An array of strings representing the part names in the order they are listed, ignoring blank lines.
+    """
+    with open(file, "r") as parts_file:
+        return [line.strip() for line in parts_file if line.strip()]
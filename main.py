@@ -1,11 +1,22 @@
-import PySimpleGUI as sg
-from file_operations import convert_txt_file_to_string, convert_string_to_array, move_files_to_directories
-from pdf_operations import add_metadata, split_score_by_bookmarks
+"""Score Splitter GUI.
 
-# Misc
-sg.theme("TealMono")
-default_parts = convert_txt_file_to_string('parts_default.txt')
-help_text = convert_txt_file_to_string('help.txt')
+PySimpleGUI is imported when the window is built and the score operations, with pypdf, when the first job starts, so the
+window shows without waiting on them.
+
+Example:
+    python main.py
+"""
+import logging
+import os
+import threading
+import time
+from file_operations import convert_txt_file_to_string, convert_string_to_array
+
+logger = logging.getLogger(__name__)
+
+APP_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PARTS_FILE = os.path.join(APP_DIRECTORY, 'Parts_Default.txt')
+HELP_FILE = os.path.join(APP_DIRECTORY, 'help.txt')
 
 # Fonts
 h1 = ("Helvetica", 36)
@@ -14,91 +25,208 @@ h3 = ("Helvetica", 14)
 body = ("Helvetica", 12)
 button_font = ("Helvetica", 18)
 
-# Elements
-submit = sg.Button("Submit", font=button_font)
-reset = sg.Button("Reset", font=button_font)
-help = sg.Button("?",font=button_font)
-form_buttons = [sg.HorizontalSeparator(pad=20, color=(173, 204, 218)), reset, sg.HorizontalSeparator(color=(173, 204, 218)), submit, sg.HorizontalSeparator(pad=(160,0), color=(173, 204, 218)), help,  sg.HorizontalSeparator(pad=(1,0), color=(173, 204, 218))]
-header = [sg.Push(), sg.Text("Score Splitter", font=h1), sg.Push()]
-input_output_file = [sg.Text("Input/Output", font=h2)]
-score_title = [sg.Text("Score:", font=h3)]
-score_browse = [sg.Input(key="score", font=body), sg.FileBrowse()]
-output_title = [sg.Text("Output Directory:", font=h3)]
-output_browse = [sg.Input(key="output", font=body), sg.FolderBrowse()]
-meta_title = [sg.Text("Metadata", font=h2)]
-title_title = [(sg.Text("Title:", font=h3))]
-title_input = [sg.Input(key="title", font=body)]
-composer_title = [sg.Text("Composer/Arranger:", font=h3)]
-composer_input = [sg.Input(key="composer", font=body)]
-style_title = [sg.Text("Style:", font=h3)]
-style_input = [sg.Input(key="style", font=body)]
-parts_input_title = [sg.Text("Parts", font=h2)]
-parts_input = [sg.Multiline(default_parts, size=(40, 20), font=body, key="part_names")]
-output_checkbox = [sg.Checkbox('Output to individual part folders',font=h3, key='checkbox', default=True)]
-
-
-col1 = [
-    input_output_file,
-    score_title,
-    score_browse,
-    output_title,
-    output_browse,
-    output_checkbox,
-    meta_title,
-    title_title,
-    title_input,
-    composer_title,
-    composer_input,
-    style_title,
-    style_input,
-]
-
-col2 = [[sg.VSeparator(pad=10)],parts_input_title, parts_input,]
-
-# Create Layout
-layout = [header, [sg.Push(), sg.Column(col1), sg.Column(col2), sg.Push()], [sg.VerticalSeparator(pad=(0,10))], form_buttons]
-
-# Create the Window
-window = sg.Window("Score Splitter", layout, size=(800, 500))
-
-# Event Loop to process "events" and get the "values" of the inputs
-while True:
-    event, values = window.read()
-    if event == "?":
-        sg.popup_scrolled(help_text, title='Score Splitter Instructions',font=h3, size=(50,10))
-    if event == "Reset":
-        window["score"].update("")
-        window["title"].update("")
-        window["composer"].update("")
-        window["style"].update("")
-        window['part_names'].update(default_parts)
-    if event == "Submit":
-        # Get data from form
-        score_path = values["score"]
-        output_path = values["output"]
-        title = values["title"].strip()
-        author = values["composer"].strip()
-        subject = values["style"].strip()
-        score_metadata = {"/Title": title, "/Author": author, "/Subject": subject}
-        parts = convert_string_to_array(values['part_names'])
-
-
-        # Get part names & final directory paths
-        part_folder_directories = [f"{output_path}/{part}" for part in parts]
-        part_file_paths = [f"{output_path}/{title} - {part}.pdf" for part in parts]
-
-        # Add metadata to the score & output to directory
-        add_metadata(score_path, output_path, score_metadata)
-
-        # Split score into parts
-        split_score_by_bookmarks(score_path, parts, score_metadata, output_path)
-
-        # Move files to directories
-        if (values['checkbox'] == True):
-            move_files_to_directories(part_file_paths, part_folder_directories)
-
-    if event == sg.WIN_CLOSED: 
-        break
-
-
-window.close()
+
+def build_window(default_parts):
+    """Builds the main window.
+
+    Args:
+        default_parts (str): The part names the parts input starts with, one per line.
+
+    Returns:
+        sg.Window: The window, not yet shown.
+    """
+    import PySimpleGUI as sg
+
+    # Elements
+    submit = sg.Button("Submit", font=button_font)
+    cancel = sg.Button("Cancel", font=button_font, disabled=True)
+    reset = sg.Button("Reset", font=button_font)
+    help = sg.Button("?",font=button_font)
+    form_buttons = [sg.HorizontalSeparator(pad=20, color=(173, 204, 218)), reset, sg.HorizontalSeparator(color=(173, 204, 218)), submit, cancel, sg.HorizontalSeparator(pad=(100,0), color=(173, 204, 218)), help,  sg.HorizontalSeparator(pad=(1,0), color=(173, 204, 218))]
+    header = [sg.Push(), sg.Text("Score Splitter", font=h1), sg.Push()]
+    input_output_file = [sg.Text("Input/Output", font=h2)]
+    score_title = [sg.Text("Score:", font=h3)]
+    score_browse = [sg.Input(key="score", font=body), sg.FileBrowse()]
+    output_title = [sg.Text("Output Directory:", font=h3)]
+    output_browse = [sg.Input(key="output", font=body), sg.FolderBrowse()]
+    meta_title = [sg.Text("Metadata", font=h2)]
+    title_title = [(sg.Text("Title:", font=h3))]
+    title_input = [sg.Input(key="title", font=body)]
+    composer_title = [sg.Text("Composer/Arranger:", font=h3)]
+    composer_input = [sg.Input(key="composer", font=body)]
+    style_title = [sg.Text("Style:", font=h3)]
+    style_input = [sg.Input(key="style", font=body)]
+    parts_input_title = [sg.Text("Parts", font=h2)]
+    parts_input = [sg.Multiline(default_parts, size=(40, 20), font=body, key="part_names")]
+    progress_bar = [sg.ProgressBar(1, orientation='h', size=(60, 10), key='progress')]
+    progress_status = [sg.Text("", font=body, key='progress_status', size=(70, 1))]
+    output_checkbox = [sg.Checkbox('Output to individual part folders',font=h3, key='checkbox', default=True)]
+    zip_checkbox = [sg.Checkbox('Bundle into a single ZIP', font=h3, key='zip', default=False)]
+    compress_checkbox = [sg.Checkbox('Compress images for tablets (150 dpi)', font=h3, key='compress', default=False)]
+    detect_checkbox = [sg.Checkbox('Find parts from page headers (no bookmarks)', font=h3, key='detect', default=False)]
+
+
+    col1 = [
+        input_output_file,
+        score_title,
+        score_browse,
+        output_title,
+        output_browse,
+        output_checkbox,
+        zip_checkbox,
+        detect_checkbox,
+        compress_checkbox,
+        meta_title,
+        title_title,
+        title_input,
+        composer_title,
+        composer_input,
+        style_title,
+        style_input,
+    ]
+
+    col2 = [[sg.VSeparator(pad=10)],parts_input_title, parts_input,]
+
+    # Create Layout
+    layout = [header, [sg.Push(), sg.Column(col1), sg.Column(col2), sg.Push()], [sg.VerticalSeparator(pad=(0,10))], progress_bar, progress_status, form_buttons]
+
+    return sg.Window("Score Splitter", layout, size=(800, 640))
+
+
+def run_score_job(window, score_path, score_metadata, output_path, part_folders, zip_bundle, detect_parts, compress, parts, cancel_event):
+    """Worker thread that creates the complete set & parts and posts its progress back to the event loop.
+
+    Args:
+        window (sg.Window): The window whose event loop receives the progress and done events.
+        score_path (str): A file path representing the pdf of the score to be split into parts.
+        score_metadata (dict[str,str]): A dictionary of key/value pairs representing the metadata to add to the pdf.
+        output_path (str): A file path representing the output directory location to store the newly created files.
+        part_folders (bool): Whether each part is output into its own part named folder.
+        zip_bundle (bool): Whether the complete set and parts are written into a single ZIP instead of separate files.
+        detect_parts (bool): Whether the pages of each part are found from the part names in the page headers instead of the bookmarks.
+        compress (bool): Whether the page images of each part are downsampled to 150 dpi and recompressed.
+        parts (list[str]): A list of part names that correlate with the bookmarks of the score.
+        cancel_event (threading.Event): An event that cancels the job between parts when set.
+    """
+    from compression import PartCompressor, format_size
+    from part_detection import detect_part_pages
+    from pdf_operations import JobCancelled, ScoreJob, plan_split
+
+    def post_progress(*progress):
+        window.write_event_value('-PROGRESS-', progress)
+
+    message = 'The job stopped unexpectedly.'
+    try:
+        # Find the pages of each part before anything is written
+        if detect_parts:
+            window.write_event_value('-STATUS-', 'Reading page headers...')
+            part_page_nums = detect_part_pages(score_path, parts, workers=os.cpu_count(), cache_file=f"{output_path}/.{score_metadata['/Title']} - Header Cache.json")
+            mismatches = []
+        else:
+            plan = plan_split(score_path, parts)
+            part_page_nums, mismatches = plan['parts'], plan['mismatches']
+
+        if mismatches:
+            message = f"Nothing was created: {'; '.join(mismatches)}"
+        else:
+            compressor = PartCompressor(target_dpi=150) if compress else None
+            with ScoreJob(score_path, score_metadata, output_path, part_folders=part_folders, zip_bundle=zip_bundle, manifest=True,
+                          progress=post_progress, cancel_event=cancel_event, compressor=compressor) as job:
+                failed_parts = job.run_pages(part_page_nums)
+            message = f"Failed to create: {', '.join(failed_parts)}" if failed_parts else "Done."
+            if compressor is not None and job.part_sizes:
+                size_before = sum(before for before, _ in job.part_sizes.values())
+                size_after = sum(after for _, after in job.part_sizes.values())
+                message += f" Parts compressed from {format_size(size_before)} to {format_size(size_after)}."
+    except FileNotFoundError:
+        message = f"File not found: {score_path}"
+    except TypeError:
+        message = 'File supplied is not of the .pdf format.'
+    except ValueError as error:
+        message = str(error)
+    except JobCancelled:
+        message = 'Cancelled, files created by the job were removed.'
+    except (MemoryError, ImportError) as error:
+        message = str(error)
+    except Exception as error:
+        logger.exception(f"Failed to split '{score_path}'")
+        message = f"Failed to split the score: {error}"
+    finally:
+        # Always post the done event so the window re-enables its buttons
+        logger.info(message)
+        window.write_event_value('-DONE-', message)
+
+
+def main():
+    """Shows the window and runs its event loop until it is closed."""
+    import PySimpleGUI as sg
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    sg.theme("TealMono")
+    default_parts = convert_txt_file_to_string(DEFAULT_PARTS_FILE)
+    window = build_window(default_parts)
+
+    # Event Loop to process "events" and get the "values" of the inputs
+    while True:
+        event, values = window.read()
+        if event == "?":
+            sg.popup_scrolled(convert_txt_file_to_string(HELP_FILE), title='Score Splitter Instructions',font=h3, size=(50,10))
+        if event == "Reset":
+            window["score"].update("")
+            window["title"].update("")
+            window["composer"].update("")
+            window["style"].update("")
+            window['part_names'].update(default_parts)
+        if event == "Submit":
+            # Get data from form
+            score_path = values["score"]
+            output_path = values["output"]
+            title = values["title"].strip()
+            author = values["composer"].strip()
+            subject = values["style"].strip()
+            score_metadata = {"/Title": title, "/Author": author, "/Subject": subject}
+            parts = convert_string_to_array(values['part_names'])
+
+
+            # Create the complete set & parts in the background so the window stays responsive
+            cancel_event = threading.Event()
+            job_start_time = time.perf_counter()
+            window['Submit'].update(disabled=True)
+            window['Cancel'].update(disabled=False)
+            window['progress'].update(current_count=0, max=1)
+            window['progress_status'].update('Starting...')
+            threading.Thread(
+                target=run_score_job,
+                args=(window, score_path, score_metadata, output_path, values['checkbox'], values['zip'], values['detect'], values['compress'], parts, cancel_event),
+                daemon=True,
+            ).start()
+
+        if event == "Cancel":
+            cancel_event.set()
+            window['Cancel'].update(disabled=True)
+            window['progress_status'].update('Cancelling after the current part...')
+
+        if event == '-PROGRESS-':
+            name, parts_done, parts_total, pages_done, pages_total = values[event]
+            elapsed = time.perf_counter() - job_start_time
+            pages_per_second = pages_done / elapsed if elapsed else 0
+            eta = (pages_total - pages_done) / pages_per_second if pages_per_second else 0
+            window['progress'].update(current_count=parts_done, max=parts_total)
+            window['progress_status'].update(f"{name}: {parts_done}/{parts_total} done, {pages_per_second:.1f} pages/s, ETA {int(eta // 60)}:{int(eta % 60):02d}")
+
+        if event == '-STATUS-':
+            window['progress_status'].update(values[event])
+
+        if event == '-DONE-':
+            window['Submit'].update(disabled=False)
+            window['Cancel'].update(disabled=True)
+            window['progress_status'].update(values[event])
+
+        if event == sg.WIN_CLOSED: 
+            break
+
+    window.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+import sys
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+def peak_rss():
+    """Utility function to get the peak resident set size (physical memory) used by this process so far.
+
+    Returns:
+        int: The peak resident set size in bytes, or None when it cannot be measured on this platform.
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on MacOS and kilobytes elsewhere
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def current_rss():
+    """Utility function to get the resident set size (physical memory) currently used by this process.
+
+    Read from /proc, so it cannot be measured on platforms without it such as MacOS and Windows. The peak resident set
+    size is no substitute: it never drops, so a limit checked against it could not be recovered from by releasing memory.
+
+    Returns:
+        int: The resident set size in bytes, or None when it cannot be measured on this platform.
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except (OSError, AttributeError):
+        return None
@@ -0,0 +1,264 @@
+"""Detects the page ranges of the parts of a score without bookmarks from the part names printed in the page headers.
+
+Each page is cropped to the header region at the top of the page before its text is extracted. The header text of each page is cached by the hash of
+the page content, so pages that are unchanged since the last run, or repeated across scores, are not read again.
+
+Example:
+    part_page_nums = detect_part_pages('band_book.pdf', read_part_names('Parts_Default.txt'), workers=8, cache_file='.header_cache.json')
+    split_score_by_pages('band_book.pdf', part_page_nums, metadata, 'library')
+"""
+import json
+import logging
+import mmap
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from pypdf import PageObject, PdfReader
+from pypdf.generic import ContentStream
+from file_operations import atomic_write
+from pdf_operations import page_content_hash
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+HEADER_FRACTION = 0.15
+
+
+_TEXT_SHOWING_OPERATORS = (b"Tj", b"TJ", b"'", b'"')
+
+
+def _multiply(first, second):
+    """Multiplies two PDF transformation matrices [a b c d e f], applying the first then the second."""
+    a, b, c, d, e, f = first
+    a2, b2, c2, d2, e2, f2 = second
+    return [a * a2 + b * c2, a * b2 + b * d2, c * a2 + d * c2, c * b2 + d * d2, e * a2 + f * c2 + e2, e * b2 + f * d2 + f2]
+
+
+def _header_operations(operations, header_bottom, top):
+    """Crops the operations of a content stream to the header region, dropping the text shown with a baseline outside it.
+
+    Every other operation is kept, so the graphics and text state of the text that remains is unchanged. Only the vertical
+    position of each line is followed, through the line matrix and transformation matrix, not the advance of each glyph.
+
+    Args:
+        operations (list[(list, bytes)]): The operands and operator of each operation of the content stream.
+        header_bottom (float): The lowest baseline in page space that is kept.
+        top (float): The highest baseline in page space that is kept.
+
+    Returns:
+        list[(list, bytes)]: The operations that are kept, in order.
+    """
+    identity = [1.0, 0.0, 0.0, 1.0, 0.0, 0.0]
+    cm, cm_stack = identity, []
+    line_matrix, leading = identity, 0.0
+    kept = []
+    for operands, operator in operations:
+        try:
+            if operator == b"q":
+                cm_stack.append(cm)
+            elif operator == b"Q" and cm_stack:
+                cm = cm_stack.pop()
+            elif operator == b"cm":
+                cm = _multiply([float(operand) for operand in operands], cm)
+            elif operator == b"BT":
+                line_matrix = identity
+            elif operator == b"Tm":
+                line_matrix = [float(operand) for operand in operands]
+            elif operator in (b"Td", b"TD"):
+                if operator == b"TD":
+                    leading = -float(operands[1])
+                line_matrix = _multiply([1.0, 0.0, 0.0, 1.0, float(operands[0]), float(operands[1])], line_matrix)
+            elif operator == b"TL":
+                leading = float(operands[0])
+            elif operator in (b"T*", b"'", b'"'):
+                line_matrix = _multiply([1.0, 0.0, 0.0, 1.0, 0.0, -leading], line_matrix)
+        except (IndexError, TypeError, ValueError):  # Malformed operands are left for the text extraction to handle
+            kept.append((operands, operator))
+            continue
+
+        if operator in _TEXT_SHOWING_OPERATORS:
+            # Baseline of the text in page space: the line matrix origin transformed by the current transformation matrix
+            y = line_matrix[4] * cm[1] + line_matrix[5] * cm[3] + cm[5]
+            if not header_bottom <= y <= top:
+                # Keep the state changes of the text showing operators that move to the next line
+                if operator == b'"':
+                    kept += [([operands[0]], b"Tw"), ([operands[1]], b"Tc")]
+                if operator in (b"'", b'"'):
+                    kept.append(([], b"T*"))
+                continue
+        kept.append((operands, operator))
+    return kept
+
+
+def header_text(page, header_fraction=HEADER_FRACTION):
+    """Extracts the text drawn in the header region at the top of a page.
+
+    The page is cropped to the header region before its text is extracted: a copy of the page is made whose content no
+    longer shows the text below the header, so only the header text is decoded. Text drawn by forms is visited and every
+    piece whose baseline lies outside the header region is dropped.
+
+    Args:
+        page (PageObject): The page of a pdf.
+        header_fraction (float): The fraction of the page height, measured from the top, that is the header region.
+
+    Returns:
+        str: The text of the header region, pieces separated by a space.
+    """
+    top = float(page.mediabox.top)
+    header_bottom = top - float(page.mediabox.height) * header_fraction
+    pieces = []
+
+    content = page.get_contents()
+    if content is not None:
+        header_content = ContentStream(None, page.pdf)
+        header_content.operations = _header_operations(content.operations, header_bottom, top)
+        header_page = PageObject(page.pdf)
+        header_page.update(page)
+        header_page.replace_contents(header_content)
+        page = header_page
+
+    def visit_text(text, cm, tm, font_dict, font_size):
+        # Baseline of the text in page space: the text matrix origin transformed by the current transformation matrix
+        y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+        if text.strip() and header_bottom <= y <= top:
+            pieces.append(text.strip())
+
+    page.extract_text(visitor_text=visit_text)
+    return ' '.join(pieces)
+
+
+def _normalize(text):
+    """Case folds text and collapses its whitespace so part names match however the header was typeset."""
+    return ' '.join(text.casefold().split())
+
+
+def match_part(text, part_names):
+    """Finds the part whose name appears in the given header text as whole words.
+
+    Args:
+        text (str): The header text of a page.
+        part_names (list[str]): A list of the part names of the score.
+
+    Returns:
+        str | None: The longest part name found in the text, so 'Trumpet 10' wins over 'Trumpet 1', or None when no part name is found.
+    """
+    header = _normalize(text)
+    matches = [part for part in part_names if re.search(rf"(?<!\w){re.escape(_normalize(part))}(?!\w)", header)]
+    return max(matches, key=len) if matches else None
+
+
+def _header_texts_from_source(score_pdf, page_numbers, header_fraction):
+    """Process pool worker that reopens the score through a read only memory map and extracts the header text of the given pages.
+
+    Returns:
+        list[str]: The header text of each of the given pages, in order.
+    """
+    with open(score_pdf, "rb") as pdf_file, mmap.mmap(pdf_file.fileno(), 0, access=mmap.ACCESS_READ) as score_buffer:
+        pdf_reader = PdfReader(score_buffer)
+        return [header_text(pdf_reader.pages[page_number], header_fraction) for page_number in page_numbers]
+
+
+def read_header_cache(cache_file):
+    """Reads the header text cache, empty when there is no cache.
+
+    Args:
+        cache_file (str): A file path representing the JSON cache of header texts keyed by page content hash.
+
+    Returns:
+        dict[str, str]: A dictionary of page content hash keys with their header text as values.
+    """
+    try:
+        with open(cache_file) as cache:
+            return json.load(cache)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def page_header_texts(score_pdf, workers=None, cache_file=None, header_fraction=HEADER_FRACTION):
+    """Extracts the header text of every page of a score, reading only the pages that are not cached.
+
+    Args:
+        score_pdf (str): A file path representing the pdf of the score.
+        workers (int, optional): The number of processes used to extract pages in parallel. Pages are extracted in this process when not supplied.
+        cache_file (str, optional): A file path representing the JSON cache of header texts keyed by page content hash. It is updated with the pages extracted.
+        header_fraction (float): The fraction of the page height, measured from the top, that is the header region.
+
+    Raises:
+        FileNotFoundError: Throws when the given score pdf path does not exist.
+        TypeError: Throws when the supplied score path does not point to a file in the .pdf format.
+
+    Returns:
+        list[str]: The header text of each page of the score.
+    """
+    if Path(score_pdf).suffix != '.pdf':
+        raise TypeError('Input file must be a pdf')
+
+    cache = read_header_cache(cache_file) if cache_file else {}
+    with open(score_pdf, "rb") as pdf_file:
+        pdf_reader = PdfReader(pdf_file)
+        page_hashes = [f"{header_fraction}:{page_content_hash(page).hex()}" for page in pdf_reader.pages]
+        missing_pages = [page_number for page_number, page_hash in enumerate(page_hashes) if page_hash not in cache]
+        logger.info(f"Extracting the headers of {len(missing_pages)} of {len(page_hashes)} pages.")
+
+        with span('detect', score=score_pdf, pages=len(missing_pages)):
+            if workers and len(missing_pages) > 1:
+                chunk_size = max(len(missing_pages) // (workers * 4), 1)
+                chunks = [missing_pages[i:i + chunk_size] for i in range(0, len(missing_pages), chunk_size)]
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    futures = [executor.submit(_header_texts_from_source, score_pdf, chunk, header_fraction) for chunk in chunks]
+                    extracted = [text for future in futures for text in future.result()]
+            else:
+                extracted = [header_text(pdf_reader.pages[page_number], header_fraction) for page_number in missing_pages]
+
+    for page_number, text in zip(missing_pages, extracted):
+        cache[page_hashes[page_number]] = text
+    if cache_file and missing_pages:
+        with atomic_write(cache_file, mode="w") as cache_json:
+            json.dump(cache, cache_json)
+
+    return [cache[page_hash] for page_hash in page_hashes]
+
+
+def detect_part_pages(score_pdf, part_names, workers=None, cache_file=None, header_fraction=HEADER_FRACTION):
+    """Detects the page range of each part of a score from the part names printed in its page headers.
+
+    A part starts at the first page whose header names it and runs until the next page naming a different part. Pages whose
+    header names no part belong to the part before them, pages before the first named page are left out.
+
+    Args:
+        score_pdf (str): A file path representing the pdf of the score.
+        part_names (list[str]): A list of the part names that may appear in the page headers.
+        workers (int, optional): The number of processes used to extract pages in parallel. Pages are extracted in this process when not supplied.
+        cache_file (str, optional): A file path representing the JSON cache of header texts keyed by page content hash.
+        header_fraction (float): The fraction of the page height, measured from the top, that is the header region.
+
+    Raises:
+        FileNotFoundError: Throws when the given score pdf path does not exist.
+        TypeError: Throws when the supplied score path does not point to a file in the .pdf format.
+        ValueError: Throws when no part is found, or a part is found again after another part has started.
+
+    Returns:
+        dict[str, (int, int)]: A dictionary of part name keys with tuple values that represent their start and end pages (zero indexed & inclusive), in page order.
+    """
+    header_texts = page_header_texts(score_pdf, workers, cache_file, header_fraction)
+
+    part_page_nums = {}
+    current_part = None
+    for page_number, text in enumerate(header_texts):
+        part = match_part(text, part_names)
+        if part is not None and part != current_part:
+            if part in part_page_nums:
+                raise ValueError(f"Part '{part}' found again on page {page_number + 1} after another part started")
+            current_part = part
+            part_page_nums[part] = (page_number, page_number)
+        elif current_part is not None:
+            part_page_nums[current_part] = (part_page_nums[current_part][0], page_number)
+
+    if not part_page_nums:
+        raise ValueError('No part names were found in the page headers')
+
+    missing_parts = [part for part in part_names if part not in part_page_nums]
+    if missing_parts:
+        logger.warning(f"Parts not found in the page headers: {', '.join(missing_parts)}")
+
+    return part_page_nums
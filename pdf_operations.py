@@ -1,45 +1,1163 @@
+import gc
+import hashlib
+import io
+import json
+import logging
+import mmap
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject, create_string_object
 from pathlib import Path
+from compression import format_shared_resources, format_size, shared_resources
+from file_operations import FSYNC_NONE, atomic_write, make_directories
+from memory_usage import current_rss, peak_rss
+from tracing import capture_spans, emit, span, tracing_enabled
 
-def add_metadata(file, output_path, metadata):
-    """Creates a new pdf by copying the contents of the supplied pdf and adding the supplied PDF standard metadata.
+logger = logging.getLogger(__name__)
+
+
+MANIFEST_SUFFIX = 'Manifest.json'
+
+
+def page_content_hash(page):
+    """Hashes the raw (still encoded) content streams and directly referenced XObjects of a page along with its page box and rotation.
 
     Args:
-        file (str): A file path representing the inputpdf file for which to add metadata
-        output_path (str): A directory path representing the location to output the new pdf with metadata
+        page (PageObject): The page of a pdf to hash.
+
+    Returns:
+        bytes: The SHA-256 digest of the page content.
+    """
+    digest = hashlib.sha256(f"{list(page.mediabox)} {page.get('/Rotate', 0)}".encode())
+    contents = page.get("/Contents")
+    streams = list(contents) if isinstance(contents, ArrayObject) else [contents]
+    xobjects = page.get("/Resources", DictionaryObject()).get("/XObject", DictionaryObject())
+    streams += [xobjects.raw_get(name) for name in sorted(xobjects)]
+    for stream in streams:
+        if stream is not None:
+            digest.update(getattr(stream.get_object(), "_data", b""))
+    return digest.digest()
+
+
+def _page_numbers(pdf_reader):
+    """Maps the object id of each page of a pdf to its page number from a single pass over its page tree."""
+    return {page.indirect_reference.idnum: i for i, page in enumerate(pdf_reader.pages) if page.indirect_reference is not None}
+
+
+def _bookmark_page(pdf_reader, bookmark, page_numbers):
+    """Returns the page number (zero indexed) a bookmark points at, see _page_numbers."""
+    page = bookmark.page
+    if isinstance(page, IndirectObject) and page.idnum in page_numbers:
+        return page_numbers[page.idnum]
+    if isinstance(page, int):
+        return page
+    return pdf_reader.get_destination_page_number(bookmark)
+
+
+def _index_outline(pdf_reader, outline, page_numbers, parent_path, parent_end, max_depth, outline_tree):
+    """Appends the bookmarks of one level of an outline to an outline tree index, then the nested bookmarks of each, see build_outline_tree."""
+    bookmarks = []
+    for bookmark in outline:
+        if isinstance(bookmark, list):  # Nested bookmarks of the previous entry
+            if bookmarks:
+                bookmarks[-1][2] = bookmark
+            continue
+        bookmarks.append([bookmark.title, _bookmark_page(pdf_reader, bookmark, page_numbers), None])
+
+    bookmarks.sort(key=lambda bookmark: bookmark[1])
+    end_pages = [start_page - 1 for _, start_page, _ in bookmarks[1:]] + [parent_end]
+
+    for (title, start_page, nested_outline), end_page in zip(bookmarks, end_pages):
+        path = parent_path + (title,)
+        outline_tree.append((path, start_page, end_page))
+        if nested_outline and (max_depth is None or len(path) < max_depth):
+            _index_outline(pdf_reader, nested_outline, page_numbers, path, end_page, max_depth, outline_tree)
+
+
+def build_outline_tree(pdf_reader, max_depth=None):
+    """Builds an index of the page range of every bookmark of a pdf, at any depth, from a single walk of its outline.
+
+    Each bookmark ends the page before the next bookmark at the same level, or with its parent when it is the last.
+    Page references are resolved against a map of page object ids to page numbers rather than searching the page tree
+    for every bookmark.
+
+    Args:
+        pdf_reader (PdfReader): The reader of the pdf containing bookmarks (outlines).
+        max_depth (int, optional): The depth of the deepest bookmarks indexed, 1 for top level bookmarks only. Every depth is indexed when not supplied.
+
+    Returns:
+        list[(tuple[str], int, int)]: A list of tuples representing the titles of the bookmark and each of its parents (its bookmark path), and the start and end pages (zero indexed & inclusive) of each bookmark. Each bookmark is followed by its nested bookmarks, bookmarks of the same level are sorted by start page.
+    """
+    outline_tree = []
+    _index_outline(pdf_reader, pdf_reader.outline, _page_numbers(pdf_reader), (), len(pdf_reader.pages) - 1, max_depth, outline_tree)
+    return outline_tree
+
+
+def build_outline_index(pdf_reader):
+    """Builds an index of the page range of each top level bookmark of a pdf from a single pass over its page tree.
+
+    Nested bookmarks are ignored so they are not counted as parts, see build_outline_tree.
+
+    Args:
+        pdf_reader (PdfReader): The reader of the pdf containing bookmarks (outlines).
+
+    Returns:
+        list[(str, int, int)]: A list of tuples representing the title, start and end pages (zero indexed & inclusive) of each top level bookmark, sorted by start page.
+    """
+    return [(path[0], start_page, end_page) for path, start_page, end_page in build_outline_tree(pdf_reader, max_depth=1)]
+
+
+def outline_output_name(path):
+    """Names the output of a bookmark after its bookmark path, e.g. 'Violin 1 - II. Adagio'. Slashes in titles are replaced so they do not create folders."""
+    return ' - '.join(title.strip().replace('/', '-').replace('\\', '-') for title in path)
+
+
+def select_outline_depth(outline_tree, depth=None):
+    """Selects the bookmarks of an outline tree index to output at a chosen depth, or at every depth.
+
+    At a chosen depth, bookmarks without nested bookmarks above that depth are selected too, so a part without movements
+    is still output when splitting by movement.
+
+    Args:
+        outline_tree (list[(tuple[str], int, int)]): The outline tree index of the score, see build_outline_tree.
+        depth (int, optional): The depth of the bookmarks to output, 1 for top level bookmarks. Every bookmark is output when not supplied.
+
+    Raises:
+        ValueError: Throws when the depth is below 1 or when two selected bookmarks have the same bookmark path.
+
+    Returns:
+        dict[str, (tuple[str], int, int)]: A dictionary of output name keys, see outline_output_name, with the bookmark path, start and end pages of each selected bookmark as values, in outline order.
+    """
+    if depth is not None and depth < 1:
+        raise ValueError(f"Outline depth must be at least 1, got {depth}")
+
+    parent_paths = {path[:-1] for path, _, _ in outline_tree}
+    selected = {}
+    for path, start_page, end_page in outline_tree:
+        if depth is not None and len(path) != depth and (len(path) > depth or path in parent_paths):
+            continue
+        name = outline_output_name(path)
+        if name in selected:
+            raise ValueError(f"Bookmark '{name}' appears more than once in the outline")
+        selected[name] = (path, start_page, end_page)
+    return selected
+
+
+def match_bookmarks(outline_index, part_names):
+    """Matches the given part names to the bookmarks of an outline index in order.
+
+    Args:
+        outline_index (list[(str, int, int)]): The outline index of the score, see build_outline_index.
+        part_names (list[str]): A list of part names that correlate with the bookmarks of the score. The number of bookmarks and parts must match.
+
+    Raises:
+        ValueError: Throws when the number of part names does not match the number of bookmarks found.
+
+    Returns:
+        dict[str, (int, int)]: A dictionary of part name keys with tuple values that represent their start and end pages (zero indexed & inclusive).
+    """
+    if len(outline_index) != len(part_names):
+        raise ValueError(f"Mismatch between bookmark count ({len(outline_index)}) and the supplied part names count ({len(part_names)})")
+
+    return {part: (start, end) for part, (_, start, end) in zip(part_names, outline_index)}
+
+
+def _write_metadata_update(pdf_reader, score_pdf, output_path_pdf, metadata, fsync=FSYNC_NONE):
+    """Creates a copy of the score with the metadata added by appending an incremental update to the end of the file.
+
+    The update holds only a new document information dictionary and a cross reference section pointing at it, so the pages
+    of the score are never parsed or rewritten. The existing metadata is kept unless it is replaced by the supplied metadata.
+
+    Args:
+        pdf_reader (PdfReader): The reader of the score pdf.
+        score_pdf (str): A file path representing the pdf of the score.
+        output_path_pdf (str): A file path representing the location to output the copy of the score with metadata.
         metadata (dict[str, str]): A dictionary of key/value pairs representing the metadata to add to the pdf. Keys must follow the PDF standard.
+        fsync (str): The fsync policy of the output, one of file_operations.FSYNC_POLICIES.
+
+    Raises:
+        ValueError: Throws when the score is encrypted or the end of its last cross reference section cannot be found.
+    """
+    if pdf_reader.is_encrypted:
+        raise ValueError('Incremental metadata updates are not supported for encrypted pdfs')
+
+    with open(score_pdf, "rb") as pdf_file:
+        pdf_file.seek(max(pdf_file.seek(0, io.SEEK_END) - 1024, 0))
+        startxrefs = re.findall(rb"startxref\s+(\d+)", pdf_file.read())
+        if not startxrefs:
+            raise ValueError('Could not find the cross reference section of the pdf')
+        previous_xref = int(startxrefs[-1])
+        pdf_file.seek(previous_xref)
+        previous_xref_is_stream = not pdf_file.read(4).startswith(b"xref")
+
+    info = DictionaryObject()
+    if pdf_reader.metadata is not None:
+        info.update(pdf_reader.metadata)
+    for key, value in metadata.items():
+        info[NameObject(key)] = create_string_object(str(value))
+
+    info_number = pdf_reader.trailer["/Size"]
+    trailer = DictionaryObject({
+        NameObject("/Root"): pdf_reader.trailer.raw_get("/Root"),
+        NameObject("/Info"): IndirectObject(info_number, 0, None),
+        NameObject("/Prev"): NumberObject(previous_xref),
+    })
+    if "/ID" in pdf_reader.trailer:
+        trailer[NameObject("/ID")] = pdf_reader.trailer["/ID"]
+
+    with atomic_write(output_path_pdf, fsync=fsync, copy_from=score_pdf, span_fields={'part': 'Complete Set'}) as output_pdf:
+        output_pdf.write(b"\n")
+        info_offset = output_pdf.tell()
+        output_pdf.write(f"{info_number} 0 obj\n".encode())
+        info.write_to_stream(output_pdf)
+        output_pdf.write(b"\nendobj\n")
+        xref_offset = output_pdf.tell()
+
+        if previous_xref_is_stream:
+            # A file indexed by cross reference streams must be updated with a cross reference stream
+            xref_number = info_number + 1
+            offset_width = max(4, (xref_offset.bit_length() + 7) // 8)
+            xref_data = b"".join(
+                b"\x01" + offset.to_bytes(offset_width, "big") + b"\x00\x00" for offset in (info_offset, xref_offset)
+            )
+            trailer.update({
+                NameObject("/Type"): NameObject("/XRef"),
+                NameObject("/Size"): NumberObject(xref_number + 1),
+                NameObject("/Index"): ArrayObject([NumberObject(info_number), NumberObject(2)]),
+                NameObject("/W"): ArrayObject([NumberObject(1), NumberObject(offset_width), NumberObject(2)]),
+                NameObject("/Length"): NumberObject(len(xref_data)),
+            })
+            output_pdf.write(f"{xref_number} 0 obj\n".encode())
+            trailer.write_to_stream(output_pdf)
+            output_pdf.write(b"\nstream\n" + xref_data + b"\nendstream\nendobj\n")
+        else:
+            trailer[NameObject("/Size")] = NumberObject(info_number + 1)
+            output_pdf.write(f"xref\n0 1\n0000000000 65535 f \n{info_number} 1\n{info_offset:010} 00000 n \ntrailer\n".encode())
+            trailer.write_to_stream(output_pdf)
+            output_pdf.write(b"\n")
+
+        output_pdf.write(f"startxref\n{xref_offset}\n%%EOF\n".encode())
+
+
+def _build_complete_set_writer(pdf_reader, metadata):
+    """Builds a pdf writer holding every page of the score and the metadata.
+
+    Args:
+        pdf_reader (PdfReader): The reader of the score pdf.
+        metadata (dict[str,str]): A dictionary of key/value pairs representing the metadata to add to the pdf. Keys must follow the PDF standard.
+
+    Returns:
+        PdfWriter: A pdf writer containing the complete set.
+    """
+    with span('page_copy', part='Complete Set'):
+        pdf_writer = PdfWriter()
+        pdf_writer.add_metadata(metadata)
+        for page in pdf_reader.pages:
+            pdf_writer.add_page(page)
+
+    return pdf_writer
+
+
+def _build_part_writer(pdf_reader, pages, metadata, part):
+    """Builds a pdf writer holding the given page range of the score and the metadata tagged with the part name.
+
+    Args:
+        pdf_reader (PdfReader): The reader of the score pdf.
+        pages ((int, int)): A tuple representing the start and end pages of the part (zero indexed & inclusive).
+        metadata (dict[str,str]): A dictionary of key/value pairs representing the metadata to add to the pdf. Keys must follow the PDF standard.
+        part (str): The name of the part.
+
+    Returns:
+        PdfWriter: A pdf writer containing the part.
+    """
+    with span('page_copy', part=part):
+        pdf_writer = PdfWriter()
+        for i in range(pages[0], pages[1] + 1):
+            pdf_writer.add_page(pdf_reader.pages[i])
+
+        new_metadata = metadata.copy()
+        new_metadata["/Tags"] = f"{part}"
+        pdf_writer.add_metadata(new_metadata)
+
+    return pdf_writer
+
+
+def _write_pdf(pdf_writer, output_file_path, part, fsync=FSYNC_NONE):
+    """Serializes a pdf writer to a temporary file next to the given file and moves it into place once complete,
+    timing the serialization and the final flush and replace as separate spans.
+
+    Args:
+        pdf_writer (PdfWriter): The pdf writer to serialize.
+        output_file_path (str): A file path representing the location to output the pdf.
+        part (str): The name of the part, recorded on the spans.
+        fsync (str): The fsync policy of the output, one of file_operations.FSYNC_POLICIES.
+
+    Returns:
+        (int, str): The size in bytes of the pdf and the hex SHA-256 digest of its bytes, hashed as they were written.
+    """
+    with atomic_write(output_file_path, fsync=fsync, span_fields={'part': part}) as output_pdf:
+        with span('serialize', part=part):
+            output_writer = _HashingWriter(output_pdf)
+            pdf_writer.write(output_writer)
+    return output_writer.tell(), output_writer.digest.hexdigest()
+
+
+def _write_part(pdf_reader, pages, metadata, part, output_file_path, fsync=FSYNC_NONE, compressor=None):
+    """Builds a part, compresses it when a compressor is given and writes it.
+
+    Args:
+        pdf_reader (PdfReader): The reader of the score pdf.
+        pages ((int, int)): A tuple representing the start and end pages of the part (zero indexed & inclusive).
+        metadata (dict[str,str]): A dictionary of key/value pairs representing the metadata to add to the pdf. Keys must follow the PDF standard.
+        part (str): The name of the part.
+        output_file_path (str): A file path representing the location to output the part.
+        fsync (str): The fsync policy of the output, one of file_operations.FSYNC_POLICIES.
+        compressor (compression.PartCompressor, optional): The compressor the part is compressed with before it is written.
+
+    Returns:
+        (int, int, str): The size in bytes of the part before compression, None when it is not compressed or measured, the size written and the hex SHA-256 digest of the bytes written.
+    """
+    pdf_writer = _build_part_writer(pdf_reader, pages, metadata, part)
+    saved = compressor.compress(pdf_writer, part) if compressor is not None else None
+    size_written, digest = _write_pdf(pdf_writer, output_file_path, part, fsync)
+    return None if saved is None else size_written + saved, size_written, digest
+
+
+def _write_part_from_source(score_pdf, part, pages, metadata, output_file_path, fsync=FSYNC_NONE, compressor=None, trace=False):
+    """Process pool worker that reopens the score through a read only memory map and writes a single part.
+
+    Mapping the score lets every worker share the operating system's cached copy of the file rather than reading their own.
+
+    Args:
+        score_pdf (str): A file path representing the pdf of the score to be split into parts.
+        part (str): The name of the part.
+        pages ((int, int)): A tuple representing the start and end pages of the part (zero indexed & inclusive).
+        metadata (dict[str,str]): A dictionary of key/value pairs representing the metadata to add to the pdf. Keys must follow the PDF standard.
+        output_file_path (str): A file path representing the location to output the part.
+        fsync (str): The fsync policy of the output, one of file_operations.FSYNC_POLICIES.
+        compressor (compression.PartCompressor, optional): The compressor the part is compressed with before it is written.
+        trace (bool): Whether to time the phases of the part as spans.
+
+    Returns:
+        (list[dict], (int, int, str)): The records of the spans timed in the worker, to be passed to the handlers of the parent process,
+        and the sizes of the part before compression and as written with the digest of the bytes written, see _write_part.
+    """
+    with capture_spans(enabled=trace) as span_records:
+        with open(score_pdf, "rb") as pdf_file, mmap.mmap(pdf_file.fileno(), 0, access=mmap.ACCESS_READ) as score_buffer:
+            with span('part', part=part):
+                with span('open', score=score_pdf):
+                    pdf_reader = PdfReader(score_buffer)
+                written = _write_part(pdf_reader, pages, metadata, part, output_file_path, fsync, compressor)
+
+    return span_records, written
+
+
+class _BufferReader(io.RawIOBase):
+    """Read only, seekable file over a bytes-like object, so a memoryview of an upload buffer is read without being copied."""
+
+    def __init__(self, buffer):
+        self._buffer = memoryview(buffer).cast("B")
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, target):
+        data = self._buffer[self._position:self._position + len(target)]
+        target[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._buffer)}[whence]
+        self._position = max(base + offset, 0)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+
+class _PositionWriter:
+    """Write only stream that counts the bytes written to it, for pdf writers that need the position of a stream that cannot seek (e.g. a ZIP entry)."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._position = 0
+
+    def write(self, data):
+        self._stream.write(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        self._stream.flush()
+
+
+class _HashingWriter(_PositionWriter):
+    """Write only stream that hashes and counts the bytes written to it, so an output is hashed as it is serialized rather than read back."""
+
+    def __init__(self, stream):
+        super().__init__(stream)
+        self.digest = hashlib.sha256()
+
+    def write(self, data):
+        self.digest.update(data)
+        return super().write(data)
+
+
+def open_score_source(source):
+    """Opens a reader over a score held in memory or in a file-like object instead of a file path.
+
+    Args:
+        source (bytes | bytearray | memoryview | file): The score pdf as a bytes-like object or a binary file-like object.
+            Bytes-like objects are read in place, file-like objects that cannot seek are read into memory first.
+
+    Raises:
+        TypeError: Throws when the source is neither bytes-like nor a binary file-like object.
+
+    Returns:
+        PdfReader: The reader of the score.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return PdfReader(_BufferReader(source))
+    if not hasattr(source, "read"):
+        raise TypeError('Score source must be bytes-like or a binary file-like object')
+    if not (hasattr(source, "seekable") and source.seekable()):
+        source = io.BytesIO(source.read())
+    return PdfReader(source)
+
+
+def _serialize_pdf(pdf_writer, part, as_stream):
+    """Serializes a pdf writer in memory, returning a stream positioned at its start or its bytes."""
+    output = io.BytesIO()
+    with span('serialize', part=part):
+        pdf_writer.write(output)
+    if as_stream:
+        output.seek(0)
+        return output
+    return output.getvalue()
+
+
+def _iter_outputs(pdf_reader, part_page_nums, metadata, complete_set, as_stream):
+    """Generator building and serializing one output at a time, see iter_parts."""
+    if complete_set:
+        with span('part', part='Complete Set'):
+            data = _serialize_pdf(_build_complete_set_writer(pdf_reader, metadata), 'Complete Set', as_stream)
+        yield 'Complete Set', data
+
+    for part, pages in part_page_nums.items():
+        with span('part', part=part):
+            data = _serialize_pdf(_build_part_writer(pdf_reader, pages, metadata, part), part, as_stream)
+        yield part, data
+
+
+def iter_parts(source, part_page_nums, metadata, complete_set=False, as_stream=False):
+    """Splits a score held in memory into parts according to the given page numbers without touching the filesystem.
+
+    Parts are built lazily, each one only when the generator is advanced to it, so the first part can be sent on before
+    the last one is built.
+
+    Args:
+        source (bytes | bytearray | memoryview | file | PdfReader): The score pdf, see open_score_source, or an open reader of it.
+        part_page_nums (dict[str, (int, int)]): A dictionary of part name keys with tuple values that represent their start and end pages (zero indexed & inclusive).
+        metadata (dict[str,str]): A dictionary of key/value pairs representing the metadata to add to the pdf. Keys must follow the PDF standard.
+        complete_set (bool): Whether the complete set is yielded, named 'Complete Set', before the parts.
+        as_stream (bool): Whether each pdf is yielded as a binary stream positioned at its start instead of bytes.
+
+    Raises:
+        TypeError: Throws when the source is neither bytes-like nor a binary file-like object.
+
+    Returns:
+        Iterator[(str, bytes | io.BytesIO)]: A generator of part name and pdf pairs, in the order of part_page_nums.
+    """
+    pdf_reader = source if isinstance(source, PdfReader) else open_score_source(source)
+    return _iter_outputs(pdf_reader, dict(part_page_nums), metadata, complete_set, as_stream)
+
+
+def iter_parts_by_bookmarks(source, part_names, metadata, complete_set=False, as_stream=False):
+    """Splits a score held in memory by its bookmarks that correlate to the given part names without touching the filesystem.
+
+    The bookmarks are matched before the generator is returned, so a mismatch is raised before any part is built.
+
+    Args:
+        source (bytes | bytearray | memoryview | file | PdfReader): The score pdf, see open_score_source, or an open reader of it. Must contain bookmarks (outlines).
+        part_names (list[str]): A list of part names that correlate with the bookmarks of the score. The number of bookmarks and parts must match.
+        metadata (dict[str,str]): A dictionary of key/value pairs representing the metadata to add to the pdf. Keys must follow the PDF standard.
+        complete_set (bool): Whether the complete set is yielded, named 'Complete Set', before the parts.
+        as_stream (bool): Whether each pdf is yielded as a binary stream positioned at its start instead of bytes.
+
+    Raises:
+        TypeError: Throws when the source is neither bytes-like nor a binary file-like object.
+        ValueError: Throws when the number of part names does not match the number of bookmarks found.
+
+    Returns:
+        Iterator[(str, bytes | io.BytesIO)]: A generator of part name and pdf pairs, in bookmark order.
+    """
+    pdf_reader = source if isinstance(source, PdfReader) else open_score_source(source)
+    with span('outline'):
+        part_page_nums = match_bookmarks(build_outline_index(pdf_reader), part_names)
+    return _iter_outputs(pdf_reader, part_page_nums, metadata, complete_set, as_stream)
+
+
+def plan_split(score, part_names):
+    """Checks the bookmarks of a score against the given part names without writing anything, so a bad submission is rejected before any output.
+
+    Only the trailer, the outline and the page tree of the score are read. Page contents are never loaded, so even large
+    scores are planned in milliseconds.
+
+    Args:
+        score (str | bytes | bytearray | memoryview | file): A file path representing the pdf of the score, or the score itself, see open_score_source.
+        part_names (list[str]): A list of part names that correlate with the bookmarks of the score.
+
+    Raises:
+        FileNotFoundError: Throws when the given score pdf path does not exist.
+        TypeError: Throws when the supplied score path does not point to a file in the .pdf format.
+
+    Returns:
+        dict: The plan, holding 'page_count', the top level 'bookmarks' as (title, start page, end page) tuples, the resolved
+        'parts' as a dictionary of part name keys with their start and end pages (zero indexed & inclusive), empty when the
+        counts do not match, and a list of 'mismatches' describing every problem found, empty when the score can be split.
     """
-    
+    if isinstance(score, str):
+        if Path(score).suffix != '.pdf':
+            raise TypeError('Input file must be a pdf')
+        with span('plan', score=score), open(score, "rb") as pdf_file:
+            return _plan_split(PdfReader(pdf_file), part_names)
+
+    with span('plan'):
+        return _plan_split(open_score_source(score), part_names)
+
+
+def _plan_split(pdf_reader, part_names):
+    """Builds the plan of plan_split from an open reader of the score."""
+    outline_index = build_outline_index(pdf_reader)
+    mismatches = []
+    parts = {}
     try:
-        if Path(file).suffix != '.pdf':
+        parts = match_bookmarks(outline_index, part_names)
+    except ValueError as error:
+        mismatches.append(str(error))
+
+    mismatches += [f"Part '{part}' has no pages, its bookmark shares a page with the next bookmark" for part, (start, end) in parts.items() if end < start]
+    duplicates = sorted({part for part in part_names if part_names.count(part) > 1})
+    if duplicates:
+        mismatches.append(f"Duplicate part names: {', '.join(duplicates)}")
+
+    return {'page_count': len(pdf_reader.pages), 'bookmarks': outline_index, 'parts': parts, 'mismatches': mismatches}
+
+
+class JobCancelled(Exception):
+    """Raised when a ScoreJob is cancelled between outputs. The outputs created by the job are removed before it is raised."""
+
+
+class ScoreJob:
+    """Creates the complete set and parts of a score from a single parse of the score pdf.
+
+    The score is opened once and every part is written straight to its final location, either
+    directly in the output directory or in a folder named after the part. Each output is written to a
+    hidden temporary file in its final folder and only replaces the destination once complete.
+
+    Args:
+        score_pdf (str): A file path representing the pdf of the score to be split into parts.
+        metadata (dict[str,str]): A dictionary of key/value pairs representing the metadata to add to the pdf. Keys must follow the PDF standard.
+        output_directory (str): A file path representing the output directory location to store the newly created files.
+        part_folders (bool): Whether each part is output into its own part named folder inside the output directory.
+        incremental_metadata (bool): Whether the complete set is created by appending the metadata to a copy of the score instead of rewriting every page.
+        manifest (bool): Whether runs record a hash of each output in a manifest in the output directory and skip outputs that are unchanged since the last run.
+        progress (callable, optional): Called after each output is created with its name, the outputs done, the outputs total, the pages done and the pages total.
+        cancel_event (threading.Event, optional): An event that cancels the job before its next output is created when set.
+        low_memory (bool): Whether the score is read through a memory map and the pages cached while creating each part are released once it is written.
+        fsync (str): When outputs are flushed to disk, one of file_operations.FSYNC_POLICIES: 'none' leaves it to the operating system, 'file' flushes each output before it is moved into place and 'full' also flushes its folder.
+        memory_limit (int, optional): The resident memory in bytes the job may use. Cached pages are released when it is exceeded before an output is created, and a MemoryError is raised if that is not enough.
+            Not enforced on platforms where the current resident memory cannot be measured, see memory_usage.current_rss.
+            Low memory mode and the memory limit only apply to outputs created in this process, parts created by worker processes (see write_parts) always read the score through a memory map and are not limited.
+        zip_bundle (bool): Whether runs write the complete set and parts into a single ZIP in the output directory instead of separate files.
+        catalog (str, optional): A file path representing the SQLite database of a catalog to record each output in as it is created, see catalog.Catalog.
+        compressor (compression.PartCompressor, optional): The compressor each part is compressed with before it is written. The size of each part before and after is logged and kept in part_sizes, and runs log the resources shared across parts and keep them in shared_resources.
+
+    Raises:
+        FileNotFoundError: Throws when the given score pdf path does not exist.
+        TypeError: Throws when the supplied score path does not point to a file in the .pdf format.
+    """
+
+    def __init__(self, score_pdf, metadata, output_directory, part_folders=False, incremental_metadata=False, manifest=False, progress=None, cancel_event=None, low_memory=False, memory_limit=None, fsync=FSYNC_NONE, zip_bundle=False, catalog=None, compressor=None):
+        if Path(score_pdf).suffix != '.pdf':
             raise TypeError('Input file must be a pdf')
-        
-        with open(file, "rb") as pdf_file:
-            pdf_reader = PdfReader(pdf_file)
-            pdf_writer = PdfWriter()
 
-            # Update metadata in the new PDF writer
-            pdf_writer.add_metadata(metadata)
+        self.score_pdf = score_pdf
+        self.metadata = metadata
+        self.output_directory = output_directory
+        self.part_folders = part_folders
+        self.incremental_metadata = incremental_metadata
+        self.manifest = manifest
+        self.progress = progress
+        self.cancel_event = cancel_event
+        self._page_hashes = None
+        self._progress_counts = None
+        self._written_files = []
+        self.low_memory = low_memory
+        self.memory_limit = memory_limit
+        self.fsync = fsync
+        self.zip_bundle = zip_bundle
+        self.catalog = catalog
+        self._catalog = None
+        self.compressor = compressor
+        self.part_sizes = {}
+        self.shared_resources = None
+        self.part_folder_names = {}
+        self.peak_rss = None
+        with span('open', score=score_pdf):
+            self._pdf_file = open(score_pdf, "rb")
+            self._score_buffer = mmap.mmap(self._pdf_file.fileno(), 0, access=mmap.ACCESS_READ) if low_memory else None
+            self.pdf_reader = self._open_reader()
+        self.outline_index = None
+        self.outline_tree = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the score pdf and the catalog."""
+        if self._catalog is not None:
+            self._catalog.close()
+        if self._score_buffer is not None:
+            self._score_buffer.close()
+        self._pdf_file.close()
+
+    def _begin_progress(self, page_counts):
+        """Starts counting progress towards outputs with the given page counts. Returns whether counting was started."""
+        if self._progress_counts is not None:
+            return False
+        self._progress_counts = [0, len(page_counts), 0, sum(page_counts)]
+        return True
+
+    def _output_created(self, name, page_count, output_file_path=None, digest=None):
+        """Records a created output and reports the progress of the job.
+
+        The output is recorded in the catalog from the metadata and page count written and the digest of the bytes written,
+        or read back when there is no digest. An output that cannot be recorded is logged, the output itself is kept.
+        """
+        if output_file_path is not None:
+            self._written_files.append(output_file_path)
+            if self.catalog is not None:
+                import sqlite3
+                try:
+                    if digest is None:
+                        self._open_catalog().add_files([output_file_path])
+                    else:
+                        from catalog import output_record
+                        metadata = self.metadata if name == 'Complete Set' else {**self.metadata, '/Tags': name}
+                        self._open_catalog().upsert([output_record(output_file_path, metadata, page_count, digest)])
+                except sqlite3.Error as error:
+                    logger.warning(f"Could not record '{output_file_path}' in the catalog: {error}")
+        if self._progress_counts is None:
+            return
+        self._progress_counts[0] += 1
+        self._progress_counts[2] += page_count
+        if self.progress is not None:
+            self.progress(name, *self._progress_counts)
+
+    def _record_sizes(self, part, sizes):
+        """Records the size of a part before compression and as written, logging them when it was compressed."""
+        self.part_sizes[part] = sizes
+        size_before, size_after = sizes
+        if size_before is not None:
+            logger.info(f"Compressed part '{part}' from {format_size(size_before)} to {format_size(size_after)}.")
+
+    def report_shared_resources(self, part_page_nums):
+        """Finds and logs the fonts, images and forms used by more than one part, each of which is written into every part using it, see compression.shared_resources.
+
+        Args:
+            part_page_nums (dict[str, (int, int)]): A dictionary of part name keys with tuple values that represent their start and end pages (zero indexed & inclusive).
 
-            # Copy all pages from the original PDF to the new PDF writer
-            for page in pdf_reader.pages:
-                pdf_writer.add_page(page)
+        Returns:
+            list[dict]: The shared resources, largest total first. Also kept in shared_resources.
+        """
+        with span('resources', score=self.score_pdf):
+            self.shared_resources = shared_resources(self.pdf_reader, part_page_nums)
+        if self.shared_resources:
+            logger.info(format_shared_resources(self.shared_resources))
+        return self.shared_resources
+
+    def _open_catalog(self):
+        """Returns the catalog, opening it on first use."""
+        if self._catalog is None:
+            from catalog import Catalog
+            self._catalog = Catalog(self.catalog)
+        return self._catalog
+
+    def _open_reader(self):
+        """Opens a reader of the score, through its memory map in low memory mode."""
+        return PdfReader(self._score_buffer if self._score_buffer is not None else self._pdf_file)
+
+    def release_pages(self):
+        """Drops the pages and objects the reader has cached so the memory they hold can be reclaimed, by reopening the reader from the score. They are read again when next used."""
+        self.pdf_reader = self._open_reader()
+        gc.collect()
+
+    def _check_memory(self):
+        """Releases the cached pages when the memory limit is exceeded.
+
+        Raises:
+            MemoryError: Throws when the memory used is still above the memory limit after releasing the cached pages.
+        """
+        if self.memory_limit is None:
+            return
+        rss = current_rss()
+        if rss is None or rss <= self.memory_limit:
+            return
+        self.release_pages()
+        rss = current_rss()
+        if rss > self.memory_limit:
+            raise MemoryError(f"Memory used ({rss // 2**20} MB) exceeds the memory limit ({self.memory_limit // 2**20} MB)")
+
+    def cancel_requested(self):
+        """Returns whether the job has been asked to cancel."""
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    def _cancel(self):
+        """Removes the outputs created by the job and stops it.
+
+        Raises:
+            JobCancelled: Always.
+        """
+        for output_file_path in self._written_files:
+            if os.path.exists(output_file_path):
+                os.remove(output_file_path)
+        if self.catalog is not None:
+            import sqlite3
+            try:
+                self._open_catalog().remove(self._written_files)
+            except sqlite3.Error as error:
+                logger.warning(f"Could not remove the outputs of the cancelled job from the catalog: {error}")
+        self._written_files = []
+        self._progress_counts = None
+        logger.info("Job cancelled, removed the files it created.")
+        raise JobCancelled('Job cancelled')
 
-        # Create complete set with the new metadata
-        title = metadata.get('/Title')
-        output_path_pdf = f'{output_path}/{title} - Complete Set.pdf'
-                
-        with open(output_path_pdf, "wb") as output_pdf:
-            pdf_writer.write(output_pdf)
+    def resolve_bookmarks(self, part_names):
+        """Resolves the page range of each part from the top level bookmarks of the score, using the outline index built on first use.
+
+        Args:
+            part_names (list[str]): A list of part names that correlate with the bookmarks of the score. The number of bookmarks and parts must match.
+
+        Raises:
+            ValueError: Throws when the number of part names does not match the number of bookmarks found.
+
+        Returns:
+            dict[str, (int, int)]: A dictionary of part name keys with tuple values that represent their start and end pages (zero indexed & inclusive).
+        """
+        if self.outline_index is None:
+            with span('outline', score=self.score_pdf):
+                self.outline_index = build_outline_index(self.pdf_reader)
+
+        return match_bookmarks(self.outline_index, part_names)
+
+    def resolve_outline(self, depth=None):
+        """Resolves the page range of each bookmark to output at a chosen depth, or at every depth, from a single walk of the outline built on first use.
+
+        Outputs are named after their bookmark path, e.g. 'Violin 1 - II. Adagio'. With part folders enabled, the outputs
+        of nested bookmarks go in the folder of their top level bookmark.
+
+        Args:
+            depth (int, optional): The depth of the bookmarks to output, 1 for top level bookmarks, see select_outline_depth. Every bookmark is output when not supplied.
+
+        Raises:
+            ValueError: Throws when the depth is below 1, the score has no bookmarks or two bookmarks have the same bookmark path.
+
+        Returns:
+            dict[str, (int, int)]: A dictionary of output name keys with tuple values that represent their start and end pages (zero indexed & inclusive).
+        """
+        if self.outline_tree is None:
+            with span('outline', score=self.score_pdf):
+                self.outline_tree = build_outline_tree(self.pdf_reader)
+        if not self.outline_tree:
+            raise ValueError('The score has no bookmarks')
+
+        selected = select_outline_depth(self.outline_tree, depth)
+        self.part_folder_names.update({name: outline_output_name(path[:1]) for name, (path, _, _) in selected.items()})
+        return {name: (start_page, end_page) for name, (_, start_page, end_page) in selected.items()}
+
+    def complete_set_path(self):
+        """Returns the output file path of the complete set."""
+        return f"{self.output_directory}/{self.metadata['/Title']} - Complete Set.pdf"
+
+    def part_path(self, part):
+        """Returns the output file path of the given part, inside its part folder when part folders are enabled."""
+        if self.part_folders:
+            return f"{self.output_directory}/{self.part_folder_names.get(part, part)}/{self.metadata['/Title']} - {part}.pdf"
+        return f"{self.output_directory}/{self.metadata['/Title']} - {part}.pdf"
+
+    def write_complete_set(self):
+        """Creates the complete set by copying every page of the score and adding the metadata.
+
+        When incremental metadata is enabled the score is copied byte for byte and the metadata is appended as an incremental update instead.
+
+        Raises:
+            JobCancelled: Throws when the job is cancelled before the complete set is created.
+        """
+        if self.cancel_requested():
+            self._cancel()
+        self._check_memory()
+
+        with span('part', part='Complete Set'):
+            if self.incremental_metadata:
+                with span('copy', part='Complete Set'):
+                    _write_metadata_update(self.pdf_reader, self.score_pdf, self.complete_set_path(), self.metadata, self.fsync)
+                digest = None  # Mostly copied rather than written, read back to be recorded
+            else:
+                pdf_writer = _build_complete_set_writer(self.pdf_reader, self.metadata)
+                _, digest = _write_pdf(pdf_writer, self.complete_set_path(), 'Complete Set', self.fsync)
+                del pdf_writer
+                if self.low_memory:
+                    self.release_pages()
+
+        self._output_created('Complete Set', len(self.pdf_reader.pages), self.complete_set_path(), digest)
+        logger.info("Complete set with metadata created.")
+
+    def write_parts(self, part_page_nums, workers=None):
+        """Creates a pdf for each part containing its pages and the metadata, tagged with the part name.
+
+        A part that fails to be created is reported and skipped so the remaining parts are still written.
+
+        Args:
+            part_page_nums (dict[str, (int, int)]): A dictionary of part name keys with tuple values that represent their start and end pages (zero indexed & inclusive).
+            workers (int, optional): The number of processes used to create parts in parallel. Parts are created one at a time in this process when not supplied. Low memory mode and the memory limit do not apply to parts created by workers.
+
+        Raises:
+            JobCancelled: Throws when the job is cancelled between parts.
+
+        Returns:
+            dict[str, Exception]: A dictionary of part name keys with the error raised while creating that part, empty when every part was created.
+        """
+        output_file_paths = {part: self.part_path(part) for part in part_page_nums}
+        if self.part_folders:
+            make_directories([os.path.dirname(output_file_path) for output_file_path in output_file_paths.values()])
+
+        page_counts = {part: max(pages[1] - pages[0] + 1, 0) for part, pages in part_page_nums.items()}
+        counting_progress = self._begin_progress(list(page_counts.values()))
+        failed_parts = {}
+        try:
+            if workers:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    futures = {}
+                    for part, pages in part_page_nums.items():
+                        logger.info(f"Creating part {part}")
+                        futures[part] = executor.submit(_write_part_from_source, self.score_pdf, part, pages, self.metadata, output_file_paths[part],
+                                                        self.fsync, self.compressor, tracing_enabled())
+
+                    for part, future in futures.items():
+                        if self.cancel_requested():
+                            # Let the running parts finish so every file they write is removed
+                            for pending in futures.values():
+                                pending.cancel()
+                            executor.shutdown(wait=True)
+                            self._written_files += [output_file_paths[started_part] for started_part, started in futures.items() if not started.cancelled()]
+                            self._cancel()
+                        try:
+                            span_records, (size_before, size_written, digest) = future.result()
+                            for span_record in span_records:
+                                emit(span_record)
+                            self._record_sizes(part, (size_before, size_written))
+                        except Exception as error:
+                            failed_parts[part] = error
+                            logger.error(f"Failed to create part '{part}': {error}")
+                            continue
+
+                        self._output_created(part, page_counts[part], output_file_paths[part], digest)
+                        logger.info(f"Extracted part '{part}' to '{output_file_paths[part]}'.")
+
+                return failed_parts
+
+            for part, pages in part_page_nums.items():
+                if self.cancel_requested():
+                    self._cancel()
+                self._check_memory()
+
+                logger.info(f"Creating part {part}")
+                try:
+                    with span('part', part=part):
+                        size_before, size_written, digest = _write_part(self.pdf_reader, pages, self.metadata, part, output_file_paths[part], self.fsync, self.compressor)
+                        self._record_sizes(part, (size_before, size_written))
+                        if self.low_memory:
+                            self.release_pages()
+                except Exception as error:
+                    failed_parts[part] = error
+                    logger.error(f"Failed to create part '{part}': {error}")
+                    continue
+
+                self._output_created(part, page_counts[part], output_file_paths[part], digest)
+                logger.info(f"Extracted part '{part}' to '{output_file_paths[part]}'.")
+
+            return failed_parts
+
+        finally:
+            if counting_progress:
+                self._progress_counts = None
+            self._record_peak_rss()
+
+    def bundle_path(self):
+        """Returns the output file path of the ZIP bundle."""
+        return f"{self.output_directory}/{self.metadata['/Title']}.zip"
+
+    def write_bundle(self, part_page_nums):
+        """Creates a single ZIP holding the complete set and a pdf for each part, laid out as they would be in the output directory.
+
+        Each pdf is serialized straight into its ZIP entry as soon as it is built, without a file of its own. The pdfs are
+        already compressed so entries are stored rather than deflated. The bundle only replaces an existing one once complete.
+
+        Args:
+            part_page_nums (dict[str, (int, int)]): A dictionary of part name keys with tuple values that represent their start and end pages (zero indexed & inclusive).
+
+        Raises:
+            JobCancelled: Throws when the job is cancelled between outputs, no bundle is created.
 
-        print("Complete set with metadata created.")
+        Returns:
+            dict[str, Exception]: A dictionary of part name keys with the error raised while creating that part, empty when every part was added.
+        """
+        outputs = {'Complete Set': (0, len(self.pdf_reader.pages) - 1), **part_page_nums}
+        counting_progress = self._begin_progress([max(pages[1] - pages[0] + 1, 0) for pages in outputs.values()])
+        failed_parts = {}
+        try:
+            with atomic_write(self.bundle_path(), fsync=self.fsync, span_fields={'part': 'Bundle'}) as bundle, \
+                    zipfile.ZipFile(bundle, 'w', compression=zipfile.ZIP_STORED) as bundle_zip:
+                for name, pages in outputs.items():
+                    if self.cancel_requested():
+                        self._cancel()
+                    self._check_memory()
+
+                    is_complete_set = name == 'Complete Set'
+                    output_file_path = self.complete_set_path() if is_complete_set else self.part_path(name)
+                    with span('part', part=name):
+                        try:
+                            if is_complete_set:
+                                pdf_writer = _build_complete_set_writer(self.pdf_reader, self.metadata)
+                            else:
+                                pdf_writer = _build_part_writer(self.pdf_reader, pages, self.metadata, name)
+                        except Exception as error:
+                            if is_complete_set:
+                                raise
+                            failed_parts[name] = error
+                            logger.error(f"Failed to create part '{name}': {error}")
+                            continue
+
+                        saved = self.compressor.compress(pdf_writer, name) if self.compressor is not None and not is_complete_set else None
+                        entry_name = os.path.relpath(output_file_path, self.output_directory).replace(os.sep, '/')
+                        with span('serialize', part=name), bundle_zip.open(entry_name, 'w', force_zip64=True) as entry:
+                            entry_writer = _PositionWriter(entry)
+                            pdf_writer.write(entry_writer)
+                        if not is_complete_set:
+                            self._record_sizes(name, (None if saved is None else entry_writer.tell() + saved, entry_writer.tell()))
+                        del pdf_writer
+                        if self.low_memory:
+                            self.release_pages()
+
+                    self._output_created(name, max(pages[1] - pages[0] + 1, 0))
+                    logger.info(f"Added '{entry_name}' to the bundle.")
+
+            self._written_files.append(self.bundle_path())
+            logger.info(f"Bundle created at '{self.bundle_path()}'.")
+            return failed_parts
+
+        finally:
+            if counting_progress:
+                self._progress_counts = None
+            self._record_peak_rss()
+
+    def _record_peak_rss(self):
+        """Records the peak resident memory of the process, reporting it in low memory mode."""
+        self.peak_rss = peak_rss()
+        if self.peak_rss is not None and (self.low_memory or self.memory_limit is not None):
+            logger.info(f"Peak memory used: {self.peak_rss / 2**20:.1f} MB")
+
+    def manifest_path(self):
+        """Returns the file path of the manifest recording the outputs of this score."""
+        return f"{self.output_directory}/.{self.metadata['/Title']} - {MANIFEST_SUFFIX}"
+
+    def output_hashes(self, part_page_nums):
+        """Hashes the content of each output from the pages of the score it is made from, the metadata, the part name and, for parts, the compressor settings.
+
+        Args:
+            part_page_nums (dict[str, (int, int)]): A dictionary of part name keys with tuple values that represent their start and end pages (zero indexed & inclusive).
+
+        Returns:
+            dict[str, str]: A dictionary of output file paths, relative to the output directory, with the hex digest of their content as values.
+        """
+        if self._page_hashes is None:
+            with span('manifest', score=self.score_pdf):
+                self._page_hashes = [page_content_hash(page) for page in self.pdf_reader.pages]
+
+        compressor_settings = self.compressor.settings() if self.compressor is not None else None
+
+        def output_hash(name, pages, compressed=True):
+            settings = compressor_settings if compressed else None
+            digest = hashlib.sha256(json.dumps([name, sorted(self.metadata.items()), self.incremental_metadata, settings], sort_keys=True).encode())
+            for page_hash in self._page_hashes[pages[0]:pages[1] + 1]:
+                digest.update(page_hash)
+            return digest.hexdigest()
+
+        output_hashes = {os.path.relpath(self.complete_set_path(), self.output_directory): output_hash('Complete Set', (0, len(self._page_hashes) - 1), compressed=False)}
+        for part, pages in part_page_nums.items():
+            output_hashes[os.path.relpath(self.part_path(part), self.output_directory)] = output_hash(part, pages)
+        return output_hashes
+
+    def read_manifest(self):
+        """Reads the output hashes recorded by the last run, empty when there is no manifest.
+
+        Returns:
+            dict[str, str]: A dictionary of output file paths, relative to the output directory, with the hex digest of their content as values.
+        """
+        try:
+            with open(self.manifest_path()) as manifest_file:
+                return json.load(manifest_file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def write_manifest(self, output_hashes):
+        """Replaces the manifest with the given output hashes.
+
+        Args:
+            output_hashes (dict[str, str]): A dictionary of output file paths, relative to the output directory, with the hex digest of their content as values.
+        """
+        with atomic_write(self.manifest_path(), mode="w", fsync=self.fsync) as manifest_file:
+            json.dump(output_hashes, manifest_file, indent=2, sort_keys=True)
+
+    def run(self, part_names, workers=None, force=False):
+        """Creates the complete set and splits the score by its bookmarks into the given parts.
+
+        The part page ranges are resolved before anything is written, so a bookmark mismatch produces no output.
+        When the manifest is enabled, outputs whose hash matches the last run and still exist are skipped.
+        When the ZIP bundle is enabled every output is written into the bundle instead, and the bundle is always recreated.
+
+        Args:
+            part_names (list[str]): A list of part names that correlate with the bookmarks of the score. The number of bookmarks and parts must match.
+            workers (int, optional): The number of processes used to create parts in parallel. Not used for ZIP bundles.
+            force (bool): Whether to recreate every output even if the manifest shows it is unchanged.
+
+        Raises:
+            ValueError: Throws when the number of part names does not match the number of bookmarks found.
+            JobCancelled: Throws when the job is cancelled between outputs, after removing the outputs it created.
+
+        Returns:
+            dict[str, Exception]: A dictionary of part name keys with the error raised while creating that part, empty when every part was created.
+        """
+        return self.run_pages(self.resolve_bookmarks(part_names), workers, force)
+
+    def run_outline(self, depth=None, workers=None, force=False):
+        """Creates the complete set and splits the score by its bookmarks at a chosen depth, or at every depth, in one pass, see resolve_outline.
+
+        The outline is walked once and every output is written from the same parse of the score, so the pages shared by a
+        part and its movements are read once.
+
+        Args:
+            depth (int, optional): The depth of the bookmarks to output, 1 for top level bookmarks. Every bookmark is output when not supplied.
+            workers (int, optional): The number of processes used to create outputs in parallel. Not used for ZIP bundles.
+            force (bool): Whether to recreate every output even if the manifest shows it is unchanged.
+
+        Raises:
+            ValueError: Throws when the depth is below 1, the score has no bookmarks or two bookmarks have the same bookmark path.
+            JobCancelled: Throws when the job is cancelled between outputs, after removing the outputs it created.
+
+        Returns:
+            dict[str, Exception]: A dictionary of output name keys with the error raised while creating that output, empty when every output was created.
+        """
+        return self.run_pages(self.resolve_outline(depth), workers, force)
+
+    def run_pages(self, part_page_nums, workers=None, force=False):
+        """Creates the complete set and splits the score into parts according to the given page numbers, see run.
+
+        Args:
+            part_page_nums (dict[str, (int, int)]): A dictionary of part name keys with tuple values that represent their start and end pages (zero indexed & inclusive).
+            workers (int, optional): The number of processes used to create parts in parallel. Not used for ZIP bundles.
+            force (bool): Whether to recreate every output even if the manifest shows it is unchanged.
+
+        Raises:
+            JobCancelled: Throws when the job is cancelled between outputs, after removing the outputs it created.
+
+        Returns:
+            dict[str, Exception]: A dictionary of part name keys with the error raised while creating that part, empty when every part was created.
+        """
+        with span('job', score=self.score_pdf):
+            self._written_files = []
+            if self.compressor is not None:
+                self.report_shared_resources(part_page_nums)
+            if self.zip_bundle:
+                return self.write_bundle(part_page_nums)
+            if not self.manifest:
+                self._begin_progress([len(self.pdf_reader.pages)] + [max(pages[1] - pages[0] + 1, 0) for pages in part_page_nums.values()])
+                try:
+                    self.write_complete_set()
+                    return self.write_parts(part_page_nums, workers)
+                finally:
+                    self._progress_counts = None
+
+            output_hashes = self.output_hashes(part_page_nums)
+            previous_hashes = {} if force else self.read_manifest()
+
+            def unchanged(output_file_path):
+                relative_path = os.path.relpath(output_file_path, self.output_directory)
+                return previous_hashes.get(relative_path) == output_hashes[relative_path] and os.path.exists(output_file_path)
+
+            complete_set_changed = not unchanged(self.complete_set_path())
+            changed_part_page_nums = {}
+            for part, pages in part_page_nums.items():
+                if unchanged(self.part_path(part)):
+                    logger.info(f"Skipped unchanged part '{part}'.")
+                else:
+                    changed_part_page_nums[part] = pages
+
+            self._begin_progress([len(self.pdf_reader.pages)] * complete_set_changed + [max(pages[1] - pages[0] + 1, 0) for pages in changed_part_page_nums.values()])
+            try:
+                if complete_set_changed:
+                    self.write_complete_set()
+                else:
+                    logger.info("Skipped unchanged complete set.")
+                failed_parts = self.write_parts(changed_part_page_nums, workers)
+            finally:
+                self._progress_counts = None
+
+            for part in failed_parts:
+                output_hashes.pop(os.path.relpath(self.part_path(part), self.output_directory))
+            self.write_manifest(output_hashes)
+
+            return failed_parts
+
+
+def add_metadata(file, output_path, metadata, incremental=False, catalog=None):
+    """Creates a new pdf by copying the contents of the supplied pdf and adding the supplied PDF standard metadata.
+
+    Args:
+        file (str): A file path representing the inputpdf file for which to add metadata
+        output_path (str): A directory path representing the location to output the new pdf with metadata
+        metadata (dict[str, str]): A dictionary of key/value pairs representing the metadata to add to the pdf. Keys must follow the PDF standard.
+        incremental (bool): Whether to append the metadata to a byte copy of the pdf as an incremental update instead of copying every page into a new pdf.
+        catalog (str, optional): A file path representing the SQLite database of a catalog to record the new pdf in.
+    """
+
+    try:
+        with ScoreJob(file, metadata, output_path, incremental_metadata=incremental, catalog=catalog) as job:
+            job.write_complete_set()
 
     except FileNotFoundError:
         print(f"File not found: {file}")
     except TypeError:
         print('File supplied is not of the .pdf format.')
+    except ValueError as error:
+        print(f'Could not add metadata incrementally: {error}')
 
-def split_score_by_bookmarks(score_pdf, part_names, metadata, output_directory):
+def split_score_by_bookmarks(score_pdf, part_names, metadata, output_directory, workers=None, catalog=None, low_memory=False, memory_limit=None):
     """Splits the given pdf score by its bookmarks that correlate to the given part names. The generated parts will include the given metadata and be stored at the given output location.
 
     Args:
@@ -47,64 +1165,64 @@ def split_score_by_bookmarks(score_pdf, part_names, metadata, output_directory):
         part_names (list[str]): A list of part names that correlate with the given bookmarks. The number of bookmarks and parts must match.
         metadata (dict[str,str]): A dictionary of key/value pairs representing the metadata to add to the pdf. Keys must follow the PDF standard.
         output_directory (str): A file path representing the output directory location to store the newly created files.
-        
+        workers (int, optional): The number of processes used to create parts in parallel. Parts are created one at a time when not supplied.
+        catalog (str, optional): A file path representing the SQLite database of a catalog to record each part in.
+        low_memory (bool): Whether the score is read through a memory map and the pages cached while creating each part are released once it is written. Ignored when workers is supplied.
+        memory_limit (int, optional): The resident memory in bytes the split may use, see ScoreJob. Ignored when workers is supplied.
+
         Raises:
         FileNotFoundError: Throws when the given score pdf path does does not exist.
         TypeError: Throws when the supplied score path does not point to a file in the .pdf format.
         ValueError: Throws when the number of part names does not match the number of bookmarks found.
-        
+
     """
     try:
-        if Path(score_pdf).suffix != '.pdf':
-            raise TypeError('Input file must be a pdf')
-        
-        with open(score_pdf, "rb") as pdf_file:
-            pdf_reader = PdfReader(pdf_file)
-            bookmarks = pdf_reader.outline
-            if len(bookmarks) != len(part_names):
-                raise ValueError(f"Mismatch between bookmark count ({len(bookmarks)}) and the supplied part names count ({len(part_names)})")
-
-            # Loop through each bookmarked section
-            for i in range(len(bookmarks)):
-                print(f"Creating part {part_names[i]}")
-                page_num_current_bookmark = pdf_reader.get_destination_page_number(
-                    bookmarks[i]
-                )
-                if i == len(bookmarks) - 1:  # Last bookmark
-                    page_num_next_bookmark = len(pdf_reader.pages)  # To end of pdf
-                else:
-                    page_num_next_bookmark = pdf_reader.get_destination_page_number(
-                        bookmarks[i + 1]
-                    )
+        with ScoreJob(score_pdf, metadata, output_directory, catalog=catalog, low_memory=low_memory, memory_limit=memory_limit) as job:
+            job.write_parts(job.resolve_bookmarks(part_names), workers)
 
-                # Create a new PDF with just the bookmarked section
-                pdf_writer = PdfWriter()
-                for j in range(page_num_next_bookmark - page_num_current_bookmark):
-                    pdf_writer.add_page(pdf_reader.pages[page_num_current_bookmark + j])
+    except FileNotFoundError:
+        print(f"File not found: {score_pdf}")
+    except TypeError:
+        print('File supplied is not of the .pdf format.')
+    except ValueError:
+        print('Supplied pdf with bookmarks does not match the supplied number of part names')
+    except MemoryError as error:
+        print(error)
 
-                new_metadata = metadata.copy()
 
-                new_metadata["/Tags"] = f"{part_names[i]}"
-                pdf_writer.add_metadata(new_metadata)
-                output_file_path = (
-                    f"{output_directory}/{metadata['/Title']} - {part_names[i]}.pdf"
-                )
+def split_score_by_outline(score_pdf, metadata, output_directory, depth=None, workers=None, catalog=None, low_memory=False, memory_limit=None):
+    """Splits the given pdf score by its bookmarks at a chosen depth, or at every depth, walking nested bookmarks (e.g. part then movement) in one pass.
+    The outputs are named after their bookmark path, e.g. 'Title - Violin 1 - II. Adagio.pdf', include the given metadata and are stored at the given output location.
 
-                with open(output_file_path, "wb") as output_pdf:
-                    pdf_writer.write(output_pdf)
+    Args:
+        score_pdf (str): A file path representing the pdf of the score to be split. Must contain bookmarks (outlines).
+        metadata (dict[str,str]): A dictionary of key/value pairs representing the metadata to add to the pdf. Keys must follow the PDF standard.
+        output_directory (str): A file path representing the output directory location to store the newly created files.
+        depth (int, optional): The depth of the bookmarks to output, 1 for top level bookmarks. Every bookmark is output when not supplied.
+        workers (int, optional): The number of processes used to create outputs in parallel. Outputs are created one at a time when not supplied.
+        catalog (str, optional): A file path representing the SQLite database of a catalog to record each output in.
+        low_memory (bool): Whether the score is read through a memory map and the pages cached while creating each output are released once it is written. Ignored when workers is supplied.
+        memory_limit (int, optional): The resident memory in bytes the split may use, see ScoreJob. Ignored when workers is supplied.
 
-                print(f"Extracted part '{part_names[i]}' to '{output_file_path}'.")
+    Raises:
+        FileNotFoundError: Throws when the given score pdf path does not exist.
+        TypeError: Throws when the supplied score path does not point to a file in the .pdf format.
+        ValueError: Throws when the depth is below 1, the score has no bookmarks or two bookmarks have the same bookmark path.
+    """
+    try:
+        with ScoreJob(score_pdf, metadata, output_directory, catalog=catalog, low_memory=low_memory, memory_limit=memory_limit) as job:
+            job.write_parts(job.resolve_outline(depth), workers)
 
     except FileNotFoundError:
         print(f"File not found: {score_pdf}")
     except TypeError:
         print('File supplied is not of the .pdf format.')
-    except ValueError:
-        print('Supplied pdf with bookmarks does not match the supplied number of part names')
-        
+    except (ValueError, MemoryError) as error:
+        print(error)
+
 
-def split_score_by_pages(score_pdf, part_page_nums, metadata, output_directory):
-    """Spilts a score into parts according to the given page numbers. 
+def split_score_by_pages(score_pdf, part_page_nums, metadata, output_directory, workers=None, catalog=None, low_memory=False, memory_limit=None):
+    """Spilts a score into parts according to the given page numbers.
     Adds the supplied part names and metadata to each part and outputs as a new pdf
     to the specified output directory.
 
@@ -113,40 +1231,22 @@ def split_score_by_pages(score_pdf, part_page_nums, metadata, output_directory):
         part_page_nums (dict[str, (int, int)]): A dictionary of part name keys with tuple values that represent their start and end pages (zero indexed & inclusive).
         metadata (dict[str,str]): A dictionary of key/value pairs representing the metadata to add to the pdf. Keys must follow the PDF standard.
         output_directory (str): A file path representing the output directory location to store the newly created files.
+        workers (int, optional): The number of processes used to create parts in parallel. Parts are created one at a time when not supplied.
+        catalog (str, optional): A file path representing the SQLite database of a catalog to record each part in.
+        low_memory (bool): Whether the score is read through a memory map and the pages cached while creating each part are released once it is written. Ignored when workers is supplied.
+        memory_limit (int, optional): The resident memory in bytes the split may use, see ScoreJob. Ignored when workers is supplied.
 
     Raises:
         FileNotFoundError: Throws when the given score pdf path does not exist.
         TypeError: Throws when the supplied score path does not point to a file in the .pdf format.
     """
     try:
-        if Path(score_pdf).suffix != '.pdf':
-            raise TypeError('Input file must be a pdf')
-        
-        with open(score_pdf, "rb") as pdf_file:
-            pdf_reader = PdfReader(pdf_file)
-            
-            for part, pages in part_page_nums.items():
-                print(f"Creating part {part}")
+        with ScoreJob(score_pdf, metadata, output_directory, catalog=catalog, low_memory=low_memory, memory_limit=memory_limit) as job:
+            job.write_parts(part_page_nums, workers)
 
-                pdf_writer = PdfWriter()
-                for i in range(pages[0], pages[1] + 1):
-                    pdf_writer.add_page(pdf_reader.pages[i])
-
-                new_metadata = metadata.copy()
-
-                new_metadata["/Tags"] = f"{part}"
-                pdf_writer.add_metadata(new_metadata)
-                output_file_path = (
-                    f"{output_directory}/{metadata['/Title']} - {part}.pdf"
-                )
-
-                with open(output_file_path, "wb") as output_pdf:
-                    pdf_writer.write(output_pdf)
-
-                print(f"Extracted part '{part}' to '{output_file_path}'.")
-                
-    
     except FileNotFoundError:
         print(f"File not found: {score_pdf}")
     except TypeError:
-        print('File supplied is not of the .pdf format.')
\ No newline at end of file
+        print('File supplied is not of the .pdf format.')
+    except MemoryError as error:
+        print(error)
@@ -0,0 +1,143 @@
+import io
+import os
+import json
+import shutil
+import unittest
+import tempfile
+from contextlib import redirect_stderr, redirect_stdout
+from pypdf import PdfReader
+from benchmarks.generate import generate_score
+from batch import ScoreSkipped, find_scores, main, preflight, read_metadata_csv, resolve_metadata
+
+class TestBatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Make temporary directory to house input & output
+        cls.temp = tempfile.TemporaryDirectory()
+        cls.score_path = 'tests/test_score.pdf'
+        cls.part_names = ['Score', 'Vibraphone 1', 'Vibraphone 2', 'Male Vocal']
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.temp.cleanup()
+
+    def setUp(self) -> None:
+        self.scores = tempfile.mkdtemp(dir=self.temp.name)
+        self.output = tempfile.mkdtemp(dir=self.temp.name)
+        for name in ('pineapple.pdf', 'krusty krab.pdf'):
+            shutil.copy(self.score_path, f'{self.scores}/{name}')
+        self.parts_file = f'{self.scores}/parts.txt'
+        with open(self.parts_file, 'w') as parts_file:
+            parts_file.write('\n'.join(self.part_names) + '\n')
+
+    def test_find_scores(self):
+        expected_scores = [f'{self.scores}/krusty krab.pdf', f'{self.scores}/pineapple.pdf']
+        self.assertListEqual(find_scores([self.scores]), expected_scores)
+        self.assertListEqual(find_scores([f'{self.scores}/pine*']), expected_scores[1:])
+
+    def test_resolve_metadata(self):
+        csv_path = f'{self.scores}/metadata.csv'
+        with open(csv_path, 'w') as csv_file:
+            csv_file.write('score,title,composer,style\nkrusty krab.pdf,Krusty Krab Pizza,Spongebob,Jingle\n')
+        with open(f'{self.scores}/pineapple.json', 'w') as sidecar:
+            json.dump({'title': 'Who lives in a pineapple under the sea?', 'composer': 'Patrick Star', 'style': 'Calypso'}, sidecar)
+        csv_metadata = read_metadata_csv(csv_path)
+
+        self.assertDictEqual(resolve_metadata(f'{self.scores}/krusty krab.pdf', csv_metadata), {'/Title': 'Krusty Krab Pizza', '/Author': 'Spongebob', '/Subject': 'Jingle'})
+        self.assertDictEqual(resolve_metadata(f'{self.scores}/pineapple.pdf', csv_metadata), {'/Title': 'Who lives in a pineapple under the sea?', '/Author': 'Patrick Star', '/Subject': 'Calypso'})
+        self.assertDictEqual(resolve_metadata(f'{self.scores}/pineapple.pdf', {}), {'/Title': 'Who lives in a pineapple under the sea?', '/Author': 'Patrick Star', '/Subject': 'Calypso'})
+        os.remove(f'{self.scores}/pineapple.json')
+        self.assertEqual(resolve_metadata(f'{self.scores}/pineapple.pdf', csv_metadata)['/Title'], 'pineapple')
+
+    def test_output(self):
+        exit_status = main([self.scores, '--output', self.output, '--parts', self.parts_file, '--workers', '2', '--part-folders'])
+
+        self.assertEqual(exit_status, 0)
+        for title in ('pineapple', 'krusty krab'):
+            self.assertTrue(os.path.exists(f'{self.output}/{title} - Complete Set.pdf'))
+            for part in self.part_names:
+                pdf_reader = PdfReader(f'{self.output}/{part}/{title} - {part}.pdf')
+                self.assertEqual(pdf_reader.metadata.title, title)
+
+    def test_failed_score_exit_status(self):
+        with open(self.parts_file, 'w') as parts_file:
+            parts_file.write('Score\nVibraphone 1\n')
+
+        exit_status = main([self.scores, '--output', self.output, '--parts', self.parts_file, '--workers', '1'])
+
+        self.assertEqual(exit_status, 1)
+        self.assertListEqual(os.listdir(self.output), [])
+
+    def test_outline(self):
+        with open(self.parts_file, 'w') as parts_file:
+            parts_file.write('Score\nVibraphone 1\n')
+
+        exit_status = main([self.scores, '--output', self.output, '--parts', self.parts_file, '--workers', '1', '--outline', '1'])
+
+        self.assertEqual(exit_status, 0)
+        self.assertEqual(len([file for file in os.listdir(self.output) if file.endswith('.pdf')]), 10)
+        self.assertTrue(os.path.exists(f'{self.output}/pineapple - Vibraphone 2.pdf'))
+
+    def test_detect_parts(self):
+        shutil.rmtree(self.scores)
+        os.mkdir(self.scores)
+        part_names = generate_score(f'{self.scores}/band book.pdf', part_count=4, pages_per_part=2)
+        with open(self.parts_file, 'w') as parts_file:
+            parts_file.write('\n'.join(part_names) + '\n')
+
+        exit_status = main([self.scores, '--output', self.output, '--parts', self.parts_file, '--workers', '2', '--detect-parts'])
+
+        self.assertEqual(exit_status, 0)
+        for part in part_names:
+            self.assertEqual(len(PdfReader(f'{self.output}/band book - {part}.pdf').pages), 2)
+
+    def test_mirror(self):
+        mirror = tempfile.mkdtemp(dir=self.temp.name)
+
+        exit_status = main([self.scores, '--output', self.output, '--parts', self.parts_file, '--workers', '1', '--part-folders', '--mirror', mirror, '--link', 'hardlink'])
+
+        self.assertEqual(exit_status, 0)
+        self.assertTrue(os.path.samefile(f'{self.output}/Male Vocal/pineapple - Male Vocal.pdf', f'{mirror}/Male Vocal/pineapple - Male Vocal.pdf'))
+        self.assertFalse(any(file.startswith('.') for file in os.listdir(mirror)))
+
+    def test_preflight(self):
+        with open(f'{self.scores}/broken.pdf', 'wb') as broken:
+            broken.write(b'not a pdf')
+
+        self.assertListEqual(list(preflight(f'{self.scores}/pineapple.pdf', self.part_names)), self.part_names)
+        with self.assertRaises(ScoreSkipped):
+            preflight(f'{self.scores}/broken.pdf', self.part_names)
+        with self.assertRaisesRegex(ScoreSkipped, r'bookmark count \(4\)'):
+            preflight(f'{self.scores}/pineapple.pdf', self.part_names[:2])
+
+        with redirect_stdout(io.StringIO()) as output:
+            exit_status = main([self.scores, '--output', self.output, '--parts', self.parts_file, '--workers', '2'])
+
+        self.assertEqual(exit_status, 1)
+        self.assertIn(f'SKIPPED {self.scores}/broken.pdf', output.getvalue())
+        self.assertTrue(os.path.exists(f'{self.output}/pineapple - Complete Set.pdf'))
+        self.assertFalse(any(file.startswith('broken') for file in os.listdir(self.output)))
+
+    def test_skipped_scores_not_counted(self):
+        with open(f'{self.scores}/broken.pdf', 'wb') as broken:
+            broken.write(b'not a pdf')
+
+        with redirect_stdout(io.StringIO()) as output:
+            exit_status = main([self.scores, '--output', self.output, '--parts', self.parts_file, '--workers', '1'])
+
+        self.assertEqual(exit_status, 1)
+        self.assertIn('Processed 2 scores in', output.getvalue())
+        self.assertIn('0 failed, 1 skipped.', output.getvalue())
+
+    def test_workers_must_be_positive(self):
+        for workers in ('0', '-2', 'many'):
+            with self.subTest(workers=workers), redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+                main([self.scores, '--output', self.output, '--workers', workers])
+
+    def test_outline_depth_must_not_be_negative(self):
+        for depth in ('-3', 'deep'):
+            with self.subTest(depth=depth), redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+                main([self.scores, '--output', self.output, '--outline', depth])
+
+    def test_no_scores_found(self):
+        self.assertEqual(main([f'{self.scores}/*.missing', '--output', self.output]), 1)
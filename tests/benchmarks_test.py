@@ -0,0 +1,88 @@
+import unittest
+import tempfile
+from pypdf import PdfReader
+from benchmarks.generate import generate_score, part_names_for
+from benchmarks.run import compare_with_baseline
+from benchmarks.startup import ENTRY_POINTS, deferred_imports, import_time, parse_importtime
+from pdf_operations import build_outline_index
+
+class TestGenerateScore(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Make temporary directory to house generated scores
+        cls.temp = tempfile.TemporaryDirectory()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.temp.cleanup()
+
+    def test_part_names(self):
+        part_names = part_names_for(20)
+
+        self.assertEqual(part_names[0], 'Conductor')
+        self.assertEqual(part_names[-1], 'Part 20')
+        self.assertEqual(len(set(part_names)), 20)
+
+    def test_flat_vector_score(self):
+        score_path = f'{self.temp.name}/vector.pdf'
+        part_names = generate_score(score_path, part_count=3, pages_per_part=2)
+
+        pdf_reader = PdfReader(score_path)
+        self.assertEqual(len(pdf_reader.pages), 6)
+        self.assertEqual(len(pdf_reader.outline), 3)
+        self.assertListEqual(build_outline_index(pdf_reader), [(part, i * 2, i * 2 + 1) for i, part in enumerate(part_names)])
+        self.assertIn(part_names[1], pdf_reader.pages[2].extract_text())
+
+    def test_nested_scanned_score(self):
+        score_path = f'{self.temp.name}/scanned.pdf'
+        part_names = generate_score(score_path, part_count=2, pages_per_part=3, scanned=True, nested=True, scan_dpi=20)
+
+        pdf_reader = PdfReader(score_path)
+        self.assertEqual(len(pdf_reader.outline), 4)  # Each part bookmark is followed by a list of its nested bookmarks
+        self.assertListEqual(build_outline_index(pdf_reader), [(part, i * 3, i * 3 + 2) for i, part in enumerate(part_names)])
+        self.assertEqual(len(pdf_reader.pages[0].images), 1)
+
+    def test_same_seed_same_score(self):
+        generate_score(f'{self.temp.name}/first.pdf', part_count=2, pages_per_part=1)
+        generate_score(f'{self.temp.name}/second.pdf', part_count=2, pages_per_part=1)
+
+        with open(f'{self.temp.name}/first.pdf', 'rb') as first, open(f'{self.temp.name}/second.pdf', 'rb') as second:
+            self.assertEqual(first.read(), second.read())
+
+class TestCompareWithBaseline(unittest.TestCase):
+    def test_regressions(self):
+        baseline = [{'scenario': 'vector-flat', 'case': 'split_score_by_pages', 'wall_time_s': 1.0},
+                    {'scenario': 'vector-flat', 'case': 'add_metadata', 'wall_time_s': 1.0}]
+        results = [{'scenario': 'vector-flat', 'case': 'split_score_by_pages', 'wall_time_s': 1.5},
+                   {'scenario': 'vector-flat', 'case': 'add_metadata', 'wall_time_s': 1.1},
+                   {'scenario': 'scanned-flat', 'case': 'add_metadata', 'wall_time_s': 9.0}]
+
+        regressions = compare_with_baseline(results, baseline, tolerance=0.2)
+
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('split_score_by_pages', regressions[0])
+
+class TestStartup(unittest.TestCase):
+    def test_parse_importtime(self):
+        stderr = ("import time: self [us] | cumulative | imported package\n"
+                  "import time:       120 |        120 |   pypdf._utils\n"
+                  "import time:      1500 |       1620 | pypdf\n"
+                  "Traceback line that is not part of the report\n")
+
+        imports = parse_importtime(stderr)
+
+        self.assertListEqual(imports, [('pypdf._utils', 120, 120), ('pypdf', 1500, 1620)])
+        self.assertListEqual(deferred_imports(imports), ['pypdf'])
+
+    def test_score_operations_defer_sqlite(self):
+        _, imports = import_time('pdf_operations', repeat=1)
+
+        self.assertListEqual(deferred_imports(imports, ['sqlite3']), [])
+
+    def test_entry_points_defer_heavy_imports(self):
+        for module in ENTRY_POINTS:
+            with self.subTest(module=module):
+                timings, imports = import_time(module, repeat=1)
+
+                self.assertEqual(len(timings), 1)
+                self.assertListEqual(deferred_imports(imports), [])
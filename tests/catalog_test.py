@@ -0,0 +1,119 @@
+import os
+import shutil
+import unittest
+import tempfile
+from catalog import Catalog, index_folders, main, read_pdf_record
+from pypdf import PdfWriter
+from pypdf.generic import NameObject, TextStringObject
+from pdf_operations import ScoreJob, add_metadata, split_score_by_bookmarks
+
+class TestCatalog(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Make temporary directory to house output & catalogs
+        cls.temp = tempfile.TemporaryDirectory()
+        cls.metadata = {'/Author': 'SpongeBob Squarepants, Patrick Star', '/Title': 'Who lives in a pineapple under the sea?', '/Subject': 'Calypso, Vocal'}
+        cls.score_path = 'tests/test_score.pdf'
+        cls.part_names = ['Score', 'Vibraphone 1', 'Vibraphone 2', 'Male Vocal']
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.temp.cleanup()
+
+    def setUp(self) -> None:
+        self.output = tempfile.mkdtemp(dir=self.temp.name)
+        self.database = f'{self.output}.sqlite'
+
+    def test_read_pdf_record(self):
+        split_score_by_bookmarks(self.score_path, self.part_names, self.metadata, self.output)
+
+        record = read_pdf_record(f"{self.output}/{self.metadata['/Title']} - Vibraphone 2.pdf")
+
+        self.assertEqual(record['title'], self.metadata['/Title'])
+        self.assertEqual(record['subject'], self.metadata['/Subject'])
+        self.assertEqual(record['tag'], 'Vibraphone 2')
+        self.assertEqual(record['page_count'], 2)
+
+    def test_outputs_recorded(self):
+        add_metadata(self.score_path, self.output, self.metadata, catalog=self.database)
+        split_score_by_bookmarks(self.score_path, self.part_names, self.metadata, self.output, catalog=self.database)
+
+        with Catalog(self.database) as catalog:
+            self.assertEqual(len(catalog.query()), 5)
+            records = catalog.query(style='calypso', part='vibraphone 1')
+
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['path'], os.path.abspath(f"{self.output}/{self.metadata['/Title']} - Vibraphone 1.pdf"))
+
+    def test_recorded_outputs_match_files(self):
+        for workers in (None, 2):
+            with self.subTest(workers=workers):
+                output = tempfile.mkdtemp(dir=self.temp.name)
+                with ScoreJob(self.score_path, self.metadata, output, catalog=self.database) as job:
+                    job.run(self.part_names, workers=workers)
+
+                with Catalog(self.database) as catalog:
+                    records = catalog.query()
+                for record in records:
+                    if record['path'].startswith(os.path.abspath(output)):
+                        self.assertDictEqual(record, read_pdf_record(record['path']))
+
+    def test_catalog_failure_logged(self):
+        with self.assertLogs('pdf_operations', level='WARNING') as logs:
+            split_score_by_bookmarks(self.score_path, self.part_names, self.metadata, self.output, catalog=f'{self.output}/missing/library.sqlite')
+
+        self.assertEqual(len(os.listdir(self.output)), 4)
+        self.assertIn('Could not record', logs.output[0])
+
+    def test_query_filters(self):
+        split_score_by_bookmarks(self.score_path, self.part_names, self.metadata, self.output, catalog=self.database)
+
+        with Catalog(self.database) as catalog:
+            self.assertListEqual(catalog.query(style='Swing'), [])
+            self.assertEqual(len(catalog.query(author='patrick')), 4)
+            self.assertListEqual(catalog.query(title='100%'), [])
+            self.assertListEqual(catalog.query(part='Vibraphone'), [])
+
+    def test_index_folders(self):
+        split_score_by_bookmarks(self.score_path, self.part_names, self.metadata, self.output)
+        shutil.copy(self.score_path, self.output)
+
+        self.assertTupleEqual(index_folders(self.database, [self.output], workers=2), (5, 0, 0, 0))
+        self.assertTupleEqual(index_folders(self.database, [self.output]), (0, 5, 0, 0))
+
+        os.remove(f"{self.output}/{self.metadata['/Title']} - Score.pdf")
+        os.utime(f'{self.output}/test_score.pdf', (0, 0))
+        self.assertTupleEqual(index_folders(self.database, [self.output]), (1, 3, 1, 0))
+        with Catalog(self.database) as catalog:
+            self.assertEqual(len(catalog.query()), 4)
+
+    def test_indirect_information_read(self):
+        pdf_writer = PdfWriter()
+        pdf_writer.add_blank_page(595, 842)
+        for key, value in (('/Title', 'Indirect Title'), ('/Author', 'Indirect Author'), ('/Tags', 'Trombone 3')):
+            pdf_writer._info[NameObject(key)] = pdf_writer._add_object(TextStringObject(value))
+        pdf_writer.write(f'{self.output}/indirect.pdf')
+
+        record = read_pdf_record(f'{self.output}/indirect.pdf')
+
+        self.assertEqual((record['title'], record['author'], record['subject'], record['tag']), ('Indirect Title', 'Indirect Author', None, 'Trombone 3'))
+        self.assertIs(type(record['title']), str)
+        self.assertTupleEqual(index_folders(self.database, [self.output], workers=2), (1, 0, 0, 0))
+
+    def test_unreadable_pdf_skipped(self):
+        split_score_by_bookmarks(self.score_path, self.part_names, self.metadata, self.output)
+        with open(f'{self.output}/broken.pdf', 'wb') as broken:
+            broken.write(b'not a pdf')
+
+        for workers in (None, 2):
+            with self.subTest(workers=workers):
+                with self.assertLogs('catalog', level='WARNING') as logs:
+                    self.assertTupleEqual(index_folders(f'{self.output}/{workers}.sqlite', [self.output], workers), (4, 0, 0, 1))
+
+                self.assertIn('broken.pdf', logs.output[0])
+
+    def test_command_line(self):
+        split_score_by_bookmarks(self.score_path, self.part_names, self.metadata, self.output)
+
+        self.assertEqual(main(['index', self.output, '--db', self.database, '--workers', '1']), 0)
+        self.assertEqual(main(['query', '--db', self.database, '--part', 'Male Vocal']), 0)
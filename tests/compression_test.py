@@ -0,0 +1,131 @@
+import io
+import os
+import unittest
+import tempfile
+from unittest import mock
+from pypdf import PdfReader, PdfWriter
+from benchmarks.generate import generate_score
+from compression import PartCompressor, duplicated_bytes, pdf_size, pillow_installed, shared_resources
+from pdf_operations import ScoreJob, build_outline_index, match_bookmarks
+
+def scanned_page(mode, width=2480, height=3508, dpi=300):
+    """Builds a pdf of a single scanned page of staves, as a monochrome or greyscale image."""
+    from PIL import Image
+
+    image = Image.new('L', (width, height), 255)
+    for staff in range(30):
+        top = 100 + staff * 110
+        for line in range(5):
+            image.paste(0, (50, top + line * 16, width - 50, top + line * 16 + 3))
+    if mode == '1':
+        image = image.convert('1')
+    pdf = io.BytesIO()
+    image.save(pdf, 'PDF', resolution=dpi, **({} if mode == '1' else {'quality': 95}))
+    pdf_writer = PdfWriter()
+    pdf_writer.append(PdfReader(pdf))
+    return pdf_writer
+
+class TestPartCompressor(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Make temporary directory to house the generated score & output
+        cls.temp = tempfile.TemporaryDirectory()
+        cls.score_path = f'{cls.temp.name}/score.pdf'
+        cls.part_names = generate_score(cls.score_path, part_count=3, pages_per_part=2)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.temp.cleanup()
+
+    def test_pillow_required_for_images(self):
+        with mock.patch('compression.pillow_installed', return_value=False):
+            with self.assertRaises(ImportError):
+                PartCompressor(target_dpi=150)
+            PartCompressor(target_dpi=None)
+
+    def test_part_sizes_reported(self):
+        output = tempfile.mkdtemp(dir=self.temp.name)
+        with ScoreJob(self.score_path, {'/Title': 'Benchmark'}, output, compressor=PartCompressor(target_dpi=None)) as job:
+            job.run(self.part_names)
+
+        self.assertListEqual(list(job.part_sizes), self.part_names)
+        for part, (size_before, size_after) in job.part_sizes.items():
+            self.assertEqual(size_after, os.path.getsize(f'{output}/Benchmark - {part}.pdf'))
+            self.assertLessEqual(size_after, size_before)
+            self.assertEqual(len(PdfReader(f'{output}/Benchmark - {part}.pdf').pages), 2)
+
+    def test_parallel_part_sizes_reported(self):
+        output = tempfile.mkdtemp(dir=self.temp.name)
+        with ScoreJob(self.score_path, {'/Title': 'Benchmark'}, output, compressor=PartCompressor(target_dpi=None)) as job:
+            job.run(self.part_names, workers=2)
+
+        self.assertListEqual(sorted(job.part_sizes), sorted(self.part_names))
+
+    def test_shared_resources(self):
+        score_path = f'{self.temp.name}/embedded_font.pdf'
+        part_names = generate_score(score_path, part_count=3, pages_per_part=2, font_bytes=4096, font_per_page=True)
+        pdf_reader = PdfReader(score_path)
+
+        shared = shared_resources(pdf_reader, match_bookmarks(build_outline_index(pdf_reader), part_names))
+
+        self.assertEqual(len(shared), 1)
+        self.assertDictEqual(shared[0], {'name': '/F1', 'type': 'font', 'bytes': 4096, 'parts': part_names, 'copies': 6})
+        self.assertEqual(duplicated_bytes(shared), 4096 * 2)
+        self.assertListEqual(shared_resources(pdf_reader, {'Conductor': (0, 1)}), [])
+
+    def test_job_logs_shared_resources(self):
+        score_path = f'{self.temp.name}/shared_font.pdf'
+        part_names = generate_score(score_path, part_count=3, pages_per_part=2, font_bytes=4096)
+        output = tempfile.mkdtemp(dir=self.temp.name)
+        with self.assertLogs('pdf_operations', level='INFO') as logs, \
+                ScoreJob(score_path, {'/Title': 'Fonts'}, output, compressor=PartCompressor(target_dpi=None)) as job:
+            job.run(part_names)
+
+        self.assertEqual(len(job.shared_resources), 1)
+        self.assertIn('1 resources shared across parts, adding 8 kB beyond one copy each', '\n'.join(logs.output))
+
+    def test_identical_resources_merged_inside_part(self):
+        score_path = f'{self.temp.name}/font_per_page.pdf'
+        part_names = generate_score(score_path, part_count=2, pages_per_part=3, font_bytes=4096, font_per_page=True)
+        plain_output, dedupe_output = tempfile.mkdtemp(dir=self.temp.name), tempfile.mkdtemp(dir=self.temp.name)
+        with ScoreJob(score_path, {'/Title': 'Fonts'}, plain_output) as job:
+            job.run(part_names)
+        with ScoreJob(score_path, {'/Title': 'Fonts'}, dedupe_output, compressor=PartCompressor(target_dpi=None)) as job:
+            job.run(part_names)
+
+        pdf_reader = PdfReader(f'{dedupe_output}/Fonts - Conductor.pdf')
+        fonts = {page['/Resources'].raw_get('/Font').get_object().raw_get('/F1').idnum for page in pdf_reader.pages}
+        self.assertEqual(len(fonts), 1)
+        self.assertLess(os.path.getsize(f'{dedupe_output}/Fonts - Conductor.pdf'), os.path.getsize(f'{plain_output}/Fonts - Conductor.pdf') - 4096)
+
+    @unittest.skipIf(not pillow_installed(), 'Pillow is not installed')
+    def test_greyscale_scan_downsampled(self):
+        pdf_writer = scanned_page('L')
+
+        size_before = pdf_size(pdf_writer)
+        saved = PartCompressor(target_dpi=150).compress(pdf_writer, 'Score')
+
+        image = pdf_writer.pages[0]['/Resources']['/XObject']['/image']
+        self.assertEqual(image['/Width'], 1240)
+        self.assertEqual(image['/Filter'], '/DCTDecode')
+        self.assertLess(pdf_size(pdf_writer), size_before)
+        # Counted from the stream data, without serializing the part before compression
+        self.assertAlmostEqual(pdf_size(pdf_writer) + saved, size_before, delta=size_before * 0.01)
+
+    @unittest.skipIf(not pillow_installed(), 'Pillow is not installed')
+    def test_bilevel_scan_stays_bilevel(self):
+        pdf_writer = scanned_page('1')
+
+        PartCompressor(target_dpi=150).compress(pdf_writer, 'Score')
+
+        image = pdf_writer.pages[0]['/Resources']['/XObject']['/image']
+        self.assertEqual(image['/Width'], 1240)
+        self.assertEqual(image['/BitsPerComponent'], 1)
+
+    @unittest.skipIf(not pillow_installed(), 'Pillow is not installed')
+    def test_low_resolution_image_kept(self):
+        pdf_writer = scanned_page('L', width=1240, height=1754, dpi=150)
+
+        PartCompressor(target_dpi=150, quality=95).compress(pdf_writer, 'Score')
+
+        self.assertEqual(pdf_writer.pages[0]['/Resources']['/XObject']['/image']['/Width'], 1240)
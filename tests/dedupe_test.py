@@ -0,0 +1,90 @@
+import os
+import shutil
+import unittest
+import tempfile
+from catalog import index_folders
+from dedupe import dedupe_files, find_identical_files, main, mirror_tree
+from file_operations import LINK_COPY, LINK_HARDLINK
+from pdf_operations import split_score_by_bookmarks
+
+class TestDedupe(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Make temporary directory to house the library trees
+        cls.temp = tempfile.TemporaryDirectory()
+        cls.metadata = {'/Author': 'SpongeBob Squarepants, Patrick Star', '/Title': 'Who lives in a pineapple under the sea?', '/Subject': 'Calypso, Vocal'}
+        cls.score_path = 'tests/test_score.pdf'
+        cls.part_names = ['Score', 'Vibraphone 1', 'Vibraphone 2', 'Male Vocal']
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.temp.cleanup()
+
+    def setUp(self) -> None:
+        self.library = tempfile.mkdtemp(dir=self.temp.name)
+        self.concert = f'{self.library}/Concert'
+        self.archive = f'{self.library}/Archive'
+        os.mkdir(self.concert)
+        split_score_by_bookmarks(self.score_path, self.part_names, self.metadata, self.concert)
+        shutil.copytree(self.concert, self.archive)
+        with open(f'{self.archive}/.{self.metadata["/Title"]} - Manifest.json', 'w') as manifest:
+            manifest.write('{}')
+
+    def files(self, folder):
+        return sorted(f'{folder}/{file}' for file in os.listdir(folder) if not file.startswith('.'))
+
+    def test_find_identical_files(self):
+        groups = find_identical_files(self.files(self.concert) + self.files(self.archive))
+
+        self.assertEqual(len(groups), 4)
+        for kept_file, identical_file in groups:
+            self.assertEqual(os.path.basename(kept_file), os.path.basename(identical_file))
+            self.assertTrue(kept_file.startswith(self.concert))
+
+    def test_catalog_hashes_reused(self):
+        database = f'{self.library}.sqlite'
+        index_folders(database, [self.library])
+        with open(f'{self.archive}/{self.metadata["/Title"]} - Score.pdf', 'r+b') as changed:
+            changed.write(b'%PDF-1.9')
+
+        groups = find_identical_files(self.files(self.concert) + self.files(self.archive), catalog=database)
+
+        self.assertEqual(len(groups), 3)
+
+    def test_dedupe_files(self):
+        files = self.files(self.concert) + self.files(self.archive)
+
+        report = dedupe_files(files, LINK_HARDLINK)
+
+        self.assertEqual(report['linked'], 4)
+        self.assertEqual(report['bytes_saved'], sum(os.path.getsize(file) for file in self.files(self.archive)))
+        self.assertGreaterEqual(report['write_seconds_saved'], 0.0)
+        for concert_file, archive_file in zip(self.files(self.concert), self.files(self.archive)):
+            self.assertTrue(os.path.samefile(concert_file, archive_file))
+        self.assertEqual(dedupe_files(files, LINK_HARDLINK)['skipped'], 4)
+
+    def test_dry_run(self):
+        report = dedupe_files(self.files(self.concert) + self.files(self.archive), LINK_HARDLINK, dry_run=True)
+
+        self.assertEqual(report['linked'], 4)
+        self.assertFalse(os.path.samefile(self.files(self.concert)[0], self.files(self.archive)[0]))
+        self.assertEqual(len(os.listdir(self.archive)), 5)  # The parts and the manifest, the probe link is removed
+
+    def test_dry_run_copy(self):
+        report = dedupe_files(self.files(self.concert) + self.files(self.archive), LINK_COPY, dry_run=True)
+
+        self.assertEqual((report['linked'], report['copied'], report['bytes_saved'], report['write_seconds_saved']), (0, 4, 0, 0.0))
+
+    def test_mirror_tree(self):
+        mirror = f'{self.library}/Ensemble'
+        os.mkdir(f'{self.concert}/.cache')
+
+        report = mirror_tree(self.concert, [mirror], LINK_HARDLINK)
+
+        self.assertEqual(report['linked'], 4)
+        self.assertListEqual(sorted(os.listdir(mirror)), [os.path.basename(file) for file in self.files(self.concert)])
+        self.assertEqual(mirror_tree(self.concert, [mirror, self.archive], LINK_COPY)['skipped'], 8)
+
+    def test_command_line(self):
+        self.assertEqual(main([self.concert, self.archive, '--link', 'hardlink']), 0)
+        self.assertTrue(os.path.samefile(self.files(self.concert)[0], self.files(self.archive)[0]))
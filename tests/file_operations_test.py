@@ -2,7 +2,7 @@ import os
 import shutil
 import unittest
 import tempfile as tf
-from file_operations import move_files_to_directories
+from file_operations import FSYNC_FULL, LINK_COPY, LINK_HARDLINK, LINK_REFLINK, atomic_write, link_file, make_directories, move_files_to_directories, probe_link, time_copy
 
 class TestMoveFilesToDirectories(unittest.TestCase):
     @classmethod
@@ -65,3 +65,129 @@ class TestMoveFilesToDirectories(unittest.TestCase):
         
         self.assertRaises(FileNotFoundError)
 
+
+class TestAtomicWrite(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp = tf.TemporaryDirectory()
+        self.output = f'{self.temp.name}/output.pdf'
+
+    def tearDown(self) -> None:
+        self.temp.cleanup()
+
+    def test_replaces_existing_file(self):
+        with open(self.output, 'wb') as output:
+            output.write(b'old')
+
+        with atomic_write(self.output, fsync=FSYNC_FULL) as output:
+            output.write(b'new')
+
+        with open(self.output, 'rb') as output:
+            self.assertEqual(output.read(), b'new')
+        self.assertListEqual(os.listdir(self.temp.name), ['output.pdf'])
+
+    def test_failed_write_leaves_destination_untouched(self):
+        with open(self.output, 'wb') as output:
+            output.write(b'old')
+
+        with self.assertRaises(RuntimeError):
+            with atomic_write(self.output) as output:
+                output.write(b'partial')
+                raise RuntimeError
+
+        with open(self.output, 'rb') as output:
+            self.assertEqual(output.read(), b'old')
+        self.assertListEqual(os.listdir(self.temp.name), ['output.pdf'])
+
+    def test_copy_from_appends(self):
+        source = f'{self.temp.name}/source.pdf'
+        with open(source, 'wb') as source_file:
+            source_file.write(b'original')
+
+        with atomic_write(self.output, copy_from=source) as output:
+            output.write(b' update')
+
+        with open(self.output, 'rb') as output:
+            self.assertEqual(output.read(), b'original update')
+
+    @unittest.skipIf(os.name == 'nt', 'permissions are not modelled by the umask on Windows')
+    def test_permissions_follow_umask(self):
+        previous_umask = os.umask(0o027)
+        try:
+            with atomic_write(self.output) as output:
+                output.write(b'new')
+            with open(f'{self.temp.name}/plain.pdf', 'wb') as plain:
+                plain.write(b'new')
+        finally:
+            os.umask(previous_umask)
+
+        self.assertEqual(os.stat(self.output).st_mode & 0o777, 0o640)
+        self.assertEqual(os.stat(self.output).st_mode & 0o777, os.stat(f'{self.temp.name}/plain.pdf').st_mode & 0o777)
+
+    def test_unknown_fsync_policy(self):
+        with self.assertRaises(ValueError):
+            with atomic_write(self.output, fsync='always'):
+                pass
+
+    def test_make_directories(self):
+        directories = [f'{self.temp.name}/Trumpet 1', f'{self.temp.name}/Trumpet 1', f'{self.temp.name}/Rhythm/Piano']
+
+        make_directories(directories)
+
+        self.assertTrue(os.path.isdir(f'{self.temp.name}/Trumpet 1'))
+        self.assertTrue(os.path.isdir(f'{self.temp.name}/Rhythm/Piano'))
+
+
+class TestLinkFile(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp = tf.TemporaryDirectory()
+        self.source = f'{self.temp.name}/source.pdf'
+        self.destination = f'{self.temp.name}/destination.pdf'
+        with open(self.source, 'wb') as source:
+            source.write(b'part' * 1024)
+
+    def tearDown(self) -> None:
+        self.temp.cleanup()
+
+    def test_hardlink_replaces_existing_file(self):
+        with open(self.destination, 'wb') as destination:
+            destination.write(b'old')
+
+        self.assertEqual(link_file(self.source, self.destination, LINK_HARDLINK), LINK_HARDLINK)
+
+        self.assertTrue(os.path.samefile(self.source, self.destination))
+        self.assertListEqual(sorted(os.listdir(self.temp.name)), ['destination.pdf', 'source.pdf'])
+
+    def test_hardlink_already_linked(self):
+        os.link(self.source, self.destination)
+
+        self.assertEqual(link_file(self.source, self.destination, LINK_HARDLINK), LINK_HARDLINK)
+
+        self.assertTrue(os.path.samefile(self.source, self.destination))
+        self.assertListEqual(sorted(os.listdir(self.temp.name)), ['destination.pdf', 'source.pdf'])
+
+    def test_reflink_falls_back_to_copy(self):
+        method = link_file(self.source, self.destination, LINK_REFLINK)
+
+        self.assertIn(method, (LINK_REFLINK, LINK_COPY))
+        self.assertFalse(os.path.samefile(self.source, self.destination))
+        with open(self.destination, 'rb') as destination:
+            self.assertEqual(destination.read(), b'part' * 1024)
+
+    def test_copy_disabled(self):
+        self.assertIsNone(link_file(self.source, self.destination, LINK_COPY, copy=False))
+        self.assertFalse(os.path.exists(self.destination))
+
+    def test_unknown_link_policy(self):
+        with self.assertRaises(ValueError):
+            link_file(self.source, self.destination, 'symlink')
+
+    def test_probe_link_leaves_folder_unchanged(self):
+        self.assertEqual(probe_link(self.source, self.temp.name, LINK_HARDLINK), LINK_HARDLINK)
+        self.assertIsNone(probe_link(self.source, self.temp.name, LINK_COPY))
+
+        self.assertListEqual(os.listdir(self.temp.name), ['source.pdf'])
+
+    def test_time_copy_leaves_folder_unchanged(self):
+        self.assertGreater(time_copy(self.source, self.temp.name), 0.0)
+
+        self.assertListEqual(os.listdir(self.temp.name), ['source.pdf'])
@@ -0,0 +1,46 @@
+import tempfile
+import threading
+import unittest
+from main import run_score_job
+
+
+class EventRecorder:
+    """Stands in for the window, recording the events posted to its event loop."""
+
+    def __init__(self):
+        self.events = []
+
+    def write_event_value(self, key, value):
+        self.events.append((key, value))
+
+
+class TestRunScoreJob(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp = tempfile.TemporaryDirectory()
+        self.score_path = 'tests/test_score.pdf'
+        self.part_names = ['Score', 'Vibraphone 1', 'Vibraphone 2', 'Male Vocal']
+
+    def tearDown(self) -> None:
+        self.temp.cleanup()
+
+    def run_job(self, metadata):
+        window = EventRecorder()
+        run_score_job(window, self.score_path, metadata, self.temp.name, False, False, False, False, self.part_names, threading.Event())
+        return window.events
+
+    def test_done_posted(self):
+        events = self.run_job({'/Title': 'Test Score', '/Author': 'Test Composer', '/Subject': 'Test Style'})
+
+        self.assertEqual(events[-1], ('-DONE-', 'Done.'))
+
+    def test_unexpected_error_logged_and_done_posted(self):
+        with self.assertLogs('main', level='ERROR') as logs:
+            events = self.run_job({})
+
+        self.assertIn('Traceback', '\n'.join(logs.output))
+        self.assertEqual(events[-1][0], '-DONE-')
+        self.assertTrue(events[-1][1].startswith('Failed to split the score'))
+
+
+if __name__ == '__main__':
+    unittest.main()
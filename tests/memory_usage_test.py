@@ -0,0 +1,22 @@
+import os
+import sys
+import unittest
+from memory_usage import current_rss, peak_rss
+
+class TestMemoryUsage(unittest.TestCase):
+    @unittest.skipIf(sys.platform == 'win32', 'resource module is not available on Windows')
+    def test_peak_rss(self):
+        before = peak_rss()
+        allocation = bytearray(64 * 2**20)
+
+        self.assertGreater(before, 0)
+        self.assertGreaterEqual(peak_rss(), before)
+        del allocation
+
+    @unittest.skipIf(not os.path.exists('/proc/self/statm'), '/proc is not available on this platform')
+    def test_current_rss(self):
+        self.assertGreater(current_rss(), 0)
+
+    @unittest.skipIf(os.path.exists('/proc/self/statm'), '/proc is available on this platform')
+    def test_current_rss_unmeasured(self):
+        self.assertIsNone(current_rss())
@@ -0,0 +1,75 @@
+import json
+import unittest
+import tempfile
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+from benchmarks.generate import generate_score
+from part_detection import detect_part_pages, header_text, match_part, page_header_texts
+from pdf_operations import build_outline_index
+
+class TestDetectPartPages(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Make temporary directory to house the generated score & caches
+        cls.temp = tempfile.TemporaryDirectory()
+        cls.score_path = f'{cls.temp.name}/score.pdf'
+        cls.part_names = generate_score(cls.score_path, part_count=12, pages_per_part=3)
+        cls.bookmark_pages = {part: (start, end) for part, (_, start, end) in zip(cls.part_names, build_outline_index(PdfReader(cls.score_path)))}
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.temp.cleanup()
+
+    def test_incorrect_file_format(self):
+        with self.assertRaises(TypeError):
+            detect_part_pages('tests/parts_alternate.txt', self.part_names)
+
+    def test_header_text(self):
+        page = PdfReader(self.score_path).pages[0]
+
+        self.assertEqual(header_text(page), 'Conductor Page 1')
+        self.assertEqual(header_text(page, header_fraction=0.01), '')
+
+    def test_header_text_skips_body_text(self):
+        pdf_writer = PdfWriter()
+        page = pdf_writer.add_blank_page(595, 842)
+        page[NameObject('/Resources')] = DictionaryObject({NameObject('/Font'): DictionaryObject({NameObject('/F1'): DictionaryObject({
+            NameObject('/Type'): NameObject('/Font'), NameObject('/Subtype'): NameObject('/Type1'), NameObject('/BaseFont'): NameObject('/Helvetica')})})})
+        content = DecodedStreamObject()
+        content.set_data(b"BT /F1 16 Tf 14 TL 72 820 Td (Trumpet 1) Tj (Big Band Book) ' (Lyrics of verse one) ' ET\n"
+                         b"q 1 0 0 1 0 -700 cm BT /F1 9 Tf 500 1500 Td (Page 2) Tj ET Q\n"
+                         b"BT /F1 9 Tf 72 400 Td (Trumpet 2 cue) Tj ET")
+        page.replace_contents(content)
+
+        self.assertEqual(header_text(page, header_fraction=0.05), 'Trumpet 1 Big Band Book Page 2')
+
+    def test_match_part(self):
+        part_names = ['Trumpet 1', 'Trumpet 10', 'Piano']
+
+        self.assertEqual(match_part('Big Band Book  TRUMPET 10', part_names), 'Trumpet 10')
+        self.assertEqual(match_part('Trumpet 1 Page 2', part_names), 'Trumpet 1')
+        self.assertIsNone(match_part('Pianoforte', part_names))
+
+    def test_detect_matches_bookmarks(self):
+        self.assertDictEqual(detect_part_pages(self.score_path, self.part_names), self.bookmark_pages)
+
+    def test_parallel_matches_serial(self):
+        self.assertListEqual(page_header_texts(self.score_path, workers=2), page_header_texts(self.score_path))
+
+    def test_cache(self):
+        cache_file = f'{self.temp.name}/cache.json'
+        detect_part_pages(self.score_path, self.part_names, cache_file=cache_file)
+        with open(cache_file) as cache:
+            header_cache = json.load(cache)
+        self.assertEqual(len(header_cache), len(PdfReader(self.score_path).pages))
+
+        # Cached headers are used instead of reading the pages again
+        header_cache = {page_hash: text.replace('Alto Sax 2', 'Conductor') for page_hash, text in header_cache.items()}
+        with open(cache_file, 'w') as cache:
+            json.dump(header_cache, cache)
+        with self.assertRaises(ValueError):
+            detect_part_pages(self.score_path, self.part_names, cache_file=cache_file)
+
+    def test_no_parts_found(self):
+        with self.assertRaises(ValueError):
+            detect_part_pages(self.score_path, ['Bagpipes'])
@@ -1,8 +1,13 @@
+import io
 import os
 import unittest
 import tempfile
-from pypdf import PdfReader
-from pdf_operations import add_metadata, split_score_by_bookmarks, split_score_by_pages
+import threading
+import zipfile
+from pypdf import PdfReader, PdfWriter
+from compression import PartCompressor, pillow_installed
+from memory_usage import current_rss
+from pdf_operations import JobCancelled, ScoreJob, build_outline_index, build_outline_tree, add_metadata, iter_parts, iter_parts_by_bookmarks, plan_split, select_outline_depth, split_score_by_bookmarks, split_score_by_outline, split_score_by_pages
 
 class TestPdfMetadata(unittest.TestCase):
     @classmethod
@@ -49,6 +54,30 @@ class TestPdfMetadata(unittest.TestCase):
         for i in range(len(actualPdf.pages)):
             self.assertEqual(actualPdf.pages[i].extract_text(), expectedPdf.pages[i].extract_text())
 
+    def test_incremental_metadata_output(self):
+        output_folder = tempfile.mkdtemp(dir=self.temp.name)
+        add_metadata(self.score_path, output_folder, self.metadata, incremental=True)
+
+        actualPdf = PdfReader(f'{output_folder}/{self.complete_set_path}', strict=True)
+        expectedPdf = PdfReader(self.score_path)
+
+        # Check the outputted file has the specified metadata & unchanged pages
+        self.assertEqual(actualPdf.metadata.author, self.metadata['/Author'])
+        self.assertEqual(actualPdf.metadata.title, self.metadata['/Title'])
+        self.assertEqual(actualPdf.metadata.subject, self.metadata['/Subject'])
+        self.assertEqual(len(actualPdf.pages), len(expectedPdf.pages))
+        for i in range(len(actualPdf.pages)):
+            self.assertEqual(actualPdf.pages[i].extract_text(), expectedPdf.pages[i].extract_text())
+
+    def test_incremental_metadata_appends_to_original(self):
+        output_folder = tempfile.mkdtemp(dir=self.temp.name)
+        add_metadata(self.score_path, output_folder, self.metadata, incremental=True)
+
+        with open(self.score_path, 'rb') as expected_pdf, open(f'{output_folder}/{self.complete_set_path}', 'rb') as actual_pdf:
+            original = expected_pdf.read()
+            self.assertEqual(actual_pdf.read(len(original)), original)
+
+
 class TestSplitPdfBookmarks(unittest.TestCase):
     @classmethod
     def setUpClass(cls) -> None:
@@ -152,6 +181,16 @@ class TestSplitPdfPages(unittest.TestCase):
             self.assertTrue(os.path.exists(f'{self.temp}/{part}'))
             self.assertEquals(f'{self.temp}/{part}', f'{self.temp}/{self.metadata["/Title"]} - {expected_parts[i]}.pdf')
          
+    def test_low_memory(self):
+        expected_folder = tempfile.mkdtemp(dir=self.temp)
+        split_score_by_pages(self.score_path, self.part_page_nums, self.metadata, expected_folder)
+        split_score_by_pages(self.score_path, self.part_page_nums, self.metadata, self.temp, low_memory=True, memory_limit=2**40)
+
+        for part in self.part_page_nums:
+            file_name = f'{self.metadata["/Title"]} - {part}.pdf'
+            with open(f'{expected_folder}/{file_name}', 'rb') as expected_pdf, open(f'{self.temp}/{file_name}', 'rb') as actual_pdf:
+                self.assertEqual(actual_pdf.read(), expected_pdf.read())
+
     def test_file_output_count(self):
         add_metadata(self.score_path, self.temp, self.metadata)
         split_score_by_pages(self.score_path, self.part_page_nums, self.metadata, self.temp)
@@ -177,4 +216,402 @@ class TestSplitPdfPages(unittest.TestCase):
             self.assertEqual(pdf_reader.metadata.author, self.metadata['/Author'])
             self.assertEqual(pdf_reader.metadata.title, f'{self.metadata["/Title"]}')
             self.assertEqual(pdf_reader.metadata.subject, self.metadata['/Subject'])
-        
\ No newline at end of file
+        
+class TestScoreJob(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Make temporary directory to house output
+        cls.temp = tempfile.TemporaryDirectory()
+        cls.metadata = {'/Author': 'SpongeBob Squarepants, Patrick Star', '/Title': 'Who lives in a pineapple under the sea?', '/Subject': 'Calypso, Vocal'}
+        cls.score_path = 'tests/test_score.pdf'
+        cls.part_names = ['Score', 'Vibraphone 1', 'Vibraphone 2', 'Male Vocal']
+        cls.complete_set_path = 'Who lives in a pineapple under the sea? - Complete Set.pdf'
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.temp.cleanup()
+
+    def setUp(self) -> None:
+        new_test_folder = tempfile.mkdtemp(dir=self.temp.name)
+        self.temp = new_test_folder
+
+    def test_empty_path(self):
+        with self.assertRaises(FileNotFoundError):
+            ScoreJob('tests/missing_score.pdf', self.metadata, self.temp)
+
+    def test_incorrect_file_format(self):
+        with self.assertRaises(TypeError):
+            ScoreJob('tests/parts_alternate.txt', self.metadata, self.temp)
+
+    def test_resolve_bookmarks(self):
+        with ScoreJob(self.score_path, self.metadata, self.temp) as job:
+            actual_page_nums = job.resolve_bookmarks(self.part_names)
+
+        expected_page_nums = {'Score': (0, 2), 'Vibraphone 1': (3, 3), 'Vibraphone 2': (4, 5), 'Male Vocal': (6, 6)}
+        self.assertDictEqual(actual_page_nums, expected_page_nums)
+
+    def test_part_bookmark_mismatch_writes_nothing(self):
+        with ScoreJob(self.score_path, self.metadata, self.temp) as job:
+            with self.assertRaises(ValueError):
+                job.run(['Score', 'Vibraphone 1'])
+
+        self.assertListEqual(os.listdir(self.temp), [])
+
+    def test_output_location(self):
+        with ScoreJob(self.score_path, self.metadata, self.temp) as job:
+            job.run(self.part_names)
+
+        expected_files = sorted([self.complete_set_path] + [f'{self.metadata["/Title"]} - {part}.pdf' for part in self.part_names])
+        self.assertListEqual(sorted(os.listdir(self.temp)), expected_files)
+
+    def test_output_location_part_folders(self):
+        with ScoreJob(self.score_path, self.metadata, self.temp, part_folders=True) as job:
+            job.run(self.part_names)
+
+        self.assertListEqual(sorted(os.listdir(self.temp)), sorted([self.complete_set_path] + self.part_names))
+        for part in self.part_names:
+            self.assertTrue(os.path.exists(f'{self.temp}/{part}/{self.metadata["/Title"]} - {part}.pdf'))
+
+    def test_parts_match_split_score_by_bookmarks(self):
+        expected_folder = tempfile.mkdtemp(dir=self.temp)
+        split_score_by_bookmarks(self.score_path, self.part_names, self.metadata, expected_folder)
+        with ScoreJob(self.score_path, self.metadata, self.temp) as job:
+            job.write_parts(job.resolve_bookmarks(self.part_names))
+
+        for part in self.part_names:
+            file_name = f'{self.metadata["/Title"]} - {part}.pdf'
+            expected_pdf = PdfReader(f'{expected_folder}/{file_name}')
+            actual_pdf = PdfReader(f'{self.temp}/{file_name}')
+            self.assertEqual(len(actual_pdf.pages), len(expected_pdf.pages))
+            self.assertEqual(actual_pdf.metadata['/Tags'], part)
+
+    def test_parallel_parts_byte_identical(self):
+        part_page_nums = {'Score': (0,2), 'Vibraphone 1': (3,3), 'Vibraphone 2': (4,5), 'Male Vocal': (6,6)}
+        serial_folder = tempfile.mkdtemp(dir=self.temp)
+        parallel_folder = tempfile.mkdtemp(dir=self.temp)
+        split_score_by_pages(self.score_path, part_page_nums, self.metadata, serial_folder)
+        split_score_by_pages(self.score_path, part_page_nums, self.metadata, parallel_folder, workers=2)
+
+        self.assertListEqual(sorted(os.listdir(parallel_folder)), sorted(os.listdir(serial_folder)))
+        for file_name in os.listdir(serial_folder):
+            with open(f'{serial_folder}/{file_name}', 'rb') as serial_pdf, open(f'{parallel_folder}/{file_name}', 'rb') as parallel_pdf:
+                self.assertEqual(serial_pdf.read(), parallel_pdf.read())
+
+    def test_failed_parts_reported(self):
+        part_page_nums = {'Score': (0,2), 'Missing': (7,8), 'Male Vocal': (6,6)}
+        for workers in (None, 2):
+            output_folder = tempfile.mkdtemp(dir=self.temp)
+            with ScoreJob(self.score_path, self.metadata, output_folder) as job:
+                failed_parts = job.write_parts(part_page_nums, workers)
+
+            self.assertListEqual(list(failed_parts), ['Missing'])
+            self.assertIsInstance(failed_parts['Missing'], IndexError)
+            self.assertEqual(len(os.listdir(output_folder)), 2)
+
+
+    def test_manifest_skips_unchanged_outputs(self):
+        with ScoreJob(self.score_path, self.metadata, self.temp, manifest=True) as job:
+            job.run(self.part_names)
+        modified_times = {file_name: os.stat(f'{self.temp}/{file_name}').st_mtime_ns for file_name in os.listdir(self.temp)}
+        os.remove(f'{self.temp}/{self.metadata["/Title"]} - Male Vocal.pdf')
+
+        with ScoreJob(self.score_path, self.metadata, self.temp, manifest=True) as job:
+            job.run(self.part_names)
+
+        for file_name, modified_time in modified_times.items():
+            if file_name.endswith('Male Vocal.pdf') or file_name.endswith('Manifest.json'):
+                continue
+            self.assertEqual(os.stat(f'{self.temp}/{file_name}').st_mtime_ns, modified_time)
+        self.assertTrue(os.path.exists(f'{self.temp}/{self.metadata["/Title"]} - Male Vocal.pdf'))
+
+    def test_manifest_rewrites_changed_parts(self):
+        score_path = f'{self.temp}/score.pdf'
+        output_folder = tempfile.mkdtemp(dir=self.temp)
+        PdfWriter(clone_from=self.score_path).write(score_path)
+        with ScoreJob(score_path, self.metadata, output_folder, manifest=True) as job:
+            job.run(self.part_names)
+        modified_times = {file_name: os.stat(f'{output_folder}/{file_name}').st_mtime_ns for file_name in os.listdir(output_folder)}
+
+        # Fix a page of the Vibraphone 2 part & resubmit
+        pdf_writer = PdfWriter(clone_from=self.score_path)
+        pdf_writer.pages[5].rotate(90)
+        pdf_writer.write(score_path)
+        with ScoreJob(score_path, self.metadata, output_folder, manifest=True) as job:
+            job.run(self.part_names)
+
+        changed_files = sorted(file_name for file_name, modified_time in modified_times.items() if os.stat(f'{output_folder}/{file_name}').st_mtime_ns != modified_time)
+        expected_files = sorted([f'.{self.metadata["/Title"]} - Manifest.json', self.complete_set_path, f'{self.metadata["/Title"]} - Vibraphone 2.pdf'])
+        self.assertListEqual(changed_files, expected_files)
+
+    def test_manifest_force(self):
+        with ScoreJob(self.score_path, self.metadata, self.temp, manifest=True) as job:
+            job.run(self.part_names)
+        modified_times = {file_name: os.stat(f'{self.temp}/{file_name}').st_mtime_ns for file_name in os.listdir(self.temp)}
+
+        with ScoreJob(self.score_path, self.metadata, self.temp, manifest=True) as job:
+            job.run(self.part_names, force=True)
+
+        for file_name, modified_time in modified_times.items():
+            self.assertNotEqual(os.stat(f'{self.temp}/{file_name}').st_mtime_ns, modified_time)
+
+    @unittest.skipIf(not pillow_installed(), 'Pillow is not installed')
+    def test_manifest_compressor_change_rewrites_parts(self):
+        part_file = f'{self.temp}/{self.metadata["/Title"]} - Score.pdf'
+        complete_set_file = f'{self.temp}/{self.complete_set_path}'
+        with ScoreJob(self.score_path, self.metadata, self.temp, manifest=True) as job:
+            job.run(self.part_names)
+
+        for compressor in (PartCompressor(target_dpi=None), PartCompressor(target_dpi=150), PartCompressor(target_dpi=150, quality=50), None):
+            modified_times = (os.stat(part_file).st_mtime_ns, os.stat(complete_set_file).st_mtime_ns)
+            with ScoreJob(self.score_path, self.metadata, self.temp, manifest=True, compressor=compressor) as job:
+                job.run(self.part_names)
+
+            self.assertNotEqual(os.stat(part_file).st_mtime_ns, modified_times[0])
+            self.assertEqual(os.stat(complete_set_file).st_mtime_ns, modified_times[1])
+
+        with ScoreJob(self.score_path, self.metadata, self.temp, manifest=True) as job:
+            modified_time = os.stat(part_file).st_mtime_ns
+            job.run(self.part_names)
+        self.assertEqual(os.stat(part_file).st_mtime_ns, modified_time)
+
+    def test_progress(self):
+        progress_events = []
+        with ScoreJob(self.score_path, self.metadata, self.temp, progress=lambda *event: progress_events.append(event)) as job:
+            job.run(self.part_names)
+
+        expected_events = [('Complete Set', 1, 5, 7, 14), ('Score', 2, 5, 10, 14), ('Vibraphone 1', 3, 5, 11, 14), ('Vibraphone 2', 4, 5, 13, 14), ('Male Vocal', 5, 5, 14, 14)]
+        self.assertListEqual(progress_events, expected_events)
+
+    def test_cancel_removes_created_files(self):
+        for workers in (None, 2):
+            output_folder = tempfile.mkdtemp(dir=self.temp)
+            cancel_event = threading.Event()
+            with ScoreJob(self.score_path, self.metadata, output_folder, progress=lambda *event: cancel_event.set(), cancel_event=cancel_event) as job:
+                with self.assertRaises(JobCancelled):
+                    job.run(self.part_names, workers)
+
+            self.assertListEqual(os.listdir(output_folder), [])
+
+    def test_cancel_parallel_split(self):
+        cancel_event = threading.Event()
+        with ScoreJob(self.score_path, self.metadata, self.temp, progress=lambda *event: cancel_event.set(), cancel_event=cancel_event) as job:
+            part_page_nums = job.resolve_bookmarks(self.part_names)
+            with self.assertRaises(JobCancelled):
+                job.write_parts(part_page_nums, workers=2)
+
+        self.assertListEqual(os.listdir(self.temp), [])
+
+    def test_zip_bundle(self):
+        with ScoreJob(self.score_path, self.metadata, self.temp, part_folders=True, zip_bundle=True) as job:
+            failed_parts = job.run(self.part_names)
+
+        self.assertEqual(failed_parts, {})
+        self.assertListEqual(os.listdir(self.temp), ['Who lives in a pineapple under the sea?.zip'])
+        with zipfile.ZipFile(f'{self.temp}/Who lives in a pineapple under the sea?.zip') as bundle:
+            entries = bundle.infolist()
+            self.assertListEqual([entry.filename for entry in entries], [self.complete_set_path] + [f'{part}/Who lives in a pineapple under the sea? - {part}.pdf' for part in self.part_names])
+            self.assertTrue(all(entry.compress_type == zipfile.ZIP_STORED for entry in entries))
+            part_reader = PdfReader(io.BytesIO(bundle.read(entries[1].filename)))
+            self.assertEqual(part_reader.metadata['/Tags'], 'Score')
+
+    def test_zip_bundle_cancelled(self):
+        cancel_event = threading.Event()
+        with ScoreJob(self.score_path, self.metadata, self.temp, zip_bundle=True, progress=lambda *event: cancel_event.set(), cancel_event=cancel_event) as job:
+            with self.assertRaises(JobCancelled):
+                job.run(self.part_names)
+
+        self.assertListEqual(os.listdir(self.temp), [])
+
+    def test_low_memory_output_unchanged(self):
+        expected_folder = tempfile.mkdtemp(dir=self.temp)
+        with ScoreJob(self.score_path, self.metadata, expected_folder) as job:
+            job.run(self.part_names)
+        with ScoreJob(self.score_path, self.metadata, self.temp, low_memory=True) as job:
+            job.run(self.part_names)
+            self.assertGreater(job.peak_rss, 0)
+
+        for file_name in os.listdir(expected_folder):
+            with open(f'{expected_folder}/{file_name}', 'rb') as expected_pdf, open(f'{self.temp}/{file_name}', 'rb') as actual_pdf:
+                self.assertEqual(actual_pdf.read(), expected_pdf.read())
+
+    def test_release_pages_reopens_reader(self):
+        with ScoreJob(self.score_path, self.metadata, self.temp, low_memory=True) as job:
+            pdf_reader = job.pdf_reader
+            job.release_pages()
+
+            self.assertIsNot(job.pdf_reader, pdf_reader)
+            self.assertEqual(len(job.pdf_reader.pages), len(pdf_reader.pages))
+
+    @unittest.skipIf(current_rss() is None, 'current memory cannot be measured on this platform')
+    def test_memory_limit_exceeded(self):
+        with ScoreJob(self.score_path, self.metadata, self.temp, low_memory=True, memory_limit=1) as job:
+            with self.assertRaises(MemoryError):
+                job.run(self.part_names)
+
+        self.assertListEqual(os.listdir(self.temp), [])
+
+class TestIterParts(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.temp = tempfile.TemporaryDirectory()
+        cls.metadata = {'/Author': 'SpongeBob Squarepants, Patrick Star', '/Title': 'Who lives in a pineapple under the sea?', '/Subject': 'Calypso, Vocal'}
+        cls.part_names = ['Score', 'Vibraphone 1', 'Vibraphone 2', 'Male Vocal']
+        with open('tests/test_score.pdf', 'rb') as score:
+            cls.score_bytes = score.read()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.temp.cleanup()
+
+    def test_parts_match_file_output(self):
+        split_score_by_bookmarks('tests/test_score.pdf', self.part_names, self.metadata, self.temp.name)
+
+        parts = dict(iter_parts_by_bookmarks(self.score_bytes, self.part_names, self.metadata))
+
+        self.assertListEqual(list(parts), self.part_names)
+        for part, data in parts.items():
+            with open(f"{self.temp.name}/{self.metadata['/Title']} - {part}.pdf", 'rb') as part_pdf:
+                self.assertEqual(data, part_pdf.read())
+
+    def test_parts_built_lazily(self):
+        parts = iter_parts_by_bookmarks(memoryview(self.score_bytes), self.part_names, self.metadata, complete_set=True)
+
+        name, data = next(parts)
+
+        self.assertEqual(name, 'Complete Set')
+        self.assertEqual(len(PdfReader(io.BytesIO(data)).pages), len(PdfReader('tests/test_score.pdf').pages))
+        self.assertListEqual([name for name, _ in parts], self.part_names)
+
+    def test_file_like_source_as_stream(self):
+        with open('tests/test_score.pdf', 'rb') as score:
+            parts = list(iter_parts(score, {'Score': (0, 0)}, self.metadata, as_stream=True))
+
+        self.assertEqual(parts[0][0], 'Score')
+        part_reader = PdfReader(parts[0][1])
+        self.assertEqual(len(part_reader.pages), 1)
+        self.assertEqual(part_reader.metadata['/Tags'], 'Score')
+
+    def test_part_bookmark_mismatch(self):
+        with self.assertRaises(ValueError):
+            iter_parts_by_bookmarks(self.score_bytes, self.part_names[:2], self.metadata)
+
+    def test_unsupported_source(self):
+        with self.assertRaises(TypeError):
+            iter_parts('tests/test_score.pdf', {'Score': (0, 0)}, self.metadata)
+
+
+class TestPlanSplit(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.score_path = 'tests/test_score.pdf'
+        cls.part_names = ['Score', 'Vibraphone 1', 'Vibraphone 2', 'Male Vocal']
+
+    def test_empty_path(self):
+        with self.assertRaises(FileNotFoundError):
+            plan_split('tests/missing_score.pdf', self.part_names)
+
+    def test_incorrect_file_format(self):
+        with self.assertRaises(TypeError):
+            plan_split('tests/parts_alternate.txt', self.part_names)
+
+    def test_plan(self):
+        plan = plan_split(self.score_path, self.part_names)
+
+        self.assertEqual(plan['page_count'], 7)
+        self.assertDictEqual(plan['parts'], {'Score': (0, 2), 'Vibraphone 1': (3, 3), 'Vibraphone 2': (4, 5), 'Male Vocal': (6, 6)})
+        self.assertListEqual(plan['mismatches'], [])
+
+    def test_part_bookmark_mismatch(self):
+        with open(self.score_path, 'rb') as score:
+            plan = plan_split(score.read(), self.part_names[:3])
+
+        self.assertDictEqual(plan['parts'], {})
+        self.assertEqual(len(plan['bookmarks']), 4)
+        self.assertListEqual(plan['mismatches'], ['Mismatch between bookmark count (4) and the supplied part names count (3)'])
+
+    def test_duplicate_part_names(self):
+        plan = plan_split(self.score_path, ['Score', 'Vibraphone', 'Vibraphone', 'Male Vocal'])
+
+        self.assertListEqual(plan['mismatches'], ['Duplicate part names: Vibraphone'])
+
+
+class TestOutlineIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Make temporary directory to house a copy of the score with nested bookmarks
+        cls.temp = tempfile.TemporaryDirectory()
+        cls.score_path = 'tests/test_score.pdf'
+        cls.nested_score_path = f'{cls.temp.name}/nested_score.pdf'
+
+        pdf_writer = PdfWriter(clone_from=cls.score_path)
+        pdf_writer.root_object.pop('/Outlines')
+        score = pdf_writer.add_outline_item('Score', 0)
+        pdf_writer.add_outline_item('Page 2', 1, parent=score)
+        pdf_writer.add_outline_item('Page 3', 2, parent=score)
+        pdf_writer.add_outline_item('Vibraphone 1', 3)
+        vibraphone = pdf_writer.add_outline_item('Vibraphone 2', 4)
+        pdf_writer.add_outline_item('Page 6', 5, parent=vibraphone)
+        pdf_writer.add_outline_item('Male Vocal', 6)
+        with open(cls.nested_score_path, 'wb') as output_pdf:
+            pdf_writer.write(output_pdf)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.temp.cleanup()
+
+    def test_flat_outline(self):
+        actual_index = build_outline_index(PdfReader(self.score_path))
+
+        expected_index = [('Score    Who lives in a pineapple under the sea?', 0, 2), ('Vibraphone 1', 3, 3), ('Vibraphone 2', 4, 5), ('Male Vocal', 6, 6)]
+        self.assertListEqual(actual_index, expected_index)
+
+    def test_nested_outline(self):
+        actual_index = build_outline_index(PdfReader(self.nested_score_path))
+
+        expected_index = [('Score', 0, 2), ('Vibraphone 1', 3, 3), ('Vibraphone 2', 4, 5), ('Male Vocal', 6, 6)]
+        self.assertListEqual(actual_index, expected_index)
+
+    def test_nested_outline_split(self):
+        output_folder = tempfile.mkdtemp(dir=self.temp.name)
+        metadata = {'/Title': 'Nested'}
+        split_score_by_bookmarks(self.nested_score_path, ['Score', 'Vibraphone 1', 'Vibraphone 2', 'Male Vocal'], metadata, output_folder)
+
+        self.assertEqual(len(PdfReader(f'{output_folder}/Nested - Score.pdf').pages), 3)
+        self.assertEqual(len(PdfReader(f'{output_folder}/Nested - Vibraphone 2.pdf').pages), 2)
+
+    def test_outline_tree(self):
+        actual_tree = build_outline_tree(PdfReader(self.nested_score_path))
+
+        expected_tree = [(('Score',), 0, 2), (('Score', 'Page 2'), 1, 1), (('Score', 'Page 3'), 2, 2), (('Vibraphone 1',), 3, 3),
+                         (('Vibraphone 2',), 4, 5), (('Vibraphone 2', 'Page 6'), 5, 5), (('Male Vocal',), 6, 6)]
+        self.assertListEqual(actual_tree, expected_tree)
+        self.assertListEqual(build_outline_tree(PdfReader(self.nested_score_path), max_depth=1), [entry for entry in expected_tree if len(entry[0]) == 1])
+
+    def test_select_outline_depth(self):
+        outline_tree = build_outline_tree(PdfReader(self.nested_score_path))
+
+        self.assertListEqual(list(select_outline_depth(outline_tree, 1)), ['Score', 'Vibraphone 1', 'Vibraphone 2', 'Male Vocal'])
+        self.assertListEqual(list(select_outline_depth(outline_tree, 2)), ['Score - Page 2', 'Score - Page 3', 'Vibraphone 1', 'Vibraphone 2 - Page 6', 'Male Vocal'])
+        self.assertEqual(len(select_outline_depth(outline_tree)), 7)
+        with self.assertRaises(ValueError):
+            select_outline_depth(outline_tree + [(('Score', 'Page 2'), 1, 1)])
+
+    def test_split_by_outline_every_depth(self):
+        output_folder = tempfile.mkdtemp(dir=self.temp.name)
+        split_score_by_outline(self.nested_score_path, {'/Title': 'Nested'}, output_folder)
+
+        self.assertEqual(len(os.listdir(output_folder)), 7)
+        self.assertEqual(len(PdfReader(f'{output_folder}/Nested - Score.pdf').pages), 3)
+        pdf_reader = PdfReader(f'{output_folder}/Nested - Vibraphone 2 - Page 6.pdf')
+        self.assertEqual(len(pdf_reader.pages), 1)
+        self.assertEqual(pdf_reader.metadata['/Tags'], 'Vibraphone 2 - Page 6')
+
+    def test_run_outline_part_folders(self):
+        output_folder = tempfile.mkdtemp(dir=self.temp.name)
+        with ScoreJob(self.nested_score_path, {'/Title': 'Nested'}, output_folder, part_folders=True, manifest=True) as job:
+            self.assertDictEqual(job.run_outline(depth=2), {})
+
+        self.assertTrue(os.path.exists(f'{output_folder}/Score/Nested - Score - Page 3.pdf'))
+        self.assertTrue(os.path.exists(f'{output_folder}/Vibraphone 1/Nested - Vibraphone 1.pdf'))
+        self.assertTrue(os.path.exists(f'{output_folder}/Vibraphone 2/Nested - Vibraphone 2 - Page 6.pdf'))
+        self.assertFalse(os.path.exists(f'{output_folder}/Vibraphone 2/Nested - Vibraphone 2.pdf'))
@@ -0,0 +1,95 @@
+import os
+import json
+import unittest
+import tempfile
+from pdf_operations import ScoreJob
+from tracing import JsonLinesHandler, SpanTotals, add_handler, capture_spans, remove_handler, span, tracing_enabled
+
+class TestSpan(unittest.TestCase):
+    def setUp(self) -> None:
+        self.records = []
+        add_handler(self.records.append)
+
+    def tearDown(self) -> None:
+        remove_handler(self.records.append)
+
+    def test_no_handlers(self):
+        remove_handler(self.records.append)
+        with span('open'):
+            pass
+
+        self.assertFalse(tracing_enabled())
+        self.assertListEqual(self.records, [])
+        add_handler(self.records.append)
+
+    def test_span_record(self):
+        with span('serialize', part='Trumpet 1'):
+            pass
+
+        self.assertEqual(len(self.records), 1)
+        self.assertEqual(self.records[0]['name'], 'serialize')
+        self.assertEqual(self.records[0]['part'], 'Trumpet 1')
+        self.assertGreaterEqual(self.records[0]['duration_s'], 0)
+
+    def test_capture_spans(self):
+        with capture_spans() as captured:
+            with span('page_copy'):
+                pass
+        with capture_spans(enabled=False) as disabled:
+            with span('page_copy'):
+                pass
+
+        self.assertEqual([record['name'] for record in captured], ['page_copy'])
+        self.assertListEqual(disabled, [])
+        self.assertListEqual(self.records, [])
+
+    def test_json_lines_handler(self):
+        with tempfile.TemporaryDirectory() as temp:
+            handler = JsonLinesHandler(f'{temp}/trace.jsonl')
+            add_handler(handler)
+            with span('open'), span('outline'):
+                pass
+            remove_handler(handler)
+
+            with open(f'{temp}/trace.jsonl') as trace_file:
+                self.assertListEqual([json.loads(line)['name'] for line in trace_file], ['outline', 'open'])
+
+class TestScoreJobSpans(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Make temporary directory to house output
+        cls.temp = tempfile.TemporaryDirectory()
+        cls.metadata = {'/Author': 'SpongeBob Squarepants, Patrick Star', '/Title': 'Who lives in a pineapple under the sea?', '/Subject': 'Calypso, Vocal'}
+        cls.score_path = 'tests/test_score.pdf'
+        cls.part_names = ['Score', 'Vibraphone 1', 'Vibraphone 2', 'Male Vocal']
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.temp.cleanup()
+
+    def setUp(self) -> None:
+        self.totals = SpanTotals()
+        add_handler(self.totals)
+
+    def tearDown(self) -> None:
+        remove_handler(self.totals)
+
+    def test_phases(self):
+        with ScoreJob(self.score_path, self.metadata, tempfile.mkdtemp(dir=self.temp.name)) as job:
+            job.run(self.part_names)
+
+        self.assertEqual(self.totals.phases['open'][0], 1)
+        self.assertEqual(self.totals.phases['outline'][0], 1)
+        self.assertEqual(self.totals.phases['job'][0], 1)
+        for phase in ('part', 'page_copy', 'serialize', 'write'):
+            self.assertEqual(self.totals.phases[phase][0], 5)
+        self.assertListEqual(sorted(self.totals.parts), sorted(self.part_names + ['Complete Set']))
+        self.assertIn('total', self.totals.parts['Male Vocal'])
+        self.assertIn('Male Vocal', self.totals.summary())
+
+    def test_worker_phases(self):
+        with ScoreJob(self.score_path, self.metadata, tempfile.mkdtemp(dir=self.temp.name)) as job:
+            job.write_parts(job.resolve_bookmarks(self.part_names), workers=2)
+
+        for phase in ('part', 'page_copy', 'serialize', 'write'):
+            self.assertEqual(self.totals.phases[phase][0], 4)
@@ -0,0 +1,151 @@
+import os
+import json
+import shutil
+import threading
+import time
+import unittest
+import tempfile
+from watch import InotifyWatcher, PollingWatcher, WatchService
+
+class TestWatchService(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Make temporary directory to house the inbox & output
+        cls.temp = tempfile.TemporaryDirectory()
+        cls.score_path = 'tests/test_score.pdf'
+        cls.part_names = ['Score', 'Vibraphone 1', 'Vibraphone 2', 'Male Vocal']
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.temp.cleanup()
+
+    def setUp(self) -> None:
+        self.inbox = tempfile.mkdtemp(dir=self.temp.name)
+        self.output = tempfile.mkdtemp(dir=self.temp.name)
+        self.parts_file = f'{self.inbox}/parts.list'
+        with open(self.parts_file, 'w') as parts_file:
+            parts_file.write('\n'.join(self.part_names) + '\n')
+
+    def run_service(self, service, until):
+        stop_event = threading.Event()
+        thread = threading.Thread(target=service.run, args=(stop_event,))
+        thread.start()
+        try:
+            deadline = time.monotonic() + 20
+            while not until() and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            stop_event.set()
+            thread.join()
+
+    def test_splits_dropped_scores_once(self):
+        service = WatchService(self.inbox, self.output, self.parts_file, workers=1, settle_seconds=0.2, poll_interval=0.05, polling=True)
+        shutil.copy(self.score_path, f'{self.inbox}/pineapple.pdf')
+        with open(f'{self.inbox}/pineapple.json', 'w') as sidecar:
+            json.dump({'title': 'Who lives in a pineapple under the sea?', 'composer': 'Patrick Star', 'style': 'Calypso'}, sidecar)
+        shutil.copy(self.score_path, f'{self.inbox}/copy of pineapple.pdf')
+
+        self.run_service(service, lambda: service.stats()['processed'] + service.stats()['duplicates'] == 2)
+
+        stats = service.stats()
+        self.assertEqual(stats['processed'], 1)
+        self.assertEqual(stats['duplicates'], 1)
+        self.assertEqual(stats['failed'], 0)
+        outputs = [file for file in os.listdir(self.output) if not file.startswith('.')]
+        self.assertEqual(len(outputs), 5)
+
+    def test_parts_sidecar(self):
+        service = WatchService(self.inbox, self.output, self.parts_file, workers=1, settle_seconds=0.2, poll_interval=0.05, polling=True)
+        shutil.copy(self.score_path, f'{self.inbox}/krusty krab.pdf')
+        with open(f'{self.inbox}/krusty krab.txt', 'w') as parts_sidecar:
+            parts_sidecar.write('Score\nVibraphone 1\n')
+
+        self.run_service(service, lambda: service.stats()['failed'] == 1)
+
+        self.assertEqual(service.stats()['failed'], 1)
+        self.assertFalse(os.path.exists(f'{self.output}/krusty krab - Complete Set.pdf'))
+
+    def test_identical_scores_split_once_in_parallel(self):
+        service = WatchService(self.inbox, self.output, self.parts_file, workers=2, settle_seconds=0.2, poll_interval=0.05, polling=True)
+        for name in ('pineapple', 'copy of pineapple'):
+            shutil.copy(self.score_path, f'{self.inbox}/{name}.pdf')
+
+        self.run_service(service, lambda: service.stats()['processed'] + service.stats()['duplicates'] == 2)
+
+        self.assertEqual(service.stats()['processed'], 1)
+        self.assertEqual(service.stats()['duplicates'], 1)
+        self.assertEqual(len([file for file in os.listdir(self.output) if not file.startswith('.')]), 5)
+
+    def test_failed_score_retried(self):
+        service = WatchService(self.inbox, self.output, self.parts_file, workers=1, settle_seconds=0.2, poll_interval=0.05)
+        shutil.copy(self.score_path, f'{self.inbox}/krusty krab.pdf')
+        with open(f'{self.inbox}/krusty krab.txt', 'w') as parts_sidecar:
+            parts_sidecar.write('Score\nVibraphone 1\n')
+
+        def fix_sidecar_after_failure():
+            if service.stats()['failed'] and os.path.exists(f'{self.inbox}/krusty krab.txt'):
+                os.remove(f'{self.inbox}/krusty krab.txt')
+            return service.stats()['processed'] == 1
+
+        self.run_service(service, fix_sidecar_after_failure)
+
+        self.assertEqual(service.stats()['processed'], 1)
+        self.assertGreaterEqual(service.stats()['failed'], 1)
+
+    def test_waits_for_growing_files(self):
+        service = WatchService(self.inbox, self.output, self.parts_file, workers=1, settle_seconds=0.3, queue_size=1)
+        score = f'{self.inbox}/pineapple.pdf'
+        with open(score, 'wb') as partial:
+            partial.write(b'%PDF-1.7')
+        service.observe({score})
+        service.queue_settled()
+        self.assertEqual(service.stats()['queued'], 0)
+
+        time.sleep(0.1)
+        with open(score, 'ab') as partial:
+            partial.write(b'\n')
+        service.observe({score})
+        time.sleep(0.25)
+        service.queue_settled()
+        self.assertEqual(service.stats()['queued'], 0)
+
+        time.sleep(0.1)
+        service.queue_settled()
+        self.assertEqual(service.stats()['queued'], 1)
+
+    def test_backpressure(self):
+        service = WatchService(self.inbox, self.output, self.parts_file, workers=1, settle_seconds=0, queue_size=1)
+        scores = [f'{self.inbox}/{name}.pdf' for name in ('one', 'two', 'three')]
+        for score in scores:
+            shutil.copy(self.score_path, score)
+
+        service.observe(set(scores))
+        service.queue_settled()
+
+        self.assertEqual(service.stats()['queued'], 1)
+        self.assertEqual(service.stats()['deferred'], 2)
+        self.assertEqual(service.stats()['settling'], 2)
+
+
+class TestWatchers(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.temp.cleanup()
+
+    def test_polling_watcher(self):
+        open(f'{self.temp.name}/score.pdf', 'wb').close()
+
+        self.assertSetEqual(PollingWatcher(self.temp.name).wait(0), {f'{self.temp.name}/score.pdf'})
+
+    @unittest.skipUnless(os.uname().sysname == 'Linux', 'inotify is only available on Linux')
+    def test_inotify_watcher(self):
+        watcher = InotifyWatcher(self.temp.name)
+        try:
+            self.assertSetEqual(watcher.wait(0), set())
+            with open(f'{self.temp.name}/score.pdf', 'wb') as score:
+                score.write(b'%PDF')
+            self.assertSetEqual(watcher.wait(1), {f'{self.temp.name}/score.pdf'})
+        finally:
+            watcher.close()
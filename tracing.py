@@ -0,0 +1,159 @@
+"""Lightweight span timing for the score operations.
+
+Each phase of a job (open, outline, page_copy, serialize, write, move, ...) is timed as a span. Spans are only
+measured while a handler is attached, otherwise entering one costs a single list check.
+
+Example:
+    totals = SpanTotals()
+    add_handler(totals)
+    add_handler(JsonLinesHandler('trace.jsonl'))
+    ...
+    print(totals.summary())
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+_handlers = []
+_NO_SPAN = nullcontext()
+
+
+def add_handler(handler):
+    """Attaches a handler that is called with the record (dict) of every finished span.
+
+    Args:
+        handler (callable): Called with a dict holding the span name, start time, duration in seconds and its fields.
+    """
+    _handlers.append(handler)
+
+
+def remove_handler(handler):
+    """Detaches a handler attached with add_handler."""
+    _handlers.remove(handler)
+
+
+def tracing_enabled():
+    """Returns whether any handler is attached."""
+    return bool(_handlers)
+
+
+def emit(record):
+    """Passes a span record to every attached handler, e.g. one measured in a worker process."""
+    for handler in list(_handlers):
+        handler(record)
+
+
+@contextmanager
+def capture_spans(enabled=True):
+    """Collects the spans timed in the enclosed block into a list instead of passing them to the attached handlers.
+
+    Used by worker processes, which inherit the handlers of the parent when forked, to send their spans back to the parent.
+
+    Args:
+        enabled (bool): Whether spans are timed at all. When False the block runs without any handlers.
+
+    Yields:
+        list[dict]: The records of the spans timed in the block.
+    """
+    records = []
+    attached_handlers = _handlers[:]
+    _handlers[:] = [records.append] if enabled else []
+    try:
+        yield records
+    finally:
+        _handlers[:] = attached_handlers
+
+
+class _Span:
+    def __init__(self, name, fields):
+        self.record = {'name': name, **fields}
+
+    def __enter__(self):
+        self.record['start'] = time.time()
+        self._start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.record['duration_s'] = time.perf_counter() - self._start_time
+        emit(self.record)
+
+
+def span(name, **fields):
+    """Times the enclosed block as a span when a handler is attached.
+
+    Args:
+        name (str): The name of the phase being timed.
+        **fields: Extra fields added to the span record, e.g. part='Trumpet 1'.
+
+    Returns:
+        A context manager timing the block.
+    """
+    if not _handlers:
+        return _NO_SPAN
+    return _Span(name, fields)
+
+
+class LoggingHandler:
+    """Span handler that logs each span.
+
+    Args:
+        logger (logging.Logger, optional): The logger to log to, defaults to the tracing logger.
+        level (int): The level to log at.
+    """
+
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger or logging.getLogger(__name__)
+        self.level = level
+
+    def __call__(self, record):
+        fields = ' '.join(f"{key}={value}" for key, value in record.items() if key not in ('name', 'start', 'duration_s'))
+        self.logger.log(self.level, f"{record['name']} {record['duration_s'] * 1000:.1f} ms {fields}".rstrip())
+
+
+class JsonLinesHandler:
+    """Span handler that appends each span as a line of JSON to a file.
+
+    Args:
+        file (str): A file path representing the JSON lines file to append to.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps(record, default=str) + '\n'
+        with self._lock, open(self.file, 'a') as trace_file:
+            trace_file.write(line)
+
+
+class SpanTotals:
+    """Span handler that totals the count and duration of the spans of each phase, and of each part."""
+
+    def __init__(self):
+        self.phases = {}
+        self.parts = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        with self._lock:
+            count, total = self.phases.get(record['name'], (0, 0.0))
+            self.phases[record['name']] = (count + 1, total + record['duration_s'])
+            if 'part' in record:
+                phase = 'total' if record['name'] == 'part' else record['name']
+                part_phases = self.parts.setdefault(record['part'], {})
+                part_phases[phase] = part_phases.get(phase, 0.0) + record['duration_s']
+
+    def summary(self):
+        """Formats the totals as a table of phases followed by the time spent on each part.
+
+        Returns:
+            str: The formatted totals.
+        """
+        lines = [f"{'phase':<14}{'count':>7}{'total (ms)':>12}"]
+        lines += [f"{name:<14}{count:>7}{total * 1000:>12.1f}" for name, (count, total) in self.phases.items()]
+        for part, part_phases in self.parts.items():
+            lines.append(f"{part}: " + ', '.join(f"{name} {total * 1000:.1f} ms" for name, total in part_phases.items()))
+        return '\n'.join(lines)
@@ -0,0 +1,391 @@
+"""Long running service that splits every score dropped into an inbox folder, without the GUI.
+
+The inbox is watched with inotify on Linux and polled elsewhere. A score is only queued once its size and modification time
+have stopped changing, so scores still being written by a scanner or copied over the network are left alone. Queued scores
+are split by a pool of worker processes; when the queue is full, ready scores wait in the inbox until there is room.
+
+Each score may have sidecar files next to it with the same name: a .json file of metadata (see batch.resolve_metadata) and a
+.txt file of part names, otherwise the default parts file is used. Scores whose content has already been split are skipped.
+Scores that fail to split are settled again and retried.
+
+Example:
+    python -m watch inbox --output library --parts Parts_Default.txt --workers 4 --stats-file watch_stats.json
+"""
+import argparse
+import ctypes
+import json
+import logging
+import os
+import queue
+import select
+import signal
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from batch import DEFAULT_PARTS_FILE, init_worker, positive_int, process_score, resolve_metadata
+from catalog import file_hash
+from file_operations import atomic_write, read_part_names
+
+logger = logging.getLogger(__name__)
+
+PROCESSED_SUFFIX = 'Watch Processed.json'
+
+# From <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    """Watches a directory for files being created, written or moved into it with inotify.
+
+    Args:
+        directory (str): A file path representing the directory to watch.
+
+    Raises:
+        OSError: Throws when inotify is not available.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        libc = ctypes.CDLL(None, use_errno=True)
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        if libc.inotify_add_watch(self._fd, os.fsencode(directory), IN_CREATE | IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            error = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(error, f"inotify_add_watch failed for {directory}")
+
+    def wait(self, timeout):
+        """Waits up to timeout seconds for files in the directory to change.
+
+        Returns:
+            set[str]: The file paths of the files that changed, empty when none did.
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        changed = set()
+        while readable:
+            try:
+                events = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(events):
+                _, _, _, name_length = _EVENT_HEADER.unpack_from(events, offset)
+                name = events[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + name_length].rstrip(b"\0")
+                if name:
+                    changed.add(os.path.join(self.directory, os.fsdecode(name)))
+                offset += _EVENT_HEADER.size + name_length
+        return changed
+
+    def close(self):
+        """Stops watching the directory."""
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """Watches a directory by listing it every time it is asked for changes, for platforms without inotify.
+
+    Args:
+        directory (str): A file path representing the directory to watch.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def wait(self, timeout):
+        """Sleeps for timeout seconds and lists the directory.
+
+        Returns:
+            set[str]: The file paths of every file in the directory, unchanged or not.
+        """
+        time.sleep(timeout)
+        with os.scandir(self.directory) as entries:
+            return {entry.path for entry in entries if entry.is_file()}
+
+    def close(self):
+        """Stops watching the directory."""
+
+
+def open_watcher(directory, polling=False):
+    """Opens an inotify watcher of a directory, or a polling watcher when inotify is not available or polling is requested.
+
+    Args:
+        directory (str): A file path representing the directory to watch.
+        polling (bool): Whether to poll even when inotify is available, e.g. for network shares where inotify sees no remote changes.
+
+    Returns:
+        InotifyWatcher | PollingWatcher: The watcher of the directory.
+    """
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError) as error:
+            logger.warning(f"inotify is not available ({error}), polling instead.")
+    return PollingWatcher(directory)
+
+
+class WatchService:
+    """Splits the scores dropped into an inbox folder with a bounded queue and a pool of worker processes.
+
+    Args:
+        inbox (str): A file path representing the folder scores are dropped into.
+        output_directory (str): A file path representing the output directory location to store the newly created files.
+        parts_file (str): A file path representing the .txt file of part names used for scores without a parts sidecar.
+        workers (int): The number of scores split at once.
+        queue_size (int): The number of ready scores that may wait for a worker. Further ready scores wait in the inbox.
+        settle_seconds (float): How long the size and modification time of a score must stay unchanged before it is queued.
+        poll_interval (float): The longest time between checks of the scores that are still settling.
+        polling (bool): Whether to poll the inbox even when inotify is available.
+        part_folders (bool): Whether each part is output into its own part named folder inside the output directory.
+        catalog (str, optional): A file path representing the SQLite database of a catalog to record each output in.
+        stats_file (str, optional): A file path representing a JSON file the queue statistics are written to every stats_interval seconds.
+        stats_interval (float): The number of seconds between reports of the queue statistics.
+    """
+
+    def __init__(self, inbox, output_directory, parts_file=DEFAULT_PARTS_FILE, workers=os.cpu_count(), queue_size=16, settle_seconds=2.0,
+                 poll_interval=1.0, polling=False, part_folders=False, catalog=None, stats_file=None, stats_interval=60.0):
+        self.inbox = inbox
+        self.output_directory = output_directory
+        self.parts_file = parts_file
+        self.workers = workers
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.polling = polling
+        self.part_folders = part_folders
+        self.catalog = catalog
+        self.stats_file = stats_file
+        self.stats_interval = stats_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._settling = {}
+        self._handled = {}
+        self._splitting = {}
+        self._running = 0
+        self._counts = {'processed': 0, 'failed': 0, 'duplicates': 0, 'deferred': 0}
+        os.makedirs(output_directory, exist_ok=True)
+        self._processed_hashes = self.read_processed()
+
+    def processed_path(self):
+        """Returns the file path of the record of the content hashes of the scores already split."""
+        return f"{self.output_directory}/.{PROCESSED_SUFFIX}"
+
+    def read_processed(self):
+        """Reads the content hashes of the scores already split, empty when none have been.
+
+        Returns:
+            dict[str, str]: A dictionary of score content hash keys with the file name of the score as values.
+        """
+        try:
+            with open(self.processed_path()) as processed_file:
+                return json.load(processed_file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def stats(self):
+        """Returns the queue statistics of the service.
+
+        Returns:
+            dict[str, int]: The number of scores settling, queued, running and waiting for room in the queue, and the totals processed, failed and skipped as duplicates.
+        """
+        with self._lock:
+            return {'settling': len(self._settling), 'queued': self._queue.qsize(), 'running': self._running, **self._counts}
+
+    def _report_stats(self):
+        """Logs the queue statistics and writes them to the stats file."""
+        stats = self.stats()
+        logger.info(' '.join(f"{name}={count}" for name, count in stats.items()))
+        if self.stats_file:
+            with atomic_write(self.stats_file, mode="w") as stats_json:
+                json.dump(stats, stats_json, indent=2)
+
+    def observe(self, paths):
+        """Starts or restarts the settling of the given files if they are scores not yet handled in their current state.
+
+        Args:
+            paths (set[str]): File paths in the inbox that may have changed.
+        """
+        with self._lock:
+            for path in paths:
+                if Path(path).suffix != '.pdf' or Path(path).name.startswith('.'):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    self._settling.pop(path, None)
+                    continue
+                signature = (stat.st_size, stat.st_mtime)
+                if self._handled.get(path) == signature:
+                    continue
+                if path not in self._settling or self._settling[path][0] != signature:
+                    self._settling[path] = (signature, time.monotonic())
+
+    def queue_settled(self):
+        """Queues every score that has stopped changing for settle_seconds, leaving it in the inbox if the queue is full."""
+        now = time.monotonic()
+        deferred = 0
+        with self._lock:
+            for path, (signature, since) in list(self._settling.items()):
+                if now - since < self.settle_seconds:
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    del self._settling[path]
+                    continue
+                if (stat.st_size, stat.st_mtime) != signature:
+                    self._settling[path] = ((stat.st_size, stat.st_mtime), now)
+                    continue
+
+                try:
+                    self._queue.put_nowait((path, signature))
+                except queue.Full:
+                    deferred += 1
+                    continue
+                del self._settling[path]
+                self._handled[path] = signature
+            self._counts['deferred'] = deferred
+
+    def _split(self, executor, score_pdf):
+        """Splits a single score in the worker pool unless a score with the same content was split before or is being split. Returns whether it was split."""
+        content_hash = file_hash(score_pdf)
+        with self._lock:
+            split_as = self._processed_hashes.get(content_hash) or self._splitting.get(content_hash)
+            if split_as is None:
+                # Claims the content, so an identical score settling at the same time is skipped
+                self._splitting[content_hash] = os.path.basename(score_pdf)
+        if split_as is not None:
+            logger.info(f"Skipped {score_pdf}, it has the same content as {split_as}.")
+            return False
+
+        try:
+            parts_sidecar = Path(score_pdf).with_suffix('.txt')
+            part_names = read_part_names(parts_sidecar if parts_sidecar.exists() else self.parts_file)
+            failed_parts, _ = executor.submit(process_score, score_pdf, part_names, resolve_metadata(score_pdf, {}), self.output_directory,
+                                              self.part_folders, catalog=self.catalog).result()
+            if failed_parts:
+                raise RuntimeError(f"failed parts: {', '.join(failed_parts)}")
+        except BaseException:
+            with self._lock:
+                del self._splitting[content_hash]
+            raise
+
+        with self._lock:
+            del self._splitting[content_hash]
+            self._processed_hashes[content_hash] = os.path.basename(score_pdf)
+            with atomic_write(self.processed_path(), mode="w") as processed_file:
+                json.dump(self._processed_hashes, processed_file, indent=2, sort_keys=True)
+        logger.info(f"Split {score_pdf}.")
+        return True
+
+    def _work(self, executor):
+        """Worker thread that splits queued scores until it takes None from the queue."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            score_pdf, signature = item
+            with self._lock:
+                self._running += 1
+            try:
+                outcome = 'processed' if self._split(executor, score_pdf) else 'duplicates'
+            except Exception as error:
+                logger.error(f"Failed to split {score_pdf}: {type(error).__name__}: {error}")
+                outcome = 'failed'
+            with self._lock:
+                self._running -= 1
+                self._counts[outcome] += 1
+                if outcome == 'failed':
+                    # Settles the score again, so it is retried without waiting for it to change
+                    self._handled.pop(score_pdf, None)
+                    self._settling[score_pdf] = (signature, time.monotonic())
+
+    def run(self, stop_event=None):
+        """Watches the inbox and splits the scores dropped into it until the stop event is set.
+
+        The scores already in the inbox when the service starts are handled like new ones. Scores being split when the service
+        is stopped are finished, queued scores are left in the inbox for the next start.
+
+        Args:
+            stop_event (threading.Event, optional): An event that stops the service when set. The service runs until interrupted when not supplied.
+        """
+        stop_event = stop_event or threading.Event()
+        watcher = open_watcher(self.inbox, self.polling)
+        log_level = logging.getLogger().getEffectiveLevel()
+        executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker, initargs=(log_level, None))
+        threads = [threading.Thread(target=self._work, args=(executor,), daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        logger.info(f"Watching {self.inbox} with {type(watcher).__name__}.")
+
+        try:
+            with os.scandir(self.inbox) as entries:
+                self.observe({entry.path for entry in entries if entry.is_file()})
+            last_report = time.monotonic()
+            while not stop_event.is_set():
+                self.observe(watcher.wait(self.poll_interval if self._settling else min(self.poll_interval * 5, self.stats_interval)))
+                self.queue_settled()
+                if time.monotonic() - last_report >= self.stats_interval:
+                    self._report_stats()
+                    last_report = time.monotonic()
+        finally:
+            watcher.close()
+            # Drop the scores still queued so they are picked up on the next start, then stop the workers
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            for _ in threads:
+                self._queue.put(None)
+            for thread in threads:
+                thread.join()
+            executor.shutdown()
+            self._report_stats()
+
+
+def main(argv=None):
+    """Runs the watch service until it is interrupted.
+
+    Args:
+        argv (list[str], optional): The command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: The exit status.
+    """
+    parser = argparse.ArgumentParser(prog='python -m watch', description='Split every bookmarked score dropped into an inbox folder.')
+    parser.add_argument('inbox', help='folder scanned scores are dropped into')
+    parser.add_argument('-o', '--output', required=True, help='output directory for the complete sets and parts')
+    parser.add_argument('-p', '--parts', default=DEFAULT_PARTS_FILE, help='parts .txt file for scores without a .txt sidecar (default: Parts_Default.txt)')
+    parser.add_argument('-w', '--workers', type=positive_int, default=os.cpu_count(), help='number of scores split at once (default: cpu count)')
+    parser.add_argument('--queue-size', type=int, default=16, help='number of ready scores that may wait for a worker (default: 16)')
+    parser.add_argument('--settle', type=float, default=2.0, help='seconds a score must stop changing before it is split (default: 2)')
+    parser.add_argument('--poll', action='store_true', help='poll the inbox instead of using inotify, e.g. for network shares')
+    parser.add_argument('--part-folders', action='store_true', help='output each part into its own part named folder')
+    parser.add_argument('--catalog', help='SQLite catalog to record every output in')
+    parser.add_argument('--stats-file', help='JSON file the queue statistics are written to')
+    parser.add_argument('--stats-interval', type=float, default=60.0, help='seconds between reports of the queue statistics (default: 60)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    service = WatchService(args.inbox, args.output, args.parts, args.workers, args.queue_size, args.settle, polling=args.poll,
+                           part_folders=args.part_folders, catalog=args.catalog, stats_file=args.stats_file, stats_interval=args.stats_interval)
+    try:
+        service.run(stop_event)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())